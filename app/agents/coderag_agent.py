@@ -2,16 +2,19 @@ from __future__ import annotations
 import logging
 import json
 
-from typing import Dict
+import time
+from typing import Dict, Optional
 
-from app.agents.LLM_Manager import LLM
-from app.agents.prompts import DECISION_PROMPT
+from app.agents.deadline import Deadline
+from app.agents.LLM_Manager import PRIORITY_ANSWER, PRIORITY_DECISION, BaseLLM, get_llm
+from app.agents.prefetch import prefetch_scope
+from app.agents.decision import AgentDecision, DecisionError, parse_decision
+from app.agents.prompts import DECISION_PROMPT, DECISION_REPAIR_PROMPT
 from app.agents.tools import AgentTools
-from app.config.logging_config import setup_logging
+from app.config import settings
 from app.db.schemas import AgentResponse
-from app.utils import utils
+from app.metrics import AGENT_DECISIONS, AGENT_EARLY_STOPS, AGENT_QUERIES, DECISION_REPAIR_SAVED_SECONDS, current_trace, span
 
-setup_logging()
 logger = logging.getLogger(__name__)
 
 
@@ -26,19 +29,34 @@ class CoderagAgent:
         - Feed results back as the new context.
     4. Logs each raw LLM response for debugging.
     5. If the loop ends without a direct answer, forces a final summarization step.
+    Every query runs against a Deadline: when little budget is left the loop stops early
+    and goes to the summary, and a cancelled query (client gone) raises QueryCancelled.
     """
-    def __init__(self, tools: AgentTools):
+    def __init__(self, tools: AgentTools, llm: Optional[BaseLLM] = None):
         self.tools = tools.get_tools()
-        self.llm = LLM()
+        self.llm = llm or get_llm()
         self.max_loops = 3
 
-    def handle_query(self, query: str, repo_id: int) -> Dict:
+    def handle_query(self, query: str, repo_id: int, deadline: Optional[Deadline] = None) -> Dict:
+        AGENT_QUERIES.inc()
+        deadline = deadline or Deadline(settings.QUERY_TIMEOUT_SECONDS)
+        # Files named by each retrieval are prefetched while the following decision call is in flight
+        with span("query", "handle_query"), prefetch_scope():
+            response = self._run_loop(query, repo_id, deadline)
+        trace = current_trace()
+        if trace:
+            response.trace = trace.to_dict()
+        return response.to_dict()
+
+    def _run_loop(self, query: str, repo_id: int, deadline: Deadline) -> AgentResponse:
         tool_calls = []
+        status = "final"
         # Step 0: Retrieve initial context
         logger.info("Retrieving initial context before starting loop...")
-        initial_context = self.tools["get_more_context"](
-            query=query, repo_id=str(repo_id), top_k=3
-        )
+        with span("query", "tool:get_more_context", initial=True):
+            initial_context = self.tools["get_more_context"](
+                query=query, repo_id=str(repo_id), top_k=3, deadline=deadline.at
+            )
         current_thought = (
             f"The user asked: {query}\n\n"
             f"Here is the initial retrieved context:\n{initial_context}"
@@ -46,6 +64,13 @@ class CoderagAgent:
         final_answer = None
         action = None  # track last LLM decision
         for i in range(self.max_loops):
+            deadline.check()
+            if deadline.remaining() < settings.QUERY_SUMMARY_RESERVE_SECONDS:
+                # Another decision + tool round would eat the time the final answer needs
+                logger.info(f"Only {deadline.remaining():.1f}s of budget left; skipping to the final answer.")
+                AGENT_EARLY_STOPS.labels("budget").inc()
+                status = "partial"
+                break
             logger.info(f"Agent loop {i + 1}/{self.max_loops}. Current thought prepared.")
             # Step 1: Construct prompt for LLM
             decision_prompt = DECISION_PROMPT.format(
@@ -54,17 +79,23 @@ class CoderagAgent:
                 tools_desc=(
                     "get_more_context(query: str, repo_id: str) -> str: "
                     "Finds relevant code snippets based on a query.\n"
+                    "get_file_outline(file_path: str, repo_id: str) -> str: "
+                    "Lists the classes and methods of a file with their line ranges.\n"
+                    "get_file_lines(file_path: str, repo_id: str, start_line: int, end_line: int, member: str) -> str: "
+                    "Returns a line range of a file, or the lines of a named member such as 'OrderService.findById'.\n"
                     "get_specific_file(file_path: str, repo_id: str) -> str: "
                     "Fetches the entire content of a specific file."
                 )
             )
-            # Step 2: Call LLM and log raw output
-            decision_raw = self._safe_invoke(decision_prompt)
-            logger.info(f"Raw LLM Response (loop {i+1}): {decision_raw}")
-            # Step 3: Parse response
-            decision = utils._parse_json_object(decision_raw)
-            action = decision.get("action", "answer")
-            tool_input = decision.get("tool_input", {})
+            # Step 2 + 3: Call LLM and parse its decision, repairing it once if malformed
+            decision = self._decide(decision_prompt, loop=i + 1, deadline=deadline)
+            deadline.check()
+            if decision is None:
+                # Falls through to the summarizer with whatever tool results were collected
+                action = "error"
+                break
+            action = decision.action
+            tool_input = dict(decision.tool_input)
 
             # Step 4: Execute chosen action
             if action in self.tools:
@@ -73,9 +104,13 @@ class CoderagAgent:
 
                 if "repo_id" not in tool_input:
                     tool_input["repo_id"] = str(repo_id)
+                call_input = dict(tool_input)
+                if action == "get_more_context":
+                    call_input["deadline"] = deadline.at
 
                 try:
-                    tool_output = tool_function(**tool_input)
+                    with span("query", f"tool:{action}"):
+                        tool_output = tool_function(**call_input)
                     tool_calls.append({
                         "tool": action,
                         "input": tool_input,
@@ -98,37 +133,99 @@ class CoderagAgent:
                         f"Try a different approach to answer the user's question."
                     )
             else:
-                logger.info("LLM chose to answer directly or gave invalid action. Ending loop.")
-                final_answer = (
-                        decision.get("answer")
-                        or decision.get("tool_input", {}).get("answer")
-                        or "No direct answer provided."
-                )
+                logger.info("LLM chose to answer directly. Ending loop.")
+                final_answer = tool_input.get("answer") or "No direct answer provided."
                 break
         # -----------------------
         # Final summarizer fallback
         # -----------------------
         if action != "answer":
-            logger.info("Loop ended without natural answer. Forcing final summarization.")
-            summary_prompt = f"""
-            The user asked: {query}
+            deadline.check()
+            # A loop stopped before any tool ran still has the initial context to answer from
+            collected = tool_calls or [{
+                "tool": "get_more_context",
+                "input": {"query": query, "repo_id": str(repo_id)},
+                "output": initial_context[:1000],
+            }]
+            if deadline.expired:
+                logger.warning("Query deadline reached before the final answer; returning the tool results only.")
+                AGENT_EARLY_STOPS.labels("expired").inc()
+                status = "partial"
+                final_answer = "The time budget ran out before an answer could be written; see the collected tool results."
+            else:
+                logger.info("Loop ended without natural answer. Forcing final summarization.")
+                summary_prompt = f"""
+                The user asked: {query}
 
-            Here are the tool results collected:
-            {json.dumps(tool_calls, indent=2)}
+                Here are the tool results collected:
+                {json.dumps(collected, indent=2)}
 
-            Please summarize this into a clear natural-language answer for the user.
-            """
-            final_answer = self._safe_invoke(summary_prompt)
+                Please summarize this into a clear natural-language answer for the user.
+                """
+                final_answer = (
+                    self._safe_invoke(summary_prompt, stage="llm_summary", priority=PRIORITY_ANSWER, deadline=deadline)
+                    or "The model could not be reached to summarize the results."
+                )
         return AgentResponse(
-            status="final",
+            status=status,
             answer=final_answer,
             tool_calls=tool_calls,
-        ).to_dict()
+        )
+
+    def _decide(self, prompt: str, loop: int, deadline: Deadline) -> Optional[AgentDecision]:
+        """
+        Ask the LLM for the next action. A malformed reply gets one short repair call
+        (the error and the reply, without the context) rather than costing a whole loop.
+        Returns None when no usable decision could be obtained.
+        """
+        start = time.perf_counter()
+        raw = self._safe_invoke(prompt, stage="llm_decision", json_mode=True, deadline=deadline)
+        decision_seconds = time.perf_counter() - start
+        logger.info(f"Raw LLM Response (loop {loop}): {raw}")
+        if raw is None:
+            return None
+        try:
+            decision = parse_decision(raw)
+            AGENT_DECISIONS.labels("valid").inc()
+            return decision
+        except DecisionError as e:
+            logger.warning(f"Malformed decision (loop {loop}): {e}. Asking for a repair.")
+            error = e
+        if deadline.cancelled or deadline.remaining() < settings.QUERY_SUMMARY_RESERVE_SECONDS:
+            AGENT_DECISIONS.labels("failed").inc()
+            return None
 
-    def _safe_invoke(self, prompt: str) -> str:
+        start = time.perf_counter()
+        repaired = self._safe_invoke(
+            DECISION_REPAIR_PROMPT.format(error=error, previous=raw[:2000]), stage="llm_repair", json_mode=True,
+            deadline=deadline,
+        )
+        repair_seconds = time.perf_counter() - start
+        try:
+            decision = parse_decision(repaired or "")
+        except DecisionError as e:
+            logger.error(f"Decision repair failed (loop {loop}): {e}. Raw: {repaired}")
+            AGENT_DECISIONS.labels("failed").inc()
+            return None
+        AGENT_DECISIONS.labels("repaired").inc()
+        # The alternative was re-sending the full decision prompt, which costs about as much as the first call
+        DECISION_REPAIR_SAVED_SECONDS.inc(max(0.0, decision_seconds - repair_seconds))
+        return decision
+
+    def _safe_invoke(
+            self, prompt: str, stage: str = "llm_call", json_mode: bool = False, priority: int = PRIORITY_DECISION,
+            deadline: Optional[Deadline] = None,
+    ) -> Optional[str]:
+        """
+        Call the LLM; returns None if the call itself failed (after the dispatcher's retries)
+        or could not finish before the deadline.
+        """
         try:
-            return self.llm.invoke(prompt)
-        except Exception as e:
+            with span("query", stage, prompt_chars=len(prompt)):
+                return self.llm.invoke(
+                    prompt, json_mode=json_mode, priority=priority, deadline=deadline.at if deadline else None
+                )
+        except Exception:
             logger.exception("LLM invocation failed")
-            return f'{{"action": "error", "answer": "LLM invocation failed: {e}"}}'
+            return None
 
@@ -0,0 +1,39 @@
+# app/agents/deadline.py
+"""
+Query Deadlines:
+- A `Deadline` is the time budget of one query, as a time.monotonic() instant, plus a
+  cancellation flag set when the client goes away
+- The agent checks it between stages and hands `deadline.at` to the LLM dispatcher and
+  the retriever, so no single call can run past it
+"""
+import threading
+import time
+
+
+class QueryCancelled(Exception):
+    """The client disconnected; the query's remaining work was abandoned."""
+
+
+class Deadline:
+    def __init__(self, seconds: float):
+        self.at = time.monotonic() + seconds
+        self._cancelled = threading.Event()
+
+    def remaining(self) -> float:
+        return max(0.0, self.at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.at
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def check(self):
+        """Raise QueryCancelled if the query was cancelled."""
+        if self._cancelled.is_set():
+            raise QueryCancelled()
@@ -0,0 +1,104 @@
+# app/agents/decision.py
+"""
+Agent Decision Parsing:
+- Extracts the first balanced JSON object from a model reply, ignoring code fences and
+  any prose before or after it
+- Validates it against the schema of the tools the agent can call
+- Failures raise DecisionError, whose message is fed to a short repair prompt instead of
+  ending the loop
+"""
+import json
+import logging
+from typing import Any, Dict, Literal, Optional
+
+from pydantic import BaseModel, ValidationError, model_validator
+
+logger = logging.getLogger(__name__)
+
+# Arguments each action must provide; the agent fills in repo_id itself
+REQUIRED_ARGS = {
+    "get_more_context": ("query",),
+    "get_file_outline": ("file_path",),
+    "get_file_lines": ("file_path",),
+    "get_specific_file": ("file_path",),
+    "answer": ("answer",),
+}
+
+
+class DecisionError(ValueError):
+    """The model reply is not a usable decision."""
+
+
+class AgentDecision(BaseModel):
+    action: Literal["get_more_context", "get_file_outline", "get_file_lines", "get_specific_file", "answer"]
+    tool_input: Dict[str, Any] = {}
+
+    @model_validator(mode="before")
+    @classmethod
+    def _lift_top_level_answer(cls, data):
+        # Models sometimes put the answer next to "action" instead of inside tool_input
+        if isinstance(data, dict) and "answer" in data and data.get("action") == "answer":
+            tool_input = dict(data.get("tool_input") or {})
+            tool_input.setdefault("answer", data["answer"])
+            data = {**data, "tool_input": tool_input}
+        return data
+
+    @model_validator(mode="after")
+    def _check_required_args(self):
+        missing = [arg for arg in REQUIRED_ARGS[self.action] if arg not in self.tool_input]
+        if self.action == "get_file_lines" and not (
+                "member" in self.tool_input or "start_line" in self.tool_input
+        ):
+            missing.append("member or start_line")
+        if missing:
+            raise ValueError(f"action '{self.action}' is missing tool_input keys: {', '.join(missing)}")
+        return self
+
+
+def extract_json_object(text: str) -> Optional[str]:
+    """
+    Return the first balanced `{...}` in `text` that parses as JSON, or None.
+    Braces inside JSON strings are ignored, so code snippets in an answer do not end the object early.
+    A balanced span that does not parse is skipped whole, so prose full of code braces is scanned once.
+    """
+    start = text.find("{")
+    while start != -1:
+        resume = start + 1
+        depth, in_string, escaped = 0, False, False
+        for i in range(start, len(text)):
+            ch = text[i]
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif ch == "\\":
+                    escaped = True
+                elif ch == '"':
+                    in_string = False
+            elif ch == '"':
+                in_string = True
+            elif ch == "{":
+                depth += 1
+            elif ch == "}":
+                depth -= 1
+                if depth == 0:
+                    candidate = text[start:i + 1]
+                    try:
+                        json.loads(candidate)
+                        return candidate
+                    except ValueError:
+                        resume = i + 1
+                        break
+        start = text.find("{", resume)
+    return None
+
+
+def parse_decision(raw: str) -> AgentDecision:
+    """Parse and validate a decision reply. Raises DecisionError describing what is wrong."""
+    candidate = extract_json_object(raw or "")
+    if candidate is None:
+        raise DecisionError("the reply does not contain a JSON object")
+    try:
+        return AgentDecision.model_validate(json.loads(candidate))
+    except ValidationError as e:
+        details = "; ".join(err["msg"] for err in e.errors())
+        raise DecisionError(f"the JSON object does not match the decision schema: {details}") from e
@@ -0,0 +1,157 @@
+# app/agents/llm_dispatcher.py
+"""
+LLM Dispatcher:
+- One shared admission point for every LLM call in the process
+- A priority queue in front of at most LLM_MAX_IN_FLIGHT concurrent calls, so final
+  answers are sent ahead of intermediate decisions when the provider is the bottleneck
+- A token bucket (LLM_RATE_PER_SECOND, LLM_BURST) keeps the request rate under the
+  provider quota instead of discovering it through 429s
+- Transient failures are retried with jittered exponential backoff, never past the
+  caller's deadline
+"""
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+from typing import Optional
+
+from app.agents.LLM_Manager import PRIORITY_DECISION, BaseLLM
+from app.config import settings
+from app.metrics import LLM_IN_FLIGHT, LLM_QUEUE_DEPTH, LLM_QUEUE_WAIT_SECONDS, LLM_REJECTED, LLM_RETRIES
+
+logger = logging.getLogger(__name__)
+
+# HTTP statuses worth retrying: rate limiting and server-side failures
+_TRANSIENT_CODES = {408, 429, 500, 502, 503, 504}
+
+
+class LLMDeadlineExceeded(TimeoutError):
+    """The call could not be admitted or completed before the caller's deadline."""
+
+
+def _is_transient(error: Exception) -> bool:
+    """429s, 5xx and connection problems are retried; bad requests and auth errors are not."""
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    code = getattr(error, "code", None) or getattr(error, "status_code", None)
+    if isinstance(code, int):
+        return code in _TRANSIENT_CODES
+    return type(error).__name__ in ("ResourceExhausted", "ServiceUnavailable", "DeadlineExceeded")
+
+
+class TokenBucket:
+    """Allows `rate` calls per second on average, with bursts of up to `burst`."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = float(burst)
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, deadline: float) -> bool:
+        """Take one token, waiting for it if needed. False if it would not arrive before `deadline`."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now >= deadline:
+                    return False
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+class LLMDispatcher(BaseLLM):
+    """Wraps a backend with admission control, rate limiting and retries."""
+
+    def __init__(
+            self,
+            inner: BaseLLM,
+            max_in_flight: Optional[int] = None,
+            rate_per_second: Optional[float] = None,
+            burst: Optional[int] = None,
+    ):
+        self.inner = inner
+        self.model_name = inner.model_name
+        self.temperature = inner.temperature
+        self.max_in_flight = max_in_flight or settings.LLM_MAX_IN_FLIGHT
+        self.bucket = TokenBucket(rate_per_second or settings.LLM_RATE_PER_SECOND, burst or settings.LLM_BURST)
+        self._cond = threading.Condition()
+        self._waiting = []  # heap of (priority, ticket)
+        self._tickets = itertools.count()
+        self._in_flight = 0
+
+    def invoke(
+            self, prompt: str, json_mode: bool = False, priority: int = PRIORITY_DECISION,
+            deadline: Optional[float] = None,
+    ) -> str:
+        deadline = deadline or time.monotonic() + settings.LLM_DEFAULT_DEADLINE_SECONDS
+        self._admit(priority, deadline)
+        try:
+            return self._call_with_retries(prompt, json_mode, priority, deadline)
+        finally:
+            with self._cond:
+                self._in_flight -= 1
+                LLM_IN_FLIGHT.set(self._in_flight)
+                self._cond.notify_all()
+
+    def _admit(self, priority: int, deadline: float):
+        """Wait for a free in-flight slot; lower `priority` values go first, FIFO within a priority."""
+        if deadline - time.monotonic() <= 0:
+            # A free slot must not admit a call that is already too late to be useful
+            LLM_REJECTED.labels("queue_deadline").inc()
+            raise LLMDeadlineExceeded(f"LLM call reached the dispatcher past its deadline (priority {priority})")
+        entry = (priority, next(self._tickets))
+        start = time.monotonic()
+        with self._cond:
+            heapq.heappush(self._waiting, entry)
+            LLM_QUEUE_DEPTH.set(len(self._waiting))
+            try:
+                while self._waiting[0] != entry or self._in_flight >= self.max_in_flight:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._waiting.remove(entry)
+                        heapq.heapify(self._waiting)
+                        LLM_REJECTED.labels("queue_deadline").inc()
+                        raise LLMDeadlineExceeded(f"LLM call not admitted within its deadline (priority {priority})")
+                    self._cond.wait(timeout=remaining)
+                heapq.heappop(self._waiting)
+                self._in_flight += 1
+                LLM_IN_FLIGHT.set(self._in_flight)
+            finally:
+                LLM_QUEUE_DEPTH.set(len(self._waiting))
+                # The next waiter may now be at the head of the queue
+                self._cond.notify_all()
+        LLM_QUEUE_WAIT_SECONDS.labels(str(priority)).observe(time.monotonic() - start)
+
+    def _call_with_retries(self, prompt: str, json_mode: bool, priority: int, deadline: float) -> str:
+        delay = settings.LLM_RETRY_BASE_SECONDS
+        for attempt in range(1, settings.LLM_MAX_ATTEMPTS + 1):
+            if not self.bucket.acquire(deadline):
+                LLM_REJECTED.labels("rate_deadline").inc()
+                raise LLMDeadlineExceeded("LLM rate limit would delay the call past its deadline")
+            try:
+                return self.inner.invoke(prompt, json_mode=json_mode, priority=priority, deadline=deadline)
+            except Exception as e:
+                if attempt == settings.LLM_MAX_ATTEMPTS or not _is_transient(e):
+                    raise
+                # Full jitter spreads the retries of many callers that failed together
+                sleep_for = random.uniform(0, min(delay, settings.LLM_RETRY_MAX_SECONDS))
+                if time.monotonic() + sleep_for >= deadline:
+                    LLM_REJECTED.labels("retry_deadline").inc()
+                    raise
+                LLM_RETRIES.inc()
+                logger.warning(
+                    f"Transient LLM error (attempt {attempt}/{settings.LLM_MAX_ATTEMPTS}): {e}. "
+                    f"Retrying in {sleep_for:.2f}s"
+                )
+                time.sleep(sleep_for)
+                delay *= 2
@@ -0,0 +1,109 @@
+# app/agents/prefetch.py
+"""
+Speculative Prefetch:
+- While the agent waits on an LLM decision, the files named in the latest retrieval
+  results are loaded (and their outlines built) in the background
+- Loaded files live in a per-request PrefetchCache, so a follow-up get_specific_file,
+  get_file_outline or get_file_lines call on one of them returns without a fetch
+- Cost is bounded: at most PREFETCH_MAX_FILES files per request, PREFETCH_WORKERS loads
+  process-wide, and loads nobody asked for are cancelled when the request ends
+"""
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Optional, Tuple
+
+from app.config import settings
+from app.metrics import PREFETCH_FILES, PREFETCH_LOOKUPS
+
+logger = logging.getLogger(__name__)
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.PREFETCH_WORKERS, thread_name_prefix="prefetch")
+        return _executor
+
+
+class PrefetchCache:
+    """Files speculatively loaded for one request, keyed by (repo_id, file_path)."""
+
+    def __init__(self, max_files: Optional[int] = None):
+        self.max_files = settings.PREFETCH_MAX_FILES if max_files is None else max_files
+        self._futures: Dict[Tuple[int, str], Future] = {}
+        self._used = set()
+        self._lock = threading.Lock()
+
+    def submit(self, repo_id: int, file_path: str, load: Callable[[], Tuple[str, Optional[str]]]) -> bool:
+        """Start loading a file unless it is already scheduled or the request's budget is spent."""
+        key = (repo_id, file_path)
+        with self._lock:
+            if key in self._futures:
+                return False
+            if len(self._futures) >= self.max_files:
+                PREFETCH_FILES.labels("skipped").inc()
+                return False
+            self._futures[key] = _get_executor().submit(load)
+        PREFETCH_FILES.labels("scheduled").inc()
+        return True
+
+    def get(self, repo_id: int, file_path: str) -> Optional[Tuple[str, Optional[str]]]:
+        """
+        (content, indexed hash) of a prefetched file, waiting for a load still in flight.
+        None when the file was not prefetched or its load failed.
+        """
+        with self._lock:
+            future = self._futures.get((repo_id, file_path))
+        if future is None:
+            PREFETCH_LOOKUPS.labels("miss").inc()
+            return None
+        PREFETCH_LOOKUPS.labels("hit" if future.done() else "wait").inc()
+        try:
+            result = future.result(timeout=settings.PREFETCH_WAIT_SECONDS)
+        except Exception as e:
+            logger.info(f"Prefetch of '{file_path}' not usable ({e!r}); reading it directly")
+            return None
+        with self._lock:
+            self._used.add((repo_id, file_path))
+        return result
+
+    def close(self):
+        """Cancel loads that have not started and count the ones nobody used."""
+        with self._lock:
+            for key, future in self._futures.items():
+                if key in self._used:
+                    PREFETCH_FILES.labels("used").inc()
+                elif future.cancel():
+                    PREFETCH_FILES.labels("cancelled").inc()
+                else:
+                    PREFETCH_FILES.labels("unused").inc()
+            self._futures.clear()
+
+
+_current_prefetch: ContextVar[Optional[PrefetchCache]] = ContextVar("coderag_prefetch", default=None)
+
+
+def current_prefetch() -> Optional[PrefetchCache]:
+    return _current_prefetch.get()
+
+
+@contextmanager
+def prefetch_scope():
+    """Make a fresh PrefetchCache current for everything run inside this block (no-op when disabled)."""
+    if not settings.PREFETCH_ENABLED:
+        yield None
+        return
+    cache = PrefetchCache()
+    token = _current_prefetch.set(cache)
+    try:
+        yield cache
+    finally:
+        _current_prefetch.reset(token)
+        cache.close()
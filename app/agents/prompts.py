@@ -13,12 +13,14 @@ Here is the current thought or question you need to address:
 **Your Task:**
 Decide which action to take next. Your options are:
 1.  Call the `get_more_context` tool if you need to find relevant code snippets semantically. This is useful for general questions or when you don't know the exact file path.
-2.  Call the `get_specific_file` tool if the user's question or the context clearly points to a specific file path.
-3.  Choose the `answer` action if you have enough information to answer the user's question directly.
+2.  Call the `get_file_outline` tool if the context points to a specific file and you need to know what it contains.
+3.  Call the `get_file_lines` tool to read only the part of a file you need: a `member` name from the outline, or a `start_line`/`end_line` range.
+4.  Call the `get_specific_file` tool only if you really need an entire (small) file.
+5.  Choose the `answer` action if you have enough information to answer the user's question directly.
 
 **Output Format:**
 You MUST respond with a single, valid JSON object that contains two keys: "action" and "tool_input".
-- `action`: A string, either "get_more_context", "get_specific_file", or "answer".
+- `action`: A string, one of "get_more_context", "get_file_outline", "get_file_lines", "get_specific_file", or "answer".
 - `tool_input`: A JSON object containing the parameters for the chosen tool. If the action is "answer", provide an "answer" key with your response.
 
 **Example 1: Using get_more_context**
@@ -31,17 +33,28 @@ You MUST respond with a single, valid JSON object that contains two keys: "actio
 }}
 ```
 
-**Example 2: Using get_specific_file**
+**Example 2: Using get_file_outline**
 ```json
 {{
-  "action": "get_specific_file",
+  "action": "get_file_outline",
   "tool_input": {{
     "file_path": "src/main/java/com/karthik/resume/backend/config/SecurityConfig.java"
   }}
 }}
 ```
 
-**Example 3: Answering directly**
+**Example 3: Reading one method with get_file_lines**
+```json
+{{
+  "action": "get_file_lines",
+  "tool_input": {{
+    "file_path": "src/main/java/com/karthik/resume/backend/config/SecurityConfig.java",
+    "member": "SecurityConfig.securityFilterChain"
+  }}
+}}
+```
+
+**Example 4: Answering directly**
 ```json
 {{
   "action": "answer",
@@ -52,4 +65,17 @@ You MUST respond with a single, valid JSON object that contains two keys: "actio
 ```
 
 Now, based on the question provided, generate your response.
-"""
\ No newline at end of file
+"""
+
+# Sent after an unusable decision. It carries no retrieved context, so it is much cheaper
+# than repeating the decision prompt.
+DECISION_REPAIR_PROMPT = """
+Your previous reply could not be used: {error}.
+
+Reply with ONLY one JSON object and no other text:
+{{"action": <one of "get_more_context", "get_file_outline", "get_file_lines", "get_specific_file", "answer">,
+ "tool_input": {{<the tool's arguments; for "answer", an "answer" key with your response>}}}}
+
+Your previous reply was:
+{previous}
+"""
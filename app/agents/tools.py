@@ -1,49 +1,77 @@
 from __future__ import annotations
 
 import logging
-from typing import Dict, List, Any
+import threading
+from typing import Dict, List, Any, Optional, Tuple
 
+from app.agents.prefetch import current_prefetch
 from app.retrieval.retriever import Retriever
 from app.db import crud
 from app.ingestion.data_providers import LocalDataProvider, GitLabDataProvider
+from app.ingestion.file_cache import file_cache
+from app.ingestion.hashing import Hasher
+from app.ingestion.parser.base import BaseParser
+from app.ingestion.parser.java_parser import JavaParser
+from app.retrieval.file_slicer import FileView, file_views
 
 logger = logging.getLogger(__name__)
 
+# Upper bound on lines returned by one get_file_lines call
+MAX_SLICE_LINES = 200
+
+_parsers: Dict[str, BaseParser] = {}
+_parsers_lock = threading.Lock()
+
 
 class AgentTools:
     """
     Wraps concrete tool functions the agent can call.
     Kept simple (direct callables) so we don't need runtime tool-binding magic.
     """
-    def __init__(self, db, vectorstore: ChromaVectorStore):
+    def __init__(self, db, vectorstore: ChromaVectorStore, branch: Optional[str] = None):
         self.db = db
         self.vectorstore = vectorstore
+        # Branch to answer from; None means each repo's default branch
+        self.branch = branch
         self.retriever = Retriever(vectorstore=vectorstore)
 
     def get_tools(self) -> Dict[str, callable]:
-        def get_more_context(*, query: str, repo_id: str, top_k: int = 5) -> str:
+        def get_more_context(*, query: str, repo_id: str, top_k: int = 5, deadline: Optional[float] = None) -> str:
             """
             Semantic retrieval over the indexed chunks for a given repo.
-            Returns stitched snippets with file hints.
+            Returns stitched snippets with file hints. `deadline` (set by the agent) bounds re-ranking.
             """
             logger.info(f"Tool 'get_more_context' called with query: '{query}' for repo_id: {repo_id}")
             try:
                 repo_id_int = int(repo_id)
             except (ValueError, TypeError):
                 return f"Error: Invalid repo_id '{repo_id}'. Must be an integer."
+            repo = crud.get_repo_by_id(self.db, repo_id_int)
             results: List[Dict[str, Any]] = self.retriever.get_formatted_context(
                 query=query,
                 top_k=top_k,
-                repo_id=repo_id_int
+                repo_id=repo_id_int,
+                branch=self.branch or (repo.branch if repo else None),
+                deadline=deadline,
             )
             if not results:
                 return "No relevant context found in the repository."
+            if repo:
+                # The next decision often asks for one of these files; start loading them now
+                self._prefetch(repo, [r.get("metadata", {}).get("file_id") for r in results])
+            # Chunks reference their file's imports by ID; show each file's imports once, with its first snippet
+            imports = crud.get_import_blocks(self.db, (r.get("metadata", {}).get("imports_id") for r in results))
+            shown_imports = set()
             # Format the results into a single string
             stitched_context = ""
             for i, result in enumerate(results):
                 metadata = result.get("metadata", {})
                 file_path = metadata.get("file_id", "Unknown file")
                 content = result.get("content", "No content")
+                imports_id = metadata.get("imports_id")
+                if imports_id in imports and file_path not in shown_imports:
+                    shown_imports.add(file_path)
+                    content = f"{imports[imports_id]}\n\n{content}"
                 stitched_context += f"--- Snippet {i + 1} from file: {file_path} --- and repo_id: {repo_id}\n"
                 stitched_context += f"{content}\n\n"
 
@@ -52,25 +80,139 @@ class AgentTools:
 
         def get_specific_file(*, file_path: str, repo_id: str) -> str:
             """
-            Fetch the raw contents of a concrete file path from the repo source (local or Git remote).
+            Fetch the raw contents of a concrete file path.
+            Served from the indexer-filled file cache when possible, else from the repo source.
             """
-            repo = crud.get_repo_by_id(self.db, repo_id)
-            provider = (
-                GitLabDataProvider(repo.url)
-                if isinstance(repo.url, str) and repo.url.startswith("http")
-                else LocalDataProvider(repo.url)
-            )
             try:
-                return provider.get_file_content(file_path)
+                content, _ = self._read_file(file_path, repo_id)
+                return content
             except Exception as e:
                 return f"Error fetching file '{file_path}': {e}"
 
+        def get_file_outline(*, file_path: str, repo_id: str) -> str:
+            """
+            Compact outline of a file: type and method signatures with their line ranges.
+            """
+            try:
+                view = self._file_view(file_path, repo_id)
+            except Exception as e:
+                return f"Error fetching file '{file_path}': {e}"
+            if not view.outline:
+                return f"No outline available for '{file_path}' ({view.lines.line_count} lines)."
+            return f"Outline of {file_path} ({view.lines.line_count} lines):\n{view.render_outline()}"
+
+        def get_file_lines(
+            *,
+            file_path: str,
+            repo_id: str,
+            start_line: int | None = None,
+            end_line: int | None = None,
+            member: str | None = None,
+        ) -> str:
+            """
+            Return a line range of a file, or the lines of a named member (`method` or `Class.method`).
+            """
+            try:
+                view = self._file_view(file_path, repo_id)
+            except Exception as e:
+                return f"Error fetching file '{file_path}': {e}"
+            if member:
+                entry = view.find_member(member)
+                if not entry:
+                    return f"Member '{member}' not found in '{file_path}'. Outline:\n{view.render_outline()}"
+                start_line, end_line = entry["start_line"], entry["end_line"]
+            try:
+                start = int(start_line) if start_line is not None else 1
+                end = int(end_line) if end_line is not None else start + MAX_SLICE_LINES - 1
+            except (TypeError, ValueError):
+                return f"Error: start_line and end_line must be integers, got {start_line!r} and {end_line!r}."
+            end = min(end, start + MAX_SLICE_LINES - 1)
+            start, end = view.lines.clamp(start, end)
+            return f"{file_path} lines {start}-{end} of {view.lines.line_count}:\n{view.render_lines(start, end)}"
+
         # Expose as a dict for explicit access
         return {
             "get_more_context": get_more_context,
             "get_specific_file": get_specific_file,
+            "get_file_outline": get_file_outline,
+            "get_file_lines": get_file_lines,
         }
 
+    def _read_file(self, file_path: str, repo_id) -> Tuple[str, Optional[str]]:
+        """
+        Return (content, indexed content hash) of a repo file.
+        The hash is None when the file was never indexed.
+        """
+        repo = crud.get_repo_by_id(self.db, repo_id)
+        if not repo:
+            raise ValueError(f"Unknown repo_id '{repo_id}'")
+        prefetch = current_prefetch()
+        if prefetch is not None:
+            prefetched = prefetch.get(repo.id, file_path)
+            if prefetched is not None:
+                logger.info(f"Serving '{file_path}' from the request's prefetch")
+                return prefetched
+        branch = self.branch or repo.branch
+        indexed_hash = crud.get_file_hash(self.db, repo, file_path, branch)
+        return _load_file(repo.id, repo.url, branch, file_path, indexed_hash)
+
+    def _prefetch(self, repo, file_paths: List[Optional[str]]):
+        """
+        Schedule background loads of `file_paths` into the request's prefetch cache.
+        Database lookups happen here, on the request thread; the loads only touch caches and the repo source.
+        """
+        prefetch = current_prefetch()
+        if prefetch is None:
+            return
+        repo_id, repo_url, branch = repo.id, repo.url, self.branch or repo.branch
+        for file_path in dict.fromkeys(p for p in file_paths if p):
+            indexed_hash = crud.get_file_hash(self.db, repo, file_path, branch)
+
+            def load(file_path=file_path, indexed_hash=indexed_hash):
+                content, content_hash = _load_file(repo_id, repo_url, branch, file_path, indexed_hash)
+                # Also build the outline, which get_file_outline and get_file_lines need
+                key = (str(repo_id), file_path, content_hash or Hasher.compute_hash(content))
+                file_views.get_or_build(key, content, _get_parser(file_path))
+                return content, content_hash
+
+            prefetch.submit(repo_id, file_path, load)
+
+    def _file_view(self, file_path: str, repo_id) -> FileView:
+        """Line index + outline of a file, shared across requests while its content is unchanged."""
+        content, content_hash = self._read_file(file_path, repo_id)
+        key = (str(repo_id), file_path, content_hash or Hasher.compute_hash(content))
+        return file_views.get_or_build(key, content, _get_parser(file_path))
+
+
+def _load_file(repo_id: int, repo_url: str, branch: Optional[str], file_path: str,
+               indexed_hash: Optional[str]) -> Tuple[str, Optional[str]]:
+    """(content, indexed hash) from the file cache, else from the repo source. Needs no database session."""
+    if indexed_hash:
+        cached = file_cache.get(repo_id, file_path, indexed_hash)
+        if cached is not None:
+            logger.info(f"Serving '{file_path}' from the file cache")
+            return cached, indexed_hash
+    # GitLab project handles are cached by the shared client, so this costs no extra round trip
+    provider = (
+        GitLabDataProvider(repo_url, branch=branch)
+        if isinstance(repo_url, str) and repo_url.startswith("http")
+        else LocalDataProvider(repo_url)
+    )
+    content = provider.get_file_content(file_path)
+    if indexed_hash and Hasher.compute_hash(content) == indexed_hash:
+        file_cache.put(repo_id, file_path, indexed_hash, content)
+    return content, indexed_hash
+
+
+def _get_parser(file_path: str) -> Optional[BaseParser]:
+    """Parsers are created lazily and shared, since loading a grammar is not free."""
+    ext = file_path.rsplit(".", 1)[-1]
+    # Prefetch workers ask for parsers too, so creation is guarded
+    with _parsers_lock:
+        if ext == "java" and ext not in _parsers:
+            _parsers[ext] = JavaParser()
+        return _parsers.get(ext)
+
 
 if __name__ == '__main__':
     logging.basicConfig(level=logging.INFO, format='%(asctime)s | %(levelname)s | %(name)s | %(message)s')
@@ -0,0 +1,48 @@
+# app/api/dependencies.py
+"""
+Shared API Components:
+- The vector store (and with it the embedding model) and the indexer are heavy, so they
+  are built on first use instead of at import, and shared by every route
+"""
+import logging
+import threading
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_vectorstore = None
+_indexer = None
+
+
+def get_vectorstore():
+    """FastAPI dependency returning the process-wide ChromaVectorStore."""
+    global _vectorstore
+    with _lock:
+        if _vectorstore is None:
+            from app.vectorstore.chroma import ChromaVectorStore
+            _vectorstore = ChromaVectorStore()
+        return _vectorstore
+
+
+def get_indexer():
+    """FastAPI dependency returning the process-wide Indexer."""
+    global _indexer
+    vectorstore = get_vectorstore()
+    with _lock:
+        if _indexer is None:
+            from app.ingestion.indexer import Indexer
+            _indexer = Indexer(vectorstore)
+        return _indexer
+
+
+def warm_up():
+    """Build the shared components and load the embedding model so the first request is fast."""
+    logger.info("Warming up vector store and embedding model...")
+    get_vectorstore().embedding_model.warmup()
+    get_indexer()
+    if settings.RERANK_ENABLED:
+        from app.retrieval.reranker import reranker
+        reranker.warmup()
+    logger.info("Warm-up complete")
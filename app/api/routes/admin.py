@@ -0,0 +1,39 @@
+# app/api/routes/admin.py
+"""
+Admin Routes:
+- List and download request profiles captured by the opt-in profiler
+- Closed unless ADMIN_TOKEN is set: profiles expose stack samples and code paths
+"""
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import FileResponse
+
+from app.config.settings import ADMIN_TOKEN
+from app.profiling import profile_store
+
+
+def require_admin(x_admin_token: str | None = Header(default=None)):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin routes are disabled (ADMIN_TOKEN is not set)")
+    if x_admin_token != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+
+router = APIRouter(prefix="/admin", tags=["Admin"], dependencies=[Depends(require_admin)])
+
+
+@router.get("/profiles")
+def list_profiles():
+    """List captured profiles, newest first."""
+    return {"profiles": profile_store.list()}
+
+
+@router.get("/profiles/{profile_id}")
+def download_profile(profile_id: str):
+    """Download a profile in folded-stack format (flamegraph.pl, speedscope, inferno)."""
+    if not profile_store.exists(profile_id):
+        raise HTTPException(status_code=404, detail=f"Profile '{profile_id}' not found")
+    return FileResponse(
+        profile_store.path(profile_id),
+        media_type="text/plain",
+        filename=f"coderag-{profile_id}.folded",
+    )
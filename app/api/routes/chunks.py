@@ -2,18 +2,118 @@
 """
 Chunk Routes:
 - Expose API for inspecting indexed chunks
+- Pages are fetched from the store with limit/offset and filters applied by the store,
+  so memory stays proportional to the page size, not the repository
+- `format=ndjson` streams every matching chunk, one JSON object per line
 """
+import base64
+import json
+from typing import Dict, Iterator, Optional
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from app.vectorstore.chroma import ChromaVectorStore
-from app.db import session
+from app.api.dependencies import get_vectorstore
+from app.db import crud, session
 
 router = APIRouter(prefix="/chunks", tags=["Chunks"])
-vectorstore = ChromaVectorStore()
 
-@router.get("/{repo_url}")
-def list_chunks_for_repo(repo_url: str):
-    """List all chunks indexed for a repository by its URL."""
-    results = vectorstore.vectorstore.get(where={"repo_id": repo_url})
-    return {"count": len(results.get('ids', [])), "chunks": results}
+ALLOWED_FIELDS = {"ids", "metadata", "content"}
+# Chunks fetched per store call while streaming
+STREAM_PAGE_SIZE = 500
+
+
+def _encode_cursor(offset: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps({"offset": offset}).encode()).decode()
+
+
+def _decode_cursor(cursor: Optional[str]) -> int:
+    if not cursor:
+        return 0
+    try:
+        offset = json.loads(base64.urlsafe_b64decode(cursor.encode()))["offset"]
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(offset, int) or offset < 0:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return offset
+
+
+def _parse_fields(fields: str) -> set:
+    requested = {field.strip() for field in fields.split(",") if field.strip()}
+    unknown = requested - ALLOWED_FIELDS
+    if unknown:
+        raise HTTPException(
+            status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}. Allowed: ids, metadata, content"
+        )
+    return requested | {"ids"}
+
+
+def _rows(page: Dict, fields: set) -> Iterator[Dict]:
+    metadatas = page.get("metadatas") or []
+    documents = page.get("documents") or []
+    for i, chunk_id in enumerate(page["ids"]):
+        row = {"id": chunk_id}
+        if "metadata" in fields:
+            row["metadata"] = metadatas[i]
+        if "content" in fields:
+            row["content"] = documents[i]
+        yield row
+
+
+@router.get("/{repo_url:path}")
+def list_chunks_for_repo(
+    repo_url: str,
+    limit: int = Query(100, ge=1, le=1000, description="Chunks per page"),
+    cursor: Optional[str] = Query(None, description="`next_cursor` of the previous page"),
+    fields: str = Query("ids,metadata", description="Comma-separated projection: ids, metadata, content"),
+    file_path: Optional[str] = Query(None, description="Only chunks of this file"),
+    class_context: Optional[str] = Query(None, description="Only chunks of this class"),
+    branch: Optional[str] = Query(None, description="Only chunks on this branch"),
+    response_format: str = Query(
+        "json", alias="format", pattern="^(json|ndjson)$", description="`ndjson` streams all matching chunks"
+    ),
+    db: Session = Depends(session.get_db),
+    vectorstore=Depends(get_vectorstore),
+):
+    """List the chunks indexed for a repository by its URL, one page at a time."""
+    repo = crud.get_repo(db, repo_url)
+    if not repo:
+        raise HTTPException(status_code=404, detail=f"Repository not found: {repo_url}")
+    projection = _parse_fields(fields)
+    offset = _decode_cursor(cursor)
+    filters = {}
+    if file_path:
+        filters["file_id"] = file_path
+    if class_context:
+        filters["class_context"] = class_context
+
+    def fetch(page_offset: int, page_size: int) -> Dict:
+        return vectorstore.list_chunks(
+            repo.id,
+            limit=page_size,
+            offset=page_offset,
+            filters=filters,
+            branch=branch,
+            include_content="content" in projection,
+            include_metadata="metadata" in projection,
+        )
+
+    if response_format == "ndjson":
+        def stream() -> Iterator[str]:
+            page_offset = offset
+            while True:
+                page = fetch(page_offset, STREAM_PAGE_SIZE)
+                for row in _rows(page, projection):
+                    yield json.dumps(row) + "\n"
+                if len(page["ids"]) < STREAM_PAGE_SIZE:
+                    return
+                page_offset += STREAM_PAGE_SIZE
+
+        return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+    page = fetch(offset, limit)
+    chunks = list(_rows(page, projection))
+    # Offsets are only stable while the repo is not being re-indexed
+    next_cursor = _encode_cursor(offset + len(chunks)) if len(chunks) == limit else None
+    return {"count": len(chunks), "chunks": chunks, "next_cursor": next_cursor}
@@ -4,32 +4,85 @@ Query Routes:
 - Accept user queries
 - Route them to CoderagAgent (Agentic-RAG loop: decide → retrieve → grade → rewrite? → answer)
 """
-from fastapi import APIRouter, Depends, HTTPException
+import asyncio
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from pydantic import BaseModel, Field
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
 from app.db import session
-from app.vectorstore.chroma import ChromaVectorStore
+from app.api.dependencies import get_vectorstore
 from app.agents.tools import AgentTools
 from app.agents.coderag_agent import CoderagAgent
+from app.agents.deadline import Deadline, QueryCancelled
+from app.config import settings
+from app.metrics import AGENT_EARLY_STOPS, start_trace
+from app.profiling import PROFILE_ID_HEADER, profile_request, wants_profile
 
 router = APIRouter(prefix="/query", tags=["Queries"])
 
-vectorstore = ChromaVectorStore()
+# Non-standard "client closed request" status; nobody reads it, but it keeps access logs honest
+CLIENT_CLOSED_REQUEST = 499
 
 
 class QueryRequest(BaseModel):
     repo_id: int = Field(..., description="Internal repository ID")
     query: str = Field(..., min_length=2, description="User question")
+    branch: Optional[str] = Field(None, description="Branch to answer from (default: the repo's default branch)")
+    trace: bool = Field(False, description="Attach per-stage timing spans to the response meta")
+    timeout_seconds: Optional[float] = Field(
+        None,
+        gt=0,
+        le=settings.QUERY_MAX_TIMEOUT_SECONDS,
+        description=f"Time budget for the answer (default {settings.QUERY_TIMEOUT_SECONDS}s)",
+    )
+
+
+async def _cancel_on_disconnect(http_request: Request, deadline: Deadline):
+    """Poll the connection and cancel the query's deadline once the client is gone."""
+    while not deadline.expired:
+        if await http_request.is_disconnected():
+            deadline.cancel()
+            return
+        await asyncio.sleep(settings.QUERY_DISCONNECT_POLL_SECONDS)
 
 
 @router.post("/", summary="Process a query against a repository")
-def process_query(request: QueryRequest, db: Session = Depends(session.get_db)):
+async def process_query(
+    request: QueryRequest,
+    http_request: Request,
+    response: Response,
+    db: Session = Depends(session.get_db),
+    vectorstore=Depends(get_vectorstore),
+):
     """
     Submit a query to a specific repository. Returns an Agentic-RAG structured result.
+    Send `X-Coderag-Profile: 1` (or `?profile=true`) to capture a profile of this request.
+    The answer is bounded by `timeout_seconds`; a result with status "partial" was cut short.
+    Work stops when the client disconnects.
     """
-    tools = AgentTools(db=db, vectorstore=vectorstore)
+    tools = AgentTools(db=db, vectorstore=vectorstore, branch=request.branch)
     agent = CoderagAgent(tools=tools)
+    deadline = Deadline(request.timeout_seconds or settings.QUERY_TIMEOUT_SECONDS)
+    enabled = wants_profile(http_request.headers, http_request.query_params)
+
+    def run():
+        # Runs on a worker thread: the profiler samples that thread and the trace lives in its context
+        with profile_request(enabled, label="query") as profile_id:
+            if profile_id:
+                response.headers[PROFILE_ID_HEADER] = profile_id
+            if request.trace:
+                with start_trace():
+                    return agent.handle_query(query=request.query, repo_id=request.repo_id, deadline=deadline)
+            return agent.handle_query(query=request.query, repo_id=request.repo_id, deadline=deadline)
 
-    result = agent.handle_query(query=request.query, repo_id=request.repo_id)
-    return result
+    watcher = asyncio.create_task(_cancel_on_disconnect(http_request, deadline))
+    try:
+        return await run_in_threadpool(run)
+    except QueryCancelled:
+        AGENT_EARLY_STOPS.labels("cancelled").inc()
+        return Response(status_code=CLIENT_CLOSED_REQUEST)
+    finally:
+        watcher.cancel()
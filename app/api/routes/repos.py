@@ -1,47 +1,77 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request, Response
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 import logging
 
-from app.ingestion.indexer import Indexer
+from app.api.dependencies import get_indexer, get_vectorstore
 from app.db import crud, session
-from app.vectorstore.chroma import ChromaVectorStore
-from app.config.logging_config import setup_logging
+from app.ingestion.file_cache import file_cache
+from app.profiling import PROFILE_ID_HEADER, profile_request, wants_profile
 
-# Setup logging
-setup_logging()
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/repos", tags=["Repositories"])
-vectorstore = ChromaVectorStore()
-indexer = Indexer(vectorstore)
 
 class RepoCreateRequest(BaseModel):
     project_path: str
+    # New repos: the default branch. Existing repos: the branch to (re)index, which only
+    # embeds files whose content is not already indexed on another branch.
     branch: str | None = None
 
 @router.post("/")
-def add_or_reindex_repo(request: RepoCreateRequest, db: Session = Depends(session.get_db)):
+def add_or_reindex_repo(
+    request: RepoCreateRequest,
+    http_request: Request,
+    response: Response,
+    db: Session = Depends(session.get_db),
+    indexer=Depends(get_indexer),
+):
+    enabled = wants_profile(http_request.headers, http_request.query_params)
+    with profile_request(enabled, label="index") as profile_id:
+        if profile_id:
+            response.headers[PROFILE_ID_HEADER] = profile_id
+        return _add_or_reindex(request, db, indexer)
+
+def _add_or_reindex(request: RepoCreateRequest, db: Session, indexer):
     repo = crud.get_repo(db, request.project_path)
     try:
         if repo:
-            logger.info(f"Reindexing repository: {request.project_path}")
-            indexer.reindex_project(repo.url, repo.branch)
-            return {"message": "Repository reindexed successfully", "repo_id": repo.id}
+            branch = request.branch or repo.branch
+            logger.info(f"Reindexing repository: {request.project_path} ({branch})")
+            indexer.reindex_project(repo.url, branch)
+            return {"message": "Repository reindexed successfully", "repo_id": repo.id, "branch": branch}
         else:
             logger.info(f"Adding and indexing new repository: {request.project_path}")
             indexer.index_project(request.project_path, request.branch)
             new_repo = crud.get_repo(db, request.project_path)
             return {"message": "Repository added and indexed successfully", "repo_id": new_repo.id}
     except Exception as e:
+        # The repo and its checkpointed progress are kept; retrying this request resumes the run.
         logger.error(f"Indexing failed for {request.project_path}: {str(e)}")
-        if not repo:
-            crud.delete_repo(db, request.project_path)
-            logger.info(f"Deleted partially indexed repository: {request.project_path}")
-        raise HTTPException(status_code=500, detail=f"Indexing failed: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Indexing failed: {str(e)}. Retry the request to resume from the last checkpoint.",
+        )
 
 @router.get("/")
 def list_repos(db: Session = Depends(session.get_db)):
     repos = crud.list_repos(db)
     logger.info(f"Listing all repositories, count: {len(repos)}")
     return {"repos": repos}
+
+@router.get("/{repo_id}/branches")
+def list_branches(repo_id: int, db: Session = Depends(session.get_db)):
+    repo = crud.get_repo_by_id(db, repo_id)
+    if not repo:
+        raise HTTPException(status_code=404, detail=f"Repository not found: {repo_id}")
+    return {"default_branch": repo.branch, "branches": crud.list_branches(db, repo_id)}
+
+@router.delete("/{repo_id}")
+def delete_repo(repo_id: int, db: Session = Depends(session.get_db), vectorstore=Depends(get_vectorstore)):
+    repo = crud.get_repo_by_id(db, repo_id)
+    if not repo:
+        raise HTTPException(status_code=404, detail=f"Repository not found: {repo_id}")
+    crud.delete_repo(db, repo.url, vectorstore=vectorstore)
+    file_cache.drop_repo(repo_id)
+    logger.info(f"Deleted repository {repo.url} (ID: {repo_id})")
+    return {"message": "Repository deleted", "repo_id": repo_id}
@@ -3,16 +3,48 @@
 FastAPI Server:
 - Exposes REST API endpoints for UI/frontend
 - Routes defined in `api/routes`
+- Start-up creates the schema and (optionally) warms up the embedding model; heavy
+  components are otherwise built lazily so importing this module stays fast
+- With WATCH_LOCAL_REPOS, registered local repos are watched and reindexed as files change
 """
-from fastapi import FastAPI
+import threading
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
-from app.api.routes import repos, chunks, queries
-from app.db.init_db import *
+from app.api.dependencies import get_indexer, warm_up
+from app.api.routes import repos, chunks, queries, admin
+from app.config import settings
+from app.config.logging_config import setup_logging
+from app.db.init_db import init_db
+from app.ingestion.watcher import RepoWatcher
+from app.metrics import render_metrics
+
+setup_logging()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    init_db()
+    if settings.WARMUP_ON_STARTUP:
+        if settings.WARMUP_IN_BACKGROUND:
+            threading.Thread(target=warm_up, name="warmup", daemon=True).start()
+        else:
+            warm_up()
+    watcher = None
+    if settings.WATCH_LOCAL_REPOS:
+        watcher = RepoWatcher(get_indexer)
+        watcher.start()
+    yield
+    if watcher is not None:
+        watcher.stop()
+
 
 app = FastAPI(
     title="CodeRAG API",
     description="API for indexing code repositories and answering questions about them.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -27,6 +59,13 @@ app.add_middleware(
 def read_root():
     return {"status": "ok"}
 
+@app.get("/metrics", tags=["Health Check"])
+def metrics():
+    """Prometheus scrape endpoint: stage latency histograms and indexing counters."""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
 app.include_router(repos.router)
 app.include_router(chunks.router)
 app.include_router(queries.router)
+app.include_router(admin.router)
@@ -1,7 +1,14 @@
 import logging
 
+_configured = False
+
 def setup_logging():
+    """Configure root logging once. Called by entry points (server, scripts), not at library import."""
+    global _configured
+    if _configured:
+        return
     logging.basicConfig(
         level=logging.INFO,
         format="%(asctime)s | %(name)s | %(levelname)s | %(message)s"
     )
+    _configured = True
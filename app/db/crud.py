@@ -1,7 +1,14 @@
-from typing import Optional, List
+import json
+from datetime import datetime, timedelta
+from typing import Optional, List, Dict, Iterable, Set, Tuple
+from sqlalchemy import or_
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session
 from . import models
 
+# Rows per INSERT ... ON CONFLICT statement (3 params per row keeps SQLite under its 999 variable limit)
+UPSERT_BATCH_SIZE = 300
+
 # ------------------- Repo -------------------
 def get_repo(db: Session, repo_url: str) -> Optional[models.Repo]:
     return db.query(models.Repo).filter(models.Repo.url == repo_url).first()
@@ -9,35 +16,187 @@ def get_repo(db: Session, repo_url: str) -> Optional[models.Repo]:
 def get_repo_by_id(db: Session, repo_id: str) -> Optional[models.Repo]:
     return db.query(models.Repo).filter(models.Repo.id == repo_id).first()
 
-def create_repo(db: Session, project_path: str, branch: str) -> models.Repo:
+def create_repo(db: Session, project_path: str, branch: str, vectorstore=None) -> models.Repo:
+    """Create the repo row and, when a vector store is given, the repo's collection."""
     repo_name = project_path.rstrip("/").split("/")[-1]
     repo = models.Repo(name=repo_name, url=project_path, branch=branch or "main")
     db.add(repo)
     db.commit()
     db.refresh(repo)
+    if vectorstore is not None:
+        vectorstore.create_collection(repo.id)
     return repo
 
 def list_repos(db: Session) -> List[models.Repo]:
     return db.query(models.Repo).all()
 
-def delete_repo(db: Session, repo_url: str):
+def delete_repo(db: Session, repo_url: str, vectorstore=None):
+    """Delete the repo row (files and runs cascade) and, when a vector store is given, its collection."""
     repo = get_repo(db, repo_url)
     if repo:
+        if vectorstore is not None:
+            vectorstore.drop_collection(repo.id)
         db.delete(repo)
         db.commit()
 
 # ------------------- File & Hash -------------------
-def get_file(db: Session, repo_id: int, file_path: str) -> Optional[models.File]:
-    return db.query(models.File).filter(models.File.repo_id == repo_id, models.File.path == file_path).first()
+# Files are tracked per branch; `branch=None` means the repo's default branch.
+def get_file(db: Session, repo_id: int, file_path: str, branch: str) -> Optional[models.File]:
+    return db.query(models.File).filter(
+        models.File.repo_id == repo_id, models.File.branch == branch, models.File.path == file_path
+    ).first()
 
-def get_file_hash(db: Session, repo, file_path: str) -> Optional[str]:
-    file = get_file(db, repo.id, file_path)
+def get_file_hash(db: Session, repo, file_path: str, branch: Optional[str] = None) -> Optional[str]:
+    file = get_file(db, repo.id, file_path, branch or repo.branch)
     return file.hash if file else None
 
-def update_file_hash(db: Session, repo_id: int, file_path: str, new_hash: str):
-    file = get_file(db, repo_id, file_path)
+def update_file_hash(db: Session, repo_id: int, file_path: str, new_hash: str, branch: str):
+    file = get_file(db, repo_id, file_path, branch)
     if file:
         file.hash = new_hash
     else:
-        file = models.File(repo_id=repo_id, path=file_path, hash=new_hash)
+        file = models.File(repo_id=repo_id, branch=branch, path=file_path, hash=new_hash)
         db.add(file)
+
+# Directory prefixes OR-ed together per query when a lookup is scoped to changed paths
+_PREFIX_BATCH_SIZE = 50
+
+def _scoped(query, paths: Optional[Iterable[str]], prefixes: Iterable[str]):
+    """
+    Run `query` over every file row (`paths` None), or only the rows of `paths` and of the
+    files under the directory `prefixes`, in batches that stay under SQLite's variable limit.
+    """
+    if paths is None and not prefixes:
+        return query.all()
+    paths, prefixes = sorted(set(paths or ())), sorted(set(prefixes))
+    rows = []
+    for start in range(0, len(paths), UPSERT_BATCH_SIZE):
+        rows.extend(query.filter(models.File.path.in_(paths[start:start + UPSERT_BATCH_SIZE])).all())
+    for start in range(0, len(prefixes), _PREFIX_BATCH_SIZE):
+        batch = prefixes[start:start + _PREFIX_BATCH_SIZE]
+        rows.extend(query.filter(or_(*[models.File.path.like(p.rstrip("/") + "/%") for p in batch])).all())
+    return rows
+
+def get_file_hashes(
+        db: Session, repo_id: int, branch: str, paths: Optional[Iterable[str]] = None, prefixes: Iterable[str] = (),
+) -> Dict[str, str]:
+    """Load the manifest (path -> hash) of one branch, or only of some paths/directories of it."""
+    query = db.query(models.File.path, models.File.hash).filter(
+        models.File.repo_id == repo_id, models.File.branch == branch
+    )
+    return {path: file_hash for path, file_hash in _scoped(query, paths, prefixes)}
+
+def get_file_refs(
+        db: Session, repo_id: int, paths: Optional[Iterable[str]] = None, prefixes: Iterable[str] = (),
+) -> Dict[Tuple[str, str], Set[str]]:
+    """Map each (path, hash) indexed in a repo (or in some paths/directories) to the branches holding it."""
+    refs: Dict[Tuple[str, str], Set[str]] = {}
+    query = db.query(models.File.path, models.File.hash, models.File.branch).filter(models.File.repo_id == repo_id)
+    for path, file_hash, branch in _scoped(query, paths, prefixes):
+        refs.setdefault((path, file_hash), set()).add(branch)
+    return refs
+
+def list_branches(db: Session, repo_id: int) -> List[str]:
+    rows = db.query(models.File.branch).filter(models.File.repo_id == repo_id).distinct().all()
+    return sorted(branch for (branch,) in rows if branch)
+
+def upsert_file_hashes(
+        db: Session, repo_id: int, branch: str, file_hashes: Dict[str, str], batch_size: int = UPSERT_BATCH_SIZE
+):
+    """Insert or update many file hashes of a branch with batched INSERT ... ON CONFLICT statements. Does not commit."""
+    if not file_hashes:
+        return
+    insert = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+    rows = [
+        {"repo_id": repo_id, "branch": branch, "path": path, "hash": file_hash}
+        for path, file_hash in file_hashes.items()
+    ]
+    for start in range(0, len(rows), batch_size):
+        stmt = insert(models.File).values(rows[start:start + batch_size])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[models.File.repo_id, models.File.branch, models.File.path],
+            set_={"hash": stmt.excluded.hash},
+        )
+        db.execute(stmt)
+
+def delete_file_hashes(db: Session, repo_id: int, branch: str, paths: Iterable[str]):
+    """Remove paths from a branch's manifest. Does not commit."""
+    paths = list(paths)
+    for start in range(0, len(paths), UPSERT_BATCH_SIZE):
+        db.query(models.File).filter(
+            models.File.repo_id == repo_id,
+            models.File.branch == branch,
+            models.File.path.in_(paths[start:start + UPSERT_BATCH_SIZE]),
+        ).delete(synchronize_session=False)
+
+# ------------------- Import Blocks -------------------
+def add_import_blocks(db: Session, blocks: Dict[str, str]):
+    """Store import blocks by content address; already stored ones are left alone. Does not commit."""
+    if not blocks:
+        return
+    insert = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+    rows = [{"id": block_id, "content": content} for block_id, content in blocks.items()]
+    for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+        db.execute(insert(models.ImportBlock).values(rows[start:start + UPSERT_BATCH_SIZE]).on_conflict_do_nothing())
+
+def get_import_blocks(db: Session, block_ids: Iterable[str]) -> Dict[str, str]:
+    block_ids = [block_id for block_id in set(block_ids) if block_id]
+    if not block_ids:
+        return {}
+    rows = db.query(models.ImportBlock.id, models.ImportBlock.content).filter(models.ImportBlock.id.in_(block_ids))
+    return {block_id: content for block_id, content in rows}
+
+# ------------------- Index Runs -------------------
+def start_index_run(db: Session, repo_id: int, branch: str, full_index: bool) -> models.IndexRun:
+    run = models.IndexRun(repo_id=repo_id, branch=branch, full_index=full_index, status="running")
+    db.add(run)
+    db.commit()
+    db.refresh(run)
+    return run
+
+def get_interrupted_run(db: Session, repo_id: int, branch: str, stale_after_seconds: float) -> Optional[models.IndexRun]:
+    """
+    Return the latest run of a repo branch if it was interrupted: it failed, or it is still
+    "running" but has made no progress for `stale_after_seconds` (its process died).
+    A run that is still making progress belongs to a live process and is never returned.
+    """
+    run = (
+        db.query(models.IndexRun)
+        .filter(models.IndexRun.repo_id == repo_id, models.IndexRun.branch == branch)
+        .order_by(models.IndexRun.id.desc())
+        .first()
+    )
+    if run is None or run.status in ("completed", "superseded"):
+        return None
+    if run.status == "running" and run.updated_at > datetime.utcnow() - timedelta(seconds=stale_after_seconds):
+        return None
+    return run
+
+def get_pending_versions(run: models.IndexRun) -> List[Tuple[str, str]]:
+    """(path, hash) versions whose chunks the run stored but whose hashes it has not checkpointed yet."""
+    return [tuple(version) for version in json.loads(run.pending_versions or "[]")]
+
+def add_pending_versions(db: Session, run: models.IndexRun, versions: Iterable[Tuple[str, str]]):
+    """Record versions about to be stored ahead of their checkpoint, and commit before they are."""
+    merged = set(get_pending_versions(run)) | set(versions)
+    run.pending_versions = json.dumps(sorted(merged))
+    run.updated_at = datetime.utcnow()
+    db.commit()
+
+def checkpoint_index_run(db: Session, run: models.IndexRun, files_done: int, chunks_flushed: int):
+    """Record progress on a run. Committed together with the checkpoint's file hashes."""
+    run.files_done += files_done
+    run.chunks_flushed += chunks_flushed
+    run.updated_at = datetime.utcnow()
+
+def clear_pending_versions(run: models.IndexRun):
+    """The checkpoint being committed records the hashes of every version stored so far. Does not commit."""
+    run.pending_versions = None
+
+def finish_index_run(db: Session, run: models.IndexRun, status: str, error: Optional[str] = None):
+    run.status = status
+    run.error = error
+    run.updated_at = datetime.utcnow()
+    if status == "completed":
+        run.repo.last_indexed = run.updated_at
+    db.commit()
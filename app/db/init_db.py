@@ -1,9 +1,15 @@
 """
-Call this once on startup or in main.py to auto-create tables.
+Explicit schema setup, run by the API startup hook and `scripts/init_db.py`.
 """
-from app.db.session import Base, engine
-from app.db import models  # ensures all models are imported
+import logging
 
-# Create all tables if not exist
-Base.metadata.create_all(bind=engine)
-print("✅ Database tables created successfully!")
+from app.db.migrations import migrate
+from app.db.session import engine
+
+logger = logging.getLogger(__name__)
+
+
+def init_db():
+    """Bring the database schema up to date by applying any pending migrations."""
+    version = migrate(engine)
+    logger.info(f"Database ready (schema version {version})")
@@ -0,0 +1,112 @@
+# app/db/migrations.py
+"""
+Schema Migrations:
+- Numbered, ordered steps; the `schema_version` table records the last one applied
+- `migrate()` applies the pending steps, each in its own transaction, and is safe to run
+  on every startup and from several processes (Postgres takes an advisory lock; steps are
+  idempotent so a concurrent SQLite run is harmless)
+- Step 1 creates the baseline schema from the models. Every later step is explicit DDL,
+  never `Base.metadata`, so it does the same thing whatever the models look like by then
+"""
+import logging
+from typing import Callable, List, Tuple
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+
+from app.db.session import Base
+from app.db import models  # noqa: F401  (registers all models on Base)
+
+logger = logging.getLogger(__name__)
+
+# Arbitrary key for pg_advisory_xact_lock, shared by every process migrating this database
+_PG_LOCK_KEY = 0x636F646572616700
+
+
+def _baseline(conn: Connection):
+    """Tables of databases created before versioning; existing tables are left as they are."""
+    Base.metadata.create_all(bind=conn)
+
+
+def _add_branch_columns(conn: Connection):
+    """
+    Databases created before multi-branch indexing have no `branch` on files/index_runs.
+    Add it, backfilled with each repo's (single) branch, and drop the old (repo_id, path) index.
+    """
+    inspector = inspect(conn)
+    for table in ("files", "index_runs"):
+        if "branch" in {column["name"] for column in inspector.get_columns(table)}:
+            continue
+        logger.info(f"Adding branch column to {table}")
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN branch VARCHAR"))
+        conn.execute(text(
+            f"UPDATE {table} SET branch = (SELECT repos.branch FROM repos WHERE repos.id = {table}.repo_id)"
+        ))
+    conn.execute(text("DROP INDEX IF EXISTS ix_files_repo_id_path"))
+
+
+def _dedupe_files(conn: Connection):
+    """
+    Before the manifest upsert, `update_file_hash` could insert a second row for a path.
+    Keep the newest row of each (repo_id, branch, path) so the unique index can be built.
+    """
+    result = conn.execute(text(
+        "DELETE FROM files WHERE id NOT IN (SELECT MAX(id) FROM files GROUP BY repo_id, branch, path)"
+    ))
+    if result.rowcount:
+        logger.info(f"Removed {result.rowcount} duplicate file rows")
+
+
+def _add_branch_indexes(conn: Connection):
+    """Indexes added after their tables first shipped, which the baseline skips on existing tables."""
+    _dedupe_files(conn)
+    conn.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_files_repo_id_branch_path ON files (repo_id, branch, path)"
+    ))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_index_runs_repo_id ON index_runs (repo_id)"))
+
+
+def _add_import_blocks(conn: Connection):
+    """File import blocks, stored once and referenced by chunks (no longer prepended to their content)."""
+    conn.execute(text("CREATE TABLE IF NOT EXISTS import_blocks (id VARCHAR PRIMARY KEY, content TEXT NOT NULL)"))
+
+
+def _add_pending_versions(conn: Connection):
+    """Versions an index run stored before checkpointing them, so a retry can clean them up."""
+    if "pending_versions" not in {column["name"] for column in inspect(conn).get_columns("index_runs")}:
+        conn.execute(text("ALTER TABLE index_runs ADD COLUMN pending_versions TEXT"))
+
+
+# Append only: never reorder or remove a step once it has shipped, and only change one so that it
+# succeeds where it failed before (databases that already applied it must not need it re-run)
+MIGRATIONS: List[Tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "baseline schema", _baseline),
+    (2, "branch columns on files and index_runs", _add_branch_columns),
+    (3, "branch-aware indexes", _add_branch_indexes),
+    (4, "import blocks", _add_import_blocks),
+    (5, "pending versions of index runs", _add_pending_versions),
+]
+
+
+def current_version(conn: Connection) -> int:
+    conn.execute(text("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)"))
+    version = conn.execute(text("SELECT MAX(version) FROM schema_version")).scalar()
+    return version or 0
+
+
+def migrate(engine: Engine) -> int:
+    """Apply pending migrations in order. Returns the schema version the database ends at."""
+    version = 0
+    for number, description, step in MIGRATIONS:
+        with engine.begin() as conn:
+            if conn.dialect.name == "postgresql":
+                conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _PG_LOCK_KEY})
+            version = current_version(conn)
+            if number <= version:
+                continue
+            logger.info(f"Applying migration {number}: {description}")
+            step(conn)
+            conn.execute(text("INSERT INTO schema_version (version) VALUES (:version)"), {"version": number})
+            version = number
+    logger.info(f"Database schema at version {version}")
+    return version
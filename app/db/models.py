@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Index, Boolean, Text
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.db.session import Base  # shared Base
@@ -10,19 +10,59 @@ class Repo(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, unique=True, index=True)
     url = Column(String, nullable=True)
-    branch = Column(String, default="main")
+    branch = Column(String, default="main")  # default branch; other branches have their own file manifests
     last_indexed = Column(DateTime, default=datetime.utcnow)
 
     files = relationship("File", back_populates="repo", cascade="all, delete-orphan")
+    index_runs = relationship("IndexRun", back_populates="repo", cascade="all, delete-orphan")
 
 
 class File(Base):
-    """Represents a file in a repository."""
+    """
+    A file of one branch of a repository. The rows of a (repo, branch) pair are that
+    branch's manifest: which content (hash) of each path the branch's chunks come from.
+    """
     __tablename__ = "files"
 
     id = Column(Integer, primary_key=True, index=True)
     repo_id = Column(Integer, ForeignKey("repos.id", ondelete="CASCADE"))
+    branch = Column(String)
     path = Column(String, index=True)
     hash = Column(String, index=True)
 
     repo = relationship("Repo", back_populates="files")
+
+    __table_args__ = (
+        Index("ix_files_repo_id_branch_path", "repo_id", "branch", "path", unique=True),
+    )
+
+
+class ImportBlock(Base):
+    """
+    The import block of a source file, stored once by content address (sha256) and
+    referenced from chunk metadata as `imports_id`, instead of being repeated in every chunk.
+    """
+    __tablename__ = "import_blocks"
+
+    id = Column(String, primary_key=True)
+    content = Column(Text, nullable=False)
+
+
+class IndexRun(Base):
+    """Progress checkpoint of one indexing run, so a failed run can be resumed."""
+    __tablename__ = "index_runs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    repo_id = Column(Integer, ForeignKey("repos.id", ondelete="CASCADE"), index=True)
+    branch = Column(String)
+    full_index = Column(Boolean, default=False)
+    status = Column(String, default="running")  # running | failed | completed | superseded
+    files_done = Column(Integer, default=0)
+    chunks_flushed = Column(Integer, default=0)
+    # JSON [[path, hash], ...] of versions stored ahead of the checkpoint that records their hashes
+    pending_versions = Column(Text, nullable=True)
+    error = Column(String, nullable=True)
+    started_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+    repo = relationship("Repo", back_populates="index_runs")
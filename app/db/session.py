@@ -1,13 +1,69 @@
-import os
-from sqlalchemy import create_engine
+# app/db/session.py
+"""
+Database Engine & Sessions:
+- The metadata database is chosen by DATABASE_URL (SQLite file by default, or Postgres)
+- SQLite runs in WAL mode with synchronous=NORMAL and a busy timeout, so query reads
+  proceed while the indexer writes and brief write contention waits instead of failing
+- Both backends use a bounded connection pool
+"""
+import logging
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
 from sqlalchemy.orm import sessionmaker, declarative_base
-from app.config.settings import BASE_DIR
+from sqlalchemy.pool import QueuePool, StaticPool
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+DATABASE_URL = settings.DATABASE_URL
+
+
+def _configure_sqlite_connection(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+    finally:
+        cursor.close()
+
+
+def build_engine(database_url: str) -> Engine:
+    """Engine for `database_url`, with pooling and per-backend connection tuning."""
+    url = make_url(database_url)
+    if url.get_backend_name() == "sqlite":
+        connect_args = {"check_same_thread": False, "timeout": settings.SQLITE_BUSY_TIMEOUT_MS / 1000.0}
+        if url.database in (None, "", ":memory:"):
+            # Every connection to ":memory:" would be a new, empty database
+            engine = create_engine(database_url, connect_args=connect_args, poolclass=StaticPool)
+        else:
+            engine = create_engine(
+                database_url,
+                connect_args=connect_args,
+                poolclass=QueuePool,
+                pool_size=settings.DB_POOL_SIZE,
+                max_overflow=settings.DB_MAX_OVERFLOW,
+                pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+            )
+        event.listen(engine, "connect", _configure_sqlite_connection)
+    else:
+        engine = create_engine(
+            database_url,
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+            pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,
+            # Drops connections the server closed (restarts, idle timeouts) before handing them out
+            pool_pre_ping=True,
+        )
+    logger.info(f"Metadata database: {url.render_as_string(hide_password=True)}")
+    return engine
 
-# SQLite database in root folder
-DATABASE_URL = f"sqlite:///{os.path.join(BASE_DIR, 'coderag.db')}"
 
 # SQLAlchemy engine & session
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+engine = build_engine(DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 # Declarative Base shared across models
@@ -22,4 +78,4 @@ def get_db():
         db.close()
 
 def get_db_session():
-    return SessionLocal()
\ No newline at end of file
+    return SessionLocal()
@@ -1,75 +1,207 @@
 import os
-import gitlab
 import logging
 from abc import ABC, abstractmethod
-from typing import List, Optional
-from urllib.parse import urlparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import gitlab
 
-from app.config.logging_config import setup_logging
-from app.config.settings import PRIVATE_TOKEN, IGNORED_FOLDERS, IGNORED_FILES, ALLOWED_EXTENSIONS
+from app.config.settings import PRIVATE_TOKEN, GITLAB_MAX_CONCURRENCY, IGNORED_FOLDERS
+from app.ingestion.file_filters import is_indexable_path
+from app.ingestion.gitlab_client import blob_cache, get_project, with_retries
 
-# Setup logging
-setup_logging()
 logger = logging.getLogger(__name__)
 
+# Read/download unit of size-capped fetches
+_READ_CHUNK_BYTES = 64 * 1024
+
+
+class _TooLarge(Exception):
+    """Raised from a streaming download to abort it once the size cap is passed."""
+
+
 class ProjectDataProvider(ABC):
-    """Abstract base class for providing file lists and content from a project source."""
+    """
+    Abstract base class for providing file lists and content from a project source.
+    Paths and contents are produced lazily, so a huge repository is never held in memory whole.
+    """
     @abstractmethod
+    def iter_files(self) -> Iterator[str]:
+        """Yield the relevant file paths of the project as they are discovered."""
+        pass
+
     def list_files(self) -> List[str]:
         """Return a list of all relevant file paths in the project."""
+        return list(self.iter_files())
+
+    @abstractmethod
+    def iter_paths(self, paths: Iterable[str]) -> Iterator[str]:
+        """
+        Yield the relevant files that currently exist among `paths` (directories expanded).
+        Used to index a known set of changes without listing the whole project.
+        """
         pass
+
     @abstractmethod
-    def get_file_content(self, file_path: str) -> str:
-        """Return the content of a specific file."""
+    def get_file_content(self, file_path: str, max_bytes: Optional[int] = None) -> Optional[str]:
+        """Return the content of a specific file; None if it is larger than `max_bytes`."""
         pass
 
+    def iter_file_contents(
+            self, file_paths: Iterable[str], max_bytes: Optional[int] = None
+    ) -> Iterator[Tuple[str, Optional[str]]]:
+        """
+        Yield (path, content) pairs in input order, content None for files over `max_bytes`.
+        Providers may override to fetch concurrently.
+        """
+        for file_path in file_paths:
+            yield file_path, self.get_file_content(file_path, max_bytes)
+
 
 class GitLabDataProvider(ProjectDataProvider):
     """Provides data by fetching from a remote GitLab repository via API."""
     def __init__(self, repo_url: str, branch: Optional[str] = None, token: str = PRIVATE_TOKEN):
         self.repo_url = repo_url
         logger.debug(f"Initializing GitLabDataProvider for repo: {repo_url}")
-        self.gl = gitlab.Gitlab("https://gitlab.com", private_token=token)
-        project_path = self._get_project_path(repo_url)
-        logger.debug(f"Converted repo URL to project path: {project_path}")
-        self.project = self.gl.projects.get(project_path)
+        self.project = get_project(repo_url, token)
         self.branch = branch or self.project.default_branch or "main"
+        # Blob SHA of every listed file; lets content be served from the SHA-keyed blob cache
+        self.blob_ids: Dict[str, str] = {}
         logger.info(f"Using branch: {self.branch}")
 
-    def _get_project_path(self, repo_url: str) -> str:
-        """Convert GitLab URL to project path (namespace/project_name)."""
-        return urlparse(repo_url).path.strip("/")
+    def _iter_tree(self, path: Optional[str] = None) -> Iterator[str]:
+        """
+        Walk the repository tree (or the subtree at `path`) page by page instead of loading
+        the whole recursive listing first. Each page fetch is retried on its own.
+        """
+        options = {"path": path} if path else {}
+        description = f"tree of {self.repo_url}" + (f" at {path}" if path else "")
+        items = with_retries(
+            lambda: self.project.repository_tree(ref=self.branch, recursive=True, iterator=True, **options),
+            description,
+        )
+        while True:
+            try:
+                # The list only advances once a page has been received, so a failed fetch can simply be repeated
+                item = with_retries(lambda: next(items), description)
+            except StopIteration:
+                return
+            if item["type"] != "blob":
+                continue
+            if not is_indexable_path(item["path"]):
+                logger.debug(f"Filtered out: {item['path']}")
+                continue
+            self.blob_ids[item["path"]] = item["id"]
+            yield item["path"]
 
-    def list_files(self) -> List[str]:
-        files = []
-        items = self.project.repository_tree(ref=self.branch, recursive=True, all=True)
-        logger.debug(f"Fetched {len(items)} items from GitLab repository tree")
-        for item in items:
-            path_parts = item["path"].split('/')
-            file_name = path_parts[-1]
-
-            if item["type"] == "blob":
-                if any(part in IGNORED_FOLDERS for part in path_parts):
-                    logger.debug(f"Ignored folder in path: {item['path']}")
-                    continue
-                if file_name in IGNORED_FILES:
-                    logger.debug(f"Ignored file: {file_name}")
-                    continue
-                if os.path.splitext(file_name)[1] not in ALLOWED_EXTENSIONS:
-                    logger.debug(f"Skipped file due to extension filter: {file_name}")
+    def iter_files(self) -> Iterator[str]:
+        listed = 0
+        for path in self._iter_tree():
+            listed += 1
+            yield path
+        logger.info(f"Total files after filtering: {listed}")
+
+    def iter_paths(self, paths: Iterable[str]) -> Iterator[str]:
+        for path in paths:
+            path = path.strip("/")
+            if is_indexable_path(path):
+                blob_id = self._resolve_file(path)
+                if blob_id is not None:
+                    yield path
                     continue
-                files.append(item["path"])
-                logger.debug(f"Added file: {item['path']}")
-        logger.info(f"Total files after filtering: {len(files)}")
-        return files
-
-    def get_file_content(self, file_path: str) -> str:
-        logger.debug(f"Fetching content for file: {file_path}")
-        f = self.project.files.get(file_path=file_path, ref=self.branch)
-        content = f.decode().decode("utf-8")
+            # Not an existing indexable file: a directory stands for everything below it
+            try:
+                yield from self._iter_tree(path)
+            except gitlab.exceptions.GitlabGetError as e:
+                if e.response_code != 404:
+                    raise
+                logger.debug(f"Not on branch {self.branch}: {path}")
+
+    def _resolve_file(self, file_path: str) -> Optional[str]:
+        """Blob SHA of a file on the branch, or None if it does not exist there."""
+        try:
+            f = with_retries(lambda: self.project.files.get(file_path=file_path, ref=self.branch), file_path)
+        except gitlab.exceptions.GitlabGetError as e:
+            if e.response_code == 404:
+                return None
+            raise
+        self.blob_ids[file_path] = f.blob_id
+        # The files API returns the content anyway; keep it so the fetch that follows is a cache hit
+        blob_cache.put(f.blob_id, f.decode().decode("utf-8", errors="ignore"))
+        return f.blob_id
+
+    def _fetch_blob(self, blob_sha: str, file_path: str, max_bytes: Optional[int]) -> Optional[bytes]:
+        """Download a raw blob in chunks, giving up as soon as it exceeds `max_bytes`."""
+        received: List[bytes] = []
+        size = 0
+
+        def collect(chunk: bytes):
+            nonlocal size
+            size += len(chunk)
+            if max_bytes is not None and size > max_bytes:
+                raise _TooLarge()
+            received.append(chunk)
+
+        def download():
+            nonlocal size
+            received.clear()
+            size = 0
+            self.project.repository_raw_blob(blob_sha, streamed=True, action=collect, chunk_size=_READ_CHUNK_BYTES)
+
+        try:
+            with_retries(download, file_path)
+        except _TooLarge:
+            return None
+        return b"".join(received)
+
+    def get_file_content(self, file_path: str, max_bytes: Optional[int] = None) -> Optional[str]:
+        blob_sha = self.blob_ids.get(file_path)
+        if blob_sha:
+            content = blob_cache.get(blob_sha)
+            if content is not None:
+                logger.debug(f"Blob cache hit for file: {file_path} ({blob_sha})")
+                if max_bytes is not None and len(content.encode("utf-8")) > max_bytes:
+                    logger.info(f"Skipping {file_path}: larger than {max_bytes} bytes")
+                    return None
+                return content
+            # A blob SHA identifies its content exactly, so the raw blob is fetched once and reused
+            logger.debug(f"Fetching blob {blob_sha} for file: {file_path}")
+            raw = self._fetch_blob(blob_sha, file_path, max_bytes)
+            if raw is None:
+                logger.info(f"Skipping {file_path}: larger than {max_bytes} bytes")
+                return None
+            content = raw.decode("utf-8", errors="ignore")
+            blob_cache.put(blob_sha, content)
+        else:
+            logger.debug(f"Fetching content for file: {file_path}")
+            f = with_retries(lambda: self.project.files.get(file_path=file_path, ref=self.branch), file_path)
+            # The files API returns the content inline, so the cap can only be applied after the fact
+            if max_bytes is not None and getattr(f, "size", 0) > max_bytes:
+                logger.info(f"Skipping {file_path}: larger than {max_bytes} bytes")
+                return None
+            content = f.decode().decode("utf-8")
+            self.blob_ids[file_path] = f.blob_id
+            blob_cache.put(f.blob_id, content)
         logger.debug(f"Fetched {len(content)} characters for file: {file_path}")
         return content
 
+    def iter_file_contents(
+            self, file_paths: Iterable[str], max_bytes: Optional[int] = None
+    ) -> Iterator[Tuple[str, Optional[str]]]:
+        """Fetch files concurrently, keeping a bounded window in flight and yielding in input order."""
+        window = GITLAB_MAX_CONCURRENCY * 2
+        with ThreadPoolExecutor(max_workers=GITLAB_MAX_CONCURRENCY, thread_name_prefix="gitlab-fetch") as pool:
+            in_flight = deque()
+            for file_path in file_paths:
+                in_flight.append((file_path, pool.submit(self.get_file_content, file_path, max_bytes)))
+                if len(in_flight) >= window:
+                    path, future = in_flight.popleft()
+                    yield path, future.result()
+            while in_flight:
+                path, future = in_flight.popleft()
+                yield path, future.result()
+
 
 class LocalDataProvider(ProjectDataProvider):
     """Provides data from a local filesystem path."""
@@ -79,27 +211,51 @@ class LocalDataProvider(ProjectDataProvider):
         self.project_path = project_path
         logger.debug(f"Initialized LocalDataProvider for path: {project_path}")
 
-    def list_files(self) -> List[str]:
-        all_files = []
-        for root, dirs, files in os.walk(self.project_path, topdown=True):
+    def _walk(self, top: str) -> Iterator[str]:
+        for root, dirs, files in os.walk(top, topdown=True):
+            # Pruned here so ignored trees (node_modules, target, ...) are never walked
             dirs[:] = [d for d in dirs if d not in IGNORED_FOLDERS]
-
             for file in files:
-                if file not in IGNORED_FILES and os.path.splitext(file)[1] in ALLOWED_EXTENSIONS:
-                    full_path = os.path.join(root, file)
-                    rel_path = os.path.relpath(full_path, self.project_path)
-                    all_files.append(rel_path)
-                    logger.debug(f"Added file: {rel_path}")
+                rel_path = os.path.relpath(os.path.join(root, file), self.project_path)
+                if is_indexable_path(rel_path):
+                    yield rel_path
                 else:
-                    logger.debug(f"Ignored file: {file}")
-        logger.info(f"Total local files after filtering: {len(all_files)}")
-        return all_files
+                    logger.debug(f"Ignored file: {rel_path}")
+
+    def iter_files(self) -> Iterator[str]:
+        listed = 0
+        for rel_path in self._walk(self.project_path):
+            listed += 1
+            yield rel_path
+        logger.info(f"Total local files after filtering: {listed}")
+
+    def iter_paths(self, paths: Iterable[str]) -> Iterator[str]:
+        for path in paths:
+            full_path = os.path.join(self.project_path, path)
+            if os.path.isdir(full_path):
+                # A directory event (e.g. a package moved or deleted by a checkout) stands for everything below it
+                if not IGNORED_FOLDERS.intersection(path.replace("\\", "/").split("/")):
+                    yield from self._walk(full_path)
+            elif os.path.isfile(full_path) and is_indexable_path(path):
+                yield path
 
-    def get_file_content(self, file_path: str) -> str:
+    def get_file_content(self, file_path: str, max_bytes: Optional[int] = None) -> Optional[str]:
         full_path = os.path.join(self.project_path, file_path)
         logger.debug(f"Reading local file: {full_path}")
-        with open(full_path, 'r', encoding='utf-8', errors='ignore') as f:
-            content = f.read()
+        if max_bytes is None:
+            with open(full_path, 'r', encoding='utf-8', errors='ignore') as f:
+                content = f.read()
+        else:
+            # Stat first so oversized files are never opened; the bounded read covers files growing meanwhile
+            if os.path.getsize(full_path) > max_bytes:
+                logger.info(f"Skipping {file_path}: larger than {max_bytes} bytes")
+                return None
+            with open(full_path, 'rb') as f:
+                raw = f.read(max_bytes + 1)
+            if len(raw) > max_bytes:
+                logger.info(f"Skipping {file_path}: larger than {max_bytes} bytes")
+                return None
+            content = raw.decode('utf-8', errors='ignore')
         logger.debug(f"Read {len(content)} characters from file: {file_path}")
         return content
 
@@ -1,18 +1,46 @@
 # embedder.py - Embedding model calls
 import logging
-
-from sentence_transformers import SentenceTransformer
+import threading
 
 from app.config import settings
 from app.config.logging_config import setup_logging
+from app.ingestion.embedding_pool import EmbeddingPool
+from app.ingestion.query_batcher import QueryBatcher
+from app.metrics import span
 
 logger = logging.getLogger(__name__)
 
 class Embedder:
-    def __init__(self, model_path: str | None = None):
-        path = model_path or settings.EMBEDDING_MODEL_PATH
-        logger.info("Loading embedding model from: %s", path)
-        self.model = SentenceTransformer(path)
+    def __init__(self, model_path: str | None = None, pool_workers: int | None = None):
+        self.model_path = model_path or settings.EMBEDDING_MODEL_PATH
+        self._model = None
+        self._model_lock = threading.Lock()
+        self.pool_workers = settings.EMBEDDING_POOL_WORKERS if pool_workers is None else pool_workers
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._query_batcher = None
+        if settings.QUERY_BATCH_WINDOW_MS > 0:
+            self._query_batcher = QueryBatcher(
+                encode_fn=lambda texts: self.model.encode(texts, convert_to_numpy=True),
+                window_ms=settings.QUERY_BATCH_WINDOW_MS,
+                max_batch=settings.QUERY_BATCH_MAX_SIZE,
+            )
+
+    @property
+    def model(self):
+        """The SentenceTransformer, loaded on first use so importing and constructing stay cheap."""
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    # torch + sentence_transformers dominate start-up time; only pay for them when encoding
+                    from sentence_transformers import SentenceTransformer
+                    logger.info("Loading embedding model from: %s", self.model_path)
+                    self._model = SentenceTransformer(self.model_path)
+        return self._model
+
+    def warmup(self):
+        """Load the model and run one tiny encode so the first real request is not the slow one."""
+        self.model.encode(["warmup"], convert_to_numpy=True)
 
     def get_embedding(self, text: str):
         """
@@ -23,16 +51,50 @@ class Embedder:
 
     def get_embeddings(self, texts: list[str]):
         """
-        Get embedding vectors for multiple texts
+        Get embedding vectors for multiple texts.
+        Large batches are sharded across the embedding pool when it is enabled.
         """
+        if self.pool_workers > 1 and len(texts) >= settings.EMBEDDING_POOL_MIN_TEXTS:
+            logger.debug("Encoding %d texts on the embedding pool", len(texts))
+            return self._get_pool().encode(texts)
         logger.debug("Encoding %d texts", len(texts))
         return self.model.encode(texts, convert_to_numpy=True)
 
+    def _get_pool(self) -> EmbeddingPool:
+        """
+        Start the worker pool on first use so query-only processes never pay for it.
+        Locked so concurrent indexing threads share one pool instead of each spawning their own.
+        """
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = EmbeddingPool(
+                        model_path=self.model_path,
+                        num_workers=self.pool_workers,
+                        # Reuse the in-process model's dimension only if it is already loaded
+                        dim=self._model.get_sentence_embedding_dimension() if self._model is not None else None,
+                        threads_per_worker=settings.EMBEDDING_POOL_THREADS_PER_WORKER,
+                        shard_size=settings.EMBEDDING_POOL_SHARD_SIZE,
+                    )
+        return self._pool
+
+    def close(self):
+        """Release the embedding pool, if one was started."""
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.close()
+                self._pool = None
+
     def embed_documents(self, texts: list[str]) -> list[list[float]]:
-        return self.get_embeddings(texts).tolist()
+        with span("index", "embed", texts=len(texts)):
+            return self.get_embeddings(texts).tolist()
 
     def embed_query(self, text: str) -> list[float]:
-        return self.get_embedding(text).tolist()
+        """Embed a search query, coalescing with concurrent queries when batching is on."""
+        with span("query", "embed_query"):
+            if self._query_batcher is not None:
+                return self._query_batcher.submit(text).tolist()
+            return self.get_embedding(text).tolist()
 
 
 """
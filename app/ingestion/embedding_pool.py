@@ -0,0 +1,114 @@
+# app/ingestion/embedding_pool.py
+"""
+Embedding Pool
+
+Shards `SentenceTransformer.encode` calls across worker processes so that
+large reindexes can use every core of the indexing host.
+
+- Each worker loads its own copy of the model with a fixed torch thread count.
+- Workers write their vectors straight into a shared-memory output buffer,
+  so only the input texts cross the process boundary (no pickled result lists).
+"""
+import logging
+import multiprocessing as mp
+import os
+from multiprocessing import shared_memory
+from typing import List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Model instance owned by a worker process (set by `_init_worker`)
+_worker_model = None
+
+
+def _init_worker(model_path: str, num_threads: int):
+    """Load the model once per worker process with a bounded torch thread pool."""
+    global _worker_model
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    torch.set_num_threads(num_threads)
+    _worker_model = SentenceTransformer(model_path)
+
+
+def _worker_dimension() -> int:
+    """Embedding size of the worker's model, so the parent never has to load its own copy."""
+    return _worker_model.get_sentence_embedding_dimension()
+
+
+def _encode_shard(shm_name: str, total_rows: int, dim: int, offset: int, texts: List[str], batch_size: int) -> int:
+    """Encode one shard and write it into rows [offset, offset + len(texts)) of the shared buffer."""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        # The parent owns the segment; stop this process's resource tracker from unlinking it on exit.
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, "shared_memory")
+    except Exception:
+        pass
+    try:
+        out = np.ndarray((total_rows, dim), dtype=np.float32, buffer=shm.buf)
+        vectors = _worker_model.encode(texts, batch_size=batch_size, convert_to_numpy=True)
+        out[offset:offset + len(texts)] = vectors
+        del out
+    finally:
+        shm.close()
+    return len(texts)
+
+
+class EmbeddingPool:
+    """A pool of model-holding worker processes sharing one output buffer per call."""
+
+    def __init__(
+        self,
+        model_path: str,
+        num_workers: int,
+        dim: Optional[int] = None,
+        threads_per_worker: Optional[int] = None,
+        shard_size: int = 128,
+        batch_size: int = 32,
+    ):
+        self.num_workers = num_workers
+        self.shard_size = shard_size
+        self.batch_size = batch_size
+        threads = threads_per_worker or max(1, (os.cpu_count() or 1) // num_workers)
+        logger.info(
+            "Starting embedding pool: %d workers x %d threads (model: %s)",
+            num_workers, threads, model_path,
+        )
+        # "spawn" keeps torch/OpenMP state from leaking into the children via fork
+        ctx = mp.get_context("spawn")
+        self._pool = ctx.Pool(
+            processes=num_workers,
+            initializer=_init_worker,
+            initargs=(model_path, threads),
+        )
+        # Asked of a worker when not given (the parent process may not hold a model at all)
+        self.dim = dim or self._pool.apply(_worker_dimension)
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Encode texts across the pool, returning a (len(texts), dim) float32 array."""
+        total = len(texts)
+        if total == 0:
+            return np.empty((0, self.dim), dtype=np.float32)
+
+        shm = shared_memory.SharedMemory(create=True, size=total * self.dim * np.dtype(np.float32).itemsize)
+        try:
+            shards = [
+                (shm.name, total, self.dim, start, texts[start:start + self.shard_size], self.batch_size)
+                for start in range(0, total, self.shard_size)
+            ]
+            logger.debug("Encoding %d texts in %d shards", total, len(shards))
+            self._pool.starmap(_encode_shard, shards)
+            result = np.ndarray((total, self.dim), dtype=np.float32, buffer=shm.buf).copy()
+        finally:
+            shm.close()
+            shm.unlink()
+        return result
+
+    def close(self):
+        """Stop the worker processes."""
+        self._pool.close()
+        self._pool.join()
+        logger.info("Embedding pool stopped.")
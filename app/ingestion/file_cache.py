@@ -0,0 +1,110 @@
+# app/ingestion/file_cache.py
+"""
+File Content Cache
+
+Content-addressed cache of raw file contents keyed by (repo_id, path, content hash),
+filled by the indexer and read by the agent tools so that fetching a file does not
+touch GitLab or the source checkout.
+
+- Memory tier: LRU of decoded strings
+- Disk tier: zstd-compressed blobs under FILE_CACHE_DIR/<repo_id>/
+The content hash is the SHA-256 the indexer stores in the `files` table, so a stale
+entry can never be served: a changed file has a different key.
+"""
+import hashlib
+import logging
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+import zstandard
+
+from app.config.settings import FILE_CACHE_DIR, FILE_CACHE_MEMORY_ITEMS
+
+logger = logging.getLogger(__name__)
+
+
+class FileCache:
+    """Two-tier (memory LRU + compressed disk) cache of file contents."""
+
+    def __init__(self, cache_dir: str = FILE_CACHE_DIR, memory_items: int = FILE_CACHE_MEMORY_ITEMS):
+        self.cache_dir = cache_dir
+        self.memory_items = memory_items
+        self._memory: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(repo_id, file_path: str, content_hash: str) -> str:
+        return hashlib.sha256(f"{repo_id}:{file_path}:{content_hash}".encode("utf-8")).hexdigest()
+
+    def _disk_path(self, repo_id, key: str) -> str:
+        return os.path.join(self.cache_dir, str(repo_id), key[:2], f"{key}.zst")
+
+    def _remember(self, key: str, content: str):
+        with self._lock:
+            self._memory[key] = content
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_items:
+                self._memory.popitem(last=False)
+
+    def get(self, repo_id, file_path: str, content_hash: str) -> Optional[str]:
+        """Return cached content, or None on a miss."""
+        key = self._key(repo_id, file_path, content_hash)
+        with self._lock:
+            content = self._memory.get(key)
+            if content is not None:
+                self._memory.move_to_end(key)
+                return content
+        try:
+            with open(self._disk_path(repo_id, key), "rb") as f:
+                content = zstandard.ZstdDecompressor().decompress(f.read()).decode("utf-8")
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Discarding unreadable cache entry for {file_path}: {e}")
+            return None
+        self._remember(key, content)
+        return content
+
+    def put(self, repo_id, file_path: str, content_hash: str, content: str, remember: bool = True):
+        """
+        Store content in both tiers. Existing disk entries are left untouched.
+        The indexer passes `remember=False`: a bulk write should not fill (and evict) the memory tier.
+        """
+        key = self._key(repo_id, file_path, content_hash)
+        if remember:
+            self._remember(key, content)
+        path = self._disk_path(repo_id, key)
+        if os.path.exists(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write-then-rename so concurrent readers never see a partial blob
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            # zstd (de)compressor objects are not thread-safe, so each call gets its own
+            f.write(zstandard.ZstdCompressor(level=3).compress(content.encode("utf-8")))
+        os.replace(tmp_path, path)
+
+    def invalidate(self, repo_id, file_path: str, content_hash: str):
+        """Remove the entry for an outdated version of a file."""
+        key = self._key(repo_id, file_path, content_hash)
+        with self._lock:
+            self._memory.pop(key, None)
+        try:
+            os.remove(self._disk_path(repo_id, key))
+        except FileNotFoundError:
+            pass
+
+    def drop_repo(self, repo_id):
+        """Remove every cached file of a repository."""
+        # Memory keys are opaque hashes, so the whole memory tier is cleared
+        with self._lock:
+            self._memory.clear()
+        shutil.rmtree(os.path.join(self.cache_dir, str(repo_id)), ignore_errors=True)
+        logger.info(f"Dropped file cache for repo ID {repo_id}")
+
+
+# Shared instance used by the indexer and the agent tools
+file_cache = FileCache()
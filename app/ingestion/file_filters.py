@@ -0,0 +1,40 @@
+# app/ingestion/file_filters.py
+"""
+Indexing File Filters:
+- Path rules shared by every data provider (extension whitelist, ignored folders/files,
+  generated-source locations), applied while listing so skipped files are never fetched
+- Content rules applied after a (size-capped) fetch: generated-code markers in the file
+  header and minified text, neither of which is worth embedding
+"""
+import os
+from typing import Optional
+
+from app.config.settings import (
+    ALLOWED_EXTENSIONS, GENERATED_HEADER_MARKERS, GENERATED_PATH_MARKERS, IGNORED_FILES, IGNORED_FOLDERS,
+    MINIFIED_AVG_LINE_LENGTH,
+)
+
+# Generated-code markers are only looked for this far into a file
+_HEADER_CHARS = 2048
+
+
+def is_indexable_path(path: str) -> bool:
+    """Whether a repo-relative path passes the listing filters."""
+    parts = path.replace("\\", "/").split("/")
+    file_name = parts[-1]
+    if any(part in IGNORED_FOLDERS for part in parts[:-1]):
+        return False
+    if file_name in IGNORED_FILES or os.path.splitext(file_name)[1] not in ALLOWED_EXTENSIONS:
+        return False
+    normalised = "/" + "/".join(parts)
+    return not any(marker in normalised for marker in GENERATED_PATH_MARKERS)
+
+
+def content_skip_reason(content: str) -> Optional[str]:
+    """"generated" or "minified" when a file's content should not be indexed, else None."""
+    header = content[:_HEADER_CHARS]
+    if any(marker in header for marker in GENERATED_HEADER_MARKERS):
+        return "generated"
+    if len(content) / (content.count("\n") + 1) > MINIFIED_AVG_LINE_LENGTH:
+        return "minified"
+    return None
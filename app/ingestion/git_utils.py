@@ -5,28 +5,19 @@ Git Utils using python-gitlab:
 - Get file content
 """
 
-import gitlab
 from typing import List, Optional
-from urllib.parse import urlparse
 
 from app.config.settings import PRIVATE_TOKEN
+from app.ingestion.gitlab_client import get_project, with_retries
 
 
 class GitUtils:
     def __init__(self, token: str = PRIVATE_TOKEN):
-        self.gl = gitlab.Gitlab("https://gitlab.com", private_token=token)
-
-    def _get_project_path(self, repo_url: str) -> str:
-        """
-        Convert GitLab URL to project path (namespace/project_name)
-        Supports groups/subgroups automatically.
-        """
-        parsed = urlparse(repo_url)
-        return parsed.path.strip("/")
+        self.token = token
 
     def _get_project(self, repo_url: str):
-        project_path = self._get_project_path(repo_url)
-        return self.gl.projects.get(project_path)
+        """Return the shared, cached project handle for a GitLab URL (groups/subgroups supported)."""
+        return get_project(repo_url, self.token)
 
     def _get_default_branch(self, project) -> str:
         return project.default_branch or "main"
@@ -34,22 +25,17 @@ class GitUtils:
     def list_files(self, repo_url: str, branch: Optional[str] = None) -> List[str]:
         project = self._get_project(repo_url)
         branch = branch or self._get_default_branch(project)
-        files = []
-        stack = [""]  # start from root folder
-        while stack:
-            path = stack.pop()
-            items = project.repository_tree(path=path, ref=branch)
-            for item in items:
-                if item["type"] == "tree":
-                    stack.append(item["path"])
-                else:
-                    files.append(item["path"])
-        return files
+        # One paginated recursive listing instead of a request per directory
+        items = with_retries(
+            lambda: project.repository_tree(ref=branch, recursive=True, all=True),
+            f"tree of {repo_url}",
+        )
+        return [item["path"] for item in items if item["type"] == "blob"]
 
     def get_file_content(self, repo_url: str, file_path: str, branch: Optional[str] = None) -> str:
         project = self._get_project(repo_url)
         branch = branch or self._get_default_branch(project)
-        f = project.files.get(file_path=file_path, ref=branch)
+        f = with_retries(lambda: project.files.get(file_path=file_path, ref=branch), file_path)
         return f.decode().decode("utf-8")
 
 
@@ -0,0 +1,206 @@
+# app/ingestion/gitlab_client.py
+"""
+Shared GitLab Client:
+- One python-gitlab client per GitLab host, on a pooled keep-alive session
+- Cached project handles (no `projects.get` round trip per provider/tool call)
+- Adaptive throttling driven by GitLab's `RateLimit-*` response headers
+- A process-wide semaphore bounding concurrent requests
+- A blob cache keyed on blob SHA, so unchanged files are never re-downloaded
+- Bounded retry with jittered backoff for transient failures
+"""
+import logging
+import random
+import threading
+import time
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, Optional, Tuple, TypeVar
+from urllib.parse import urlparse
+
+import gitlab
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.config.settings import (
+    PRIVATE_TOKEN, GITLAB_URL, GITLAB_MAX_ATTEMPTS, GITLAB_RETRY_BACKOFF_SECONDS,
+    GITLAB_POOL_SIZE, GITLAB_MAX_CONCURRENCY, GITLAB_RATE_LIMIT_LOW_WATERMARK, GITLAB_BLOB_CACHE_MB,
+)
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+def _is_transient(error: Exception) -> bool:
+    """Connection problems, rate limiting and server errors are worth retrying; 4xx are not."""
+    if isinstance(error, (requests.ConnectionError, requests.Timeout)):
+        return True
+    if isinstance(error, gitlab.exceptions.GitlabError):
+        code = error.response_code
+        return code is None or code == 429 or code >= 500
+    return False
+
+
+def with_retries(operation: Callable[[], T], description: str) -> T:
+    """Run a GitLab call, retrying transient failures with jittered exponential backoff."""
+    delay = GITLAB_RETRY_BACKOFF_SECONDS
+    for attempt in range(1, GITLAB_MAX_ATTEMPTS + 1):
+        try:
+            return operation()
+        except Exception as e:
+            if attempt == GITLAB_MAX_ATTEMPTS or not _is_transient(e):
+                raise
+            sleep_for = delay * random.uniform(0.5, 1.5)
+            logger.warning(
+                f"Transient GitLab error on {description} (attempt {attempt}/{GITLAB_MAX_ATTEMPTS}): {e}. "
+                f"Retrying in {sleep_for:.1f}s"
+            )
+            time.sleep(sleep_for)
+            delay *= 2
+
+
+def _retry_after_seconds(value: Optional[str], default: float = 1.0) -> float:
+    """Seconds to wait per a `Retry-After` header, which is either a number of seconds or an HTTP-date."""
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError, IndexError, OverflowError):
+        logger.debug(f"Unparseable Retry-After header {value!r}; waiting {default:.0f}s")
+        return default
+
+
+class RateLimitThrottle:
+    """
+    Spaces out requests when GitLab reports that the rate-limit budget is running low.
+    Once `RateLimit-Remaining` drops below the low watermark (a fraction of `RateLimit-Limit`),
+    the remaining budget is spread evenly until `RateLimit-Reset`. A 429 pauses all
+    requests for `Retry-After` seconds.
+    """
+
+    def __init__(self, low_watermark: float = GITLAB_RATE_LIMIT_LOW_WATERMARK):
+        self.low_watermark = low_watermark
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+        self._interval = 0.0
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self._interval
+        if slot > now:
+            time.sleep(slot - now)
+
+    def observe(self, response: requests.Response):
+        headers = response.headers
+        with self._lock:
+            if response.status_code == 429:
+                retry_after = _retry_after_seconds(headers.get("Retry-After"))
+                self._next_slot = max(self._next_slot, time.monotonic() + retry_after)
+                logger.warning(f"GitLab rate limit hit; pausing requests for {retry_after:.0f}s")
+                return
+            try:
+                remaining = int(headers["RateLimit-Remaining"])
+                limit = int(headers["RateLimit-Limit"])
+                reset_in = max(0.0, float(headers["RateLimit-Reset"]) - time.time())
+            except (KeyError, ValueError):
+                return
+            if remaining < limit * self.low_watermark:
+                self._interval = reset_in / max(remaining, 1)
+                logger.debug(f"GitLab budget low ({remaining}/{limit}); spacing requests {self._interval:.2f}s apart")
+            else:
+                self._interval = 0.0
+
+
+class _ThrottledSession(requests.Session):
+    """requests session that applies the shared semaphore and rate-limit throttle to every request."""
+
+    def __init__(self, throttle: RateLimitThrottle, semaphore: threading.BoundedSemaphore):
+        super().__init__()
+        self.throttle = throttle
+        self.semaphore = semaphore
+        adapter = HTTPAdapter(pool_connections=GITLAB_POOL_SIZE, pool_maxsize=GITLAB_POOL_SIZE)
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+
+    def send(self, request, **kwargs):
+        with self.semaphore:
+            self.throttle.wait()
+            response = super().send(request, **kwargs)
+        self.throttle.observe(response)
+        return response
+
+
+class BlobCache:
+    """Size-bounded LRU of decoded file contents keyed on GitLab blob SHA."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._items: "OrderedDict[str, str]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, blob_sha: str) -> Optional[str]:
+        with self._lock:
+            content = self._items.get(blob_sha)
+            if content is not None:
+                self._items.move_to_end(blob_sha)
+            return content
+
+    def put(self, blob_sha: str, content: str):
+        with self._lock:
+            if blob_sha in self._items:
+                return
+            self._items[blob_sha] = content
+            self._size += len(content)
+            while self._size > self.max_bytes and self._items:
+                _, evicted = self._items.popitem(last=False)
+                self._size -= len(evicted)
+
+
+# Keyed on (host, token): a client carries its token, so callers with other credentials get their own
+_clients: Dict[Tuple[str, str], gitlab.Gitlab] = {}
+_projects: Dict[Tuple[str, str, str], object] = {}
+_lock = threading.Lock()
+_throttle = RateLimitThrottle()
+_semaphore = threading.BoundedSemaphore(GITLAB_MAX_CONCURRENCY)
+blob_cache = BlobCache(GITLAB_BLOB_CACHE_MB * 1024 * 1024)
+
+
+def split_repo_url(repo_url: str) -> Tuple[str, str]:
+    """Split a repo URL into (GitLab base URL, project path). Works for self-hosted and mock servers."""
+    parsed = urlparse(repo_url)
+    base_url = f"{parsed.scheme}://{parsed.netloc}" if parsed.scheme.startswith("http") else GITLAB_URL
+    return base_url, parsed.path.strip("/")
+
+
+def get_gitlab(base_url: str = GITLAB_URL, token: str = PRIVATE_TOKEN) -> gitlab.Gitlab:
+    """Return the shared client for a GitLab host and token."""
+    with _lock:
+        client = _clients.get((base_url, token))
+        if client is None:
+            logger.info(f"Creating shared GitLab client for {base_url}")
+            session = _ThrottledSession(_throttle, _semaphore)
+            client = gitlab.Gitlab(base_url, private_token=token, session=session)
+            _clients[(base_url, token)] = client
+        return client
+
+
+def get_project(repo_url: str, token: str = PRIVATE_TOKEN):
+    """Return a cached project handle for a repo URL."""
+    base_url, project_path = split_repo_url(repo_url)
+    key = (base_url, token, project_path)
+    with _lock:
+        project = _projects.get(key)
+    if project is None:
+        gl = get_gitlab(base_url, token)
+        project = with_retries(lambda: gl.projects.get(project_path), f"project {project_path}")
+        with _lock:
+            _projects[key] = project
+        logger.debug(f"Cached project handle for {project_path}")
+    return project
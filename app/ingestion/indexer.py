@@ -1,27 +1,52 @@
 import logging
 import os
-from datetime import datetime, timezone
-from typing import List
+import resource
+import threading
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
 
-from app.config.logging_config import setup_logging
+from app.config import settings
 from app.db import crud
-from app.db.schemas import ChunkDocument, ChunkMetadata
 from app.db.session import SessionLocal
+from app.ingestion.file_cache import file_cache
+from app.ingestion.file_filters import content_skip_reason, is_indexable_path
 from app.ingestion.hashing import Hasher
 from app.ingestion.parser import base
 from app.ingestion.parser.java_parser import JavaParser
+from app.ingestion.records import ChunkRecord, FileRecord
+from app.ingestion.summaries import package_of
 from app.vectorstore.chroma import ChromaVectorStore
 from app.ingestion.data_providers import ProjectDataProvider, LocalDataProvider, GitLabDataProvider
+from app.metrics import INDEX_MEMORY_FLUSHES, INDEXED_CHUNKS, INDEXED_FILES, span, timed_iter
 
 
-setup_logging()
 logger = logging.getLogger(__name__)
 
+
+def _rss_mb() -> Optional[float]:
+    """Current resident set size, or None where /proc is not available."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * resource.getpagesize() / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _track(paths: Iterable[str], seen: Set[str]) -> Iterator[str]:
+    """Pass paths through, remembering them (the branch's file set is only known once listing ends)."""
+    for path in paths:
+        seen.add(path)
+        yield path
+
+
 class Indexer:
     def __init__(self, vectorstore: ChromaVectorStore):
         self.vectorstore = vectorstore
         self.hasher = Hasher()
         self.parsers = {"java": JavaParser()}
+        self._memory_warned = False
+        # One run per repo at a time: API-triggered runs and watch-mode updates share the manifest
+        self._repo_locks: Dict[str, threading.Lock] = {}
+        self._repo_locks_guard = threading.Lock()
         logger.info("Indexer initialized with vectorstore and parsers.")
 
     def _get_data_provider(self, project_path: str, branch: str = None) -> ProjectDataProvider:
@@ -44,56 +69,306 @@ class Indexer:
         logger.info(f"Starting incremental reindexing for project: {project_path}")
         self._index_repo(project_path, branch, full_index=False)
 
-    def _index_repo(self, project_path: str, branch: str = None, full_index: bool = False):
+    def index_paths(self, project_path: str, paths: Iterable[str], branch: str = None):
+        """
+        Incrementally reindex only `paths` (repo-relative files or directories) of a registered repo,
+        e.g. the changes reported by the watcher. Paths that no longer exist are removed from the index.
+        """
+        paths = sorted(set(paths))
+        logger.info(f"Starting incremental reindexing of {len(paths)} changed path(s) for project: {project_path}")
+        self._index_repo(project_path, branch, full_index=False, paths=paths)
+
+    def _repo_lock(self, project_path: str) -> threading.Lock:
+        with self._repo_locks_guard:
+            return self._repo_locks.setdefault(project_path, threading.Lock())
+
+    def _index_repo(
+            self, project_path: str, branch: str = None, full_index: bool = False, paths: Optional[List[str]] = None
+    ):
+        with self._repo_lock(project_path):
+            self._run_index(project_path, branch, full_index, paths)
+
+    def _run_index(self, project_path: str, branch: str, full_index: bool, paths: Optional[List[str]]):
         db = SessionLocal()
+        run = None
         try:
-            if full_index:
-                repo = crud.create_repo(db, project_path, branch)
+            repo = crud.get_repo(db, project_path)
+            if not repo and full_index:
+                repo = crud.create_repo(db, project_path, branch, vectorstore=self.vectorstore)
                 logger.info(f"Created new repository record: {repo.url} (ID: {repo.id})")
+            elif not repo:
+                logger.error(f"Cannot reindex non-existent repo: {project_path}")
+                raise ValueError(f"Cannot reindex non-existent repo: {project_path}")
             else:
-                repo = crud.get_repo(db, project_path)
-                if not repo:
-                    logger.error(f"Cannot reindex non-existent repo: {project_path}")
-                    raise ValueError(f"Cannot reindex non-existent repo: {project_path}")
-                logger.info(f"Reindexing existing repository: {repo.url} (ID: {repo.id})")
+                logger.info(f"Indexing existing repository: {repo.url} (ID: {repo.id})")
 
             repo_id = repo.id
+            branch = branch or repo.branch
+            interrupted = crud.get_interrupted_run(db, repo_id, branch, settings.INDEX_RUN_STALE_SECONDS)
+            # Only a run of the same kind is resumed: a full run is not finished by an incremental one.
+            # A changed-paths batch resumes any interrupted run, as it then scans the whole repo anyway
+            resumable = interrupted is not None and (interrupted.full_index == full_index or paths is not None)
+            run = interrupted if resumable else None
+            resumed = run is not None
+            if interrupted is not None and not resumed:
+                logger.info(f"Index run {interrupted.id} ({'full' if interrupted.full_index else 'incremental'}) superseded")
+                crud.finish_index_run(db, interrupted, "superseded", error=interrupted.error)
+            if resumed:
+                logger.info(
+                    f"Resuming index run {run.id} for repo ID {repo_id} ({branch}) from checkpoint "
+                    f"({run.files_done} files, {run.chunks_flushed} chunks already stored)"
+                )
+                run.status = "running"
+                db.commit()
+                # Files checkpointed by the interrupted run have up-to-date hashes and are skipped
+                full_index = False
+                if paths is not None:
+                    # The interrupted run may have left any file stale or unindexed, so finish it with a whole scan
+                    logger.info(f"Scanning the whole repo instead of {len(paths)} changed path(s) to finish run {run.id}")
+                    paths = None
+            else:
+                run = crud.start_index_run(db, repo_id, branch, full_index)
+
             provider = self._get_data_provider(project_path, branch)
-            files = provider.list_files()
-            logger.info(f"Found {len(files)} files to process in repo '{project_path}'")
+            # Listing, fetching and parsing are streamed: paths are discovered while earlier files are processed
+            listed: Set[str] = set()
+            files = provider.iter_files() if paths is None else provider.iter_paths(paths)
+            contents = provider.iter_file_contents(_track(files, listed), settings.MAX_FILE_BYTES)
 
-            for file_path in files:
+            scope = {}
+            if paths is not None:
+                # Only rows of the changed paths are loaded: a watch-mode batch costs O(changes), not O(repo)
+                scope = {
+                    "paths": [path for path in paths if is_indexable_path(path)],
+                    "prefixes": [path for path in paths if not is_indexable_path(path)],
+                }
+                if interrupted is not None:
+                    scope["paths"] += [path for path, _ in crud.get_pending_versions(interrupted)]
+            known_hashes = crud.get_file_hashes(db, repo_id, branch, **scope)
+            # Which branches already hold each (path, hash): content seen on another branch is reused, not re-embedded
+            refs = crud.get_file_refs(db, repo_id, **scope)
+            logger.info(f"Loaded {len(known_hashes)} stored file hashes for repo ID {repo_id} ({branch})")
+            if interrupted is not None:
+                self._discard_uncheckpointed(interrupted, known_hashes, refs)
+
+            # Chunks are buffered across files so the embedder sees large batches
+            pending_chunks: List[ChunkRecord] = []
+            # Hashes of processed files, written at the next checkpoint (after their chunks are stored)
+            pending_hashes: Dict[str, str] = {}
+            # Import blocks (by content address) referenced by the buffered chunks
+            pending_imports: Dict[str, str] = {}
+            # Size of the buffered chunk text, bounded by INDEX_BUFFER_MAX_MB
+            pending_bytes = 0
+            buffer_max_bytes = settings.INDEX_BUFFER_MAX_MB * 1024 * 1024
+            # (path, hash) versions to add this branch to / remove it from, and versions no branch holds
+            # any more (chunks deleted), applied at the next checkpoint
+            pending_refs = {"add": [], "remove": [], "delete": []}
+            # Files whose chunks (and so summary units) were added, re-flagged or released by this run
+            touched: Set[str] = set()
+            for file_path, content in timed_iter(contents, "index", "fetch"):
                 logger.debug(f"Processing file: {file_path}")
-                content = provider.get_file_content(file_path)
-                prev_hash = crud.get_file_hash(db, repo, file_path)
+                skip_reason = "too_large" if content is None else content_skip_reason(content)
+                if skip_reason:
+                    # Treated as absent from the branch, so a previously indexed version is released below
+                    logger.info(f"Skipping {file_path}: {skip_reason}")
+                    INDEXED_FILES.labels(skip_reason).inc()
+                    listed.discard(file_path)
+                    continue
+                new_hash = self.hasher.compute_hash(content)
+                prev_hash = known_hashes.get(file_path)
+                file_cache.put(repo_id, file_path, new_hash, content, remember=False)
 
-                if not full_index and prev_hash and not self.hasher.has_changed(content, prev_hash):
+                if not full_index and prev_hash == new_hash:
                     logger.info(f"Skipping unchanged file: {file_path}")
+                    INDEXED_FILES.labels("unchanged").inc()
                     continue
+                if prev_hash and prev_hash != new_hash:
+                    self._release_file_version(repo_id, branch, file_path, prev_hash, refs, pending_refs)
 
-                parser = self._get_parser(file_path)
-                chunks = self._parse_file(file_path, content, repo_id, parser)
-
-                if chunks:
-                    self._embed_and_store_chunks(chunks)
-                    logger.info(f"Processed and embedded {len(chunks)} chunks for file: {file_path}")
+                touched.add(file_path)
+                holders = refs.setdefault((file_path, new_hash), set())
+                if holders - {branch} and not full_index:
+                    # Same content is already stored for another branch: reference it instead of re-embedding
+                    logger.info(f"Reusing chunks of {file_path} from branch(es) {sorted(holders - {branch})}")
+                    INDEXED_FILES.labels("shared").inc()
+                    pending_refs["add"].append((file_path, new_hash))
                 else:
-                    logger.warning(f"No chunks extracted for file: {file_path}")
+                    INDEXED_FILES.labels("changed").inc()
+                    parser = self._get_parser(file_path)
+                    with span("index", "parse"):
+                        file, chunks = self._parse_file(file_path, content, repo_id, parser)
+                    # Upserts replace metadata, so carry over the flags of every branch holding this version
+                    self._assign_content_ids(file, chunks, new_hash, holders | {branch})
+                    if file.imports_id:
+                        pending_imports[file.imports_id] = file.imports
 
-                new_hash = self.hasher.compute_hash(content)
-                crud.update_file_hash(db, repo_id, file_path, new_hash)
-                logger.debug(f"Updated hash for file: {file_path} -> {new_hash}")
+                    if chunks:
+                        pending_chunks.extend(chunks)
+                        pending_bytes += sum(len(chunk.content) for chunk in chunks)
+                        logger.info(f"Queued {len(chunks)} chunks for file: {file_path}")
+                    else:
+                        logger.warning(f"No chunks extracted for file: {file_path}")
+                holders.add(branch)
 
-            db.commit()
-            logger.info(f"Completed {'full' if full_index else 'incremental'} indexing for repo: {project_path}")
+                if pending_chunks and (
+                        len(pending_chunks) >= settings.EMBEDDING_BATCH_SIZE
+                        or pending_bytes >= buffer_max_bytes
+                        or self._over_memory_limit()
+                ):
+                    self._store_ahead_of_checkpoint(db, run, pending_chunks)
+                    crud.checkpoint_index_run(db, run, files_done=0, chunks_flushed=len(pending_chunks))
+                    pending_chunks, pending_bytes = [], 0
+
+                pending_hashes[file_path] = new_hash
+                logger.debug(f"Queued hash update for file: {file_path} -> {new_hash}")
+
+                if len(pending_hashes) >= settings.INDEX_CHECKPOINT_FILES:
+                    self._checkpoint(db, run, pending_chunks, pending_hashes, pending_refs, imports=pending_imports)
+                    pending_chunks, pending_hashes, pending_imports, pending_bytes = [], {}, {}, 0
+                    pending_refs = {"add": [], "remove": [], "delete": []}
+
+            logger.info(f"Processed {len(listed)} files in repo '{project_path}' ({branch})")
+            if paths is None:
+                removed = set(known_hashes) - listed
+            else:
+                # Only the requested paths were looked at; files under them that are gone were deleted
+                requested = set(paths)
+                prefixes = tuple(path.rstrip("/") + "/" for path in requested)
+                removed = {
+                    path for path in known_hashes
+                    if path not in listed and (path in requested or path.startswith(prefixes))
+                }
+            touched.update(removed)
+            for file_path in removed:
+                logger.info(f"File no longer on branch {branch}: {file_path}")
+                self._release_file_version(repo_id, branch, file_path, known_hashes[file_path], refs, pending_refs)
+            self._checkpoint(
+                db, run, pending_chunks, pending_hashes, pending_refs, removed_paths=removed, imports=pending_imports
+            )
+            if settings.SUMMARY_INDEX_ENABLED:
+                # Files processed before a resumed run's crash are not in `touched`, so it rebuilds every package
+                scope = None if full_index or resumed else {package_of(path) for path in touched}
+                with span("index", "summaries"):
+                    packages = self.vectorstore.rebuild_package_summaries(str(repo_id), branch, packages=scope)
+                logger.info(f"Rebuilt {packages} package summaries for branch {branch}")
+            crud.finish_index_run(db, run, "completed")
+            logger.info(
+                f"Completed {'full' if full_index else 'incremental'} indexing for repo: {project_path} ({branch})"
+            )
 
         except Exception as e:
             logger.exception(f"Indexing failed for repo: {project_path} - {str(e)}")
+            db.rollback()
+            if run is not None:
+                try:
+                    crud.finish_index_run(db, run, "failed", error=str(e))
+                    logger.info(f"Index run {run.id} marked failed; a retry resumes from its last checkpoint")
+                except Exception:
+                    logger.exception(f"Could not record failure of index run {run.id}")
             raise
         finally:
             db.close()
             logger.info("Database session closed.")
 
+    def _over_memory_limit(self) -> bool:
+        """True when INDEX_MEMORY_LIMIT_MB is set and resident memory is above it, so buffers should be flushed now."""
+        if not settings.INDEX_MEMORY_LIMIT_MB:
+            return False
+        rss = _rss_mb()
+        if rss is None or rss < settings.INDEX_MEMORY_LIMIT_MB:
+            return False
+        if not self._memory_warned:
+            self._memory_warned = True
+            logger.warning(f"Resident memory {rss:.0f}MB over INDEX_MEMORY_LIMIT_MB; flushing buffered chunks early")
+        INDEX_MEMORY_FLUSHES.inc()
+        return True
+
+    def _release_file_version(self, repo_id: int, branch: str, file_path: str, file_hash: str, refs, pending_refs):
+        """
+        `branch` no longer holds this version of the file: drop its chunks when no other
+        branch references them, otherwise only remove the branch flag. Both happen at the next
+        checkpoint, together with the manifest update, so the old version stays searchable (and
+        the manifest never points at deleted chunks) until the new one is stored.
+        """
+        holders = refs.get((file_path, file_hash), set())
+        holders.discard(branch)
+        pending_refs["remove" if holders else "delete"].append((file_path, file_hash))
+
+    def _store_ahead_of_checkpoint(self, db, run, chunks: List[ChunkRecord]):
+        """
+        Store chunks whose file hashes are only written at a later checkpoint. Their versions are
+        recorded on the run first, so if the run dies before that checkpoint, the retry can find them.
+        """
+        crud.add_pending_versions(db, run, {(chunk.file.path, chunk.file.file_hash) for chunk in chunks})
+        self._embed_and_store_chunks(chunks)
+
+    def _discard_uncheckpointed(self, run, known_hashes: Dict[str, str], refs):
+        """
+        Drop chunks an interrupted run stored but never checkpointed. The manifest does not know
+        those versions, so if the file changed before the retry nothing else would ever delete them.
+        Files affected are re-processed anyway, as their hashes were not recorded.
+        """
+        repo_id = str(run.repo_id)
+        versions = [
+            (path, file_hash) for path, file_hash in crud.get_pending_versions(run)
+            if known_hashes.get(path) != file_hash
+        ]
+        if not versions:
+            return
+        shared = [version for version in versions if refs.get(version, set()) - {run.branch}]
+        for path, file_hash in versions:
+            if (path, file_hash) not in shared:
+                self.vectorstore.delete_file_chunks(repo_id, path, file_hash=file_hash)
+                file_cache.invalidate(run.repo_id, path, file_hash)
+        if shared:
+            # Held by other branches: only this branch's flag was added
+            self.vectorstore.set_branch_flag(repo_id, shared, run.branch, False)
+        logger.info(f"Discarded {len(versions)} file version(s) left uncheckpointed by run {run.id}")
+
+    def _assign_content_ids(self, file: FileRecord, chunks: List[ChunkRecord], file_hash: str, branches):
+        """
+        Make chunk IDs content-derived: parsers key chunks by repo, path and signature, and
+        salting that with the file hash gives each version of a file its own, shareable chunk set.
+        """
+        file.file_hash = file_hash
+        file.branches = sorted(branches)
+        for chunk in chunks:
+            chunk.chunk_id = self.hasher.compute_hash(f"{chunk.chunk_id}:{file_hash}")
+
+    def _checkpoint(
+            self, db, run, chunks: List[ChunkRecord], file_hashes: Dict[str, str], branch_refs=None,
+            removed_paths=(), imports: Dict[str, str] = None,
+    ):
+        """
+        Store buffered chunks and branch flag changes, delete the chunks of released versions,
+        then persist the branch manifest (hashes of the files they came from) and the chunks'
+        import blocks, and commit.
+        Hashes are only written once their chunks are in the vectorstore, so a crash
+        after a checkpoint re-processes just the files since that checkpoint.
+        """
+        if chunks:
+            self._store_ahead_of_checkpoint(db, run, chunks)
+        if branch_refs:
+            repo_id = str(run.repo_id)
+            flagged = self.vectorstore.set_branch_flag(repo_id, branch_refs["add"], run.branch, True)
+            unflagged = self.vectorstore.set_branch_flag(repo_id, branch_refs["remove"], run.branch, False)
+            if flagged or unflagged:
+                logger.info(f"Branch {run.branch}: flagged {flagged} shared chunks, unflagged {unflagged}")
+            # Last before the commit: the versions replacing these are stored by now
+            for path, file_hash in branch_refs["delete"]:
+                self.vectorstore.delete_file_chunks(repo_id, path, file_hash=file_hash)
+                file_cache.invalidate(run.repo_id, path, file_hash)
+        with span("index", "db_commit"):
+            crud.upsert_file_hashes(db, run.repo_id, run.branch, file_hashes)
+            if imports:
+                crud.add_import_blocks(db, imports)
+            if removed_paths:
+                crud.delete_file_hashes(db, run.repo_id, run.branch, removed_paths)
+            crud.checkpoint_index_run(db, run, files_done=len(file_hashes), chunks_flushed=len(chunks))
+            crud.clear_pending_versions(run)
+            db.commit()
+        logger.info(f"Checkpoint committed for run {run.id}: {len(file_hashes)} file hashes, {len(chunks)} chunks")
+
     def _get_parser(self, file_path: str) -> base.BaseParser:
         ext = file_path.split(".")[-1]
         parser = self.parsers.get(ext)
@@ -103,38 +378,25 @@ class Indexer:
             logger.debug(f"No parser found for file extension '{ext}'; using default chunking")
         return parser
 
-    def _parse_file(self, file_path: str, content: str, repo_id: int, parser: base.BaseParser):
-        chunks = []
+    def _parse_file(
+            self, file_path: str, content: str, repo_id: int, parser: base.BaseParser
+    ) -> Tuple[FileRecord, List[ChunkRecord]]:
+        file = FileRecord(str(repo_id), file_path, language=file_path.split(".")[-1])
         if parser:
             logger.debug(f"Parsing file {file_path} with {parser.__class__.__name__}")
             ast = parser.parse_file(content=content)
-            chunks = parser.extract_chunks(ast, content, str(repo_id), file_path)
+            chunks = parser.extract_chunks(ast, content, file)
         else:
             chunk_id = self.hasher.compute_hash(f"{repo_id}:{file_path}")
-            file_ext = file_path.split(".")[-1]
-            chunks.append(
-                ChunkDocument(
-                    content=content,
-                    metadata=ChunkMetadata(
-                        chunk_id=chunk_id,
-                        file_id=file_path,
-                        repo_id=str(repo_id),
-                        start_line=1,
-                        end_line=content.count("\n") + 1,
-                        language=file_ext,
-                        author=None,
-                        last_modified=datetime.now(timezone.utc).isoformat(),
-                        class_context=None,
-                    ),
-                )
-            )
+            chunks = [ChunkRecord(chunk_id, file, content, start_line=1, end_line=content.count("\n") + 1)]
             logger.debug(f"Created single default chunk for file: {file_path}")
-        return chunks
+        return file, chunks
 
-    def _embed_and_store_chunks(self, chunks: List[ChunkDocument]):
+    def _embed_and_store_chunks(self, chunks: List[ChunkRecord]):
         if chunks:
             logger.debug(f"Embedding {len(chunks)} chunks into vectorstore")
             self.vectorstore.add_documents(chunks)
+            INDEXED_CHUNKS.inc(len(chunks))
             logger.info(f"Successfully added {len(chunks)} chunks to vectorstore")
         else:
             logger.warning("No chunks to embed into vectorstore")
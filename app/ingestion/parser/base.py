@@ -1,7 +1,7 @@
 from abc import ABC, abstractmethod
-from typing import List
+from typing import Dict, List
 
-from app.db.schemas import ChunkDocument
+from app.ingestion.records import ChunkRecord, FileRecord
 
 """
 Base Parser Module
@@ -9,7 +9,9 @@ Base Parser Module
 Defines the abstract base class `BaseParser` for all language-specific
 parsers. Ensures consistent interface:
 - parse_file(file_path): returns AST or structured representation
-- extract_chunks(ast): returns list of logical chunks (methods/classes)
+- extract_chunks(ast, content, file): returns list of logical chunks (methods/classes)
+  of the given FileRecord, and records the file's imports on it
+- extract_outline(ast): optional list of symbols with their line ranges
 """
 class BaseParser(ABC):
     """Abstract base class for language-specific parsers."""
@@ -22,17 +24,17 @@ class BaseParser(ABC):
         pass
 
     @abstractmethod
-    def extract_chunks(
-        self,
-        tree,
-        content: str,
-        repo_id: str,
-        file_id: str,
-        author: str = None,
-        last_modified = None
-    ) -> List[ChunkDocument]:
+    def extract_chunks(self, tree, content: str, file: FileRecord) -> List[ChunkRecord]:
         """
         Extract logical code chunks from the AST.
-        Returns a list of ChunkDocument objects.
+        Returns a list of ChunkRecord objects pointing at `file`.
         """
-        pass
\ No newline at end of file
+        pass
+
+    def extract_outline(self, tree) -> List[Dict]:
+        """
+        Return the file's symbols in source order, each a dict with
+        kind, name, signature, class_context, depth, start_line and end_line.
+        Parsers without symbol information return an empty outline.
+        """
+        return []
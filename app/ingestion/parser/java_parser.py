@@ -1,7 +1,6 @@
-from datetime import datetime, timezone
-from typing import List, Optional
+from typing import Dict, List, Optional
 from app.ingestion.parser.base import BaseParser
-from app.db.schemas import ChunkDocument, ChunkMetadata
+from app.ingestion.records import ChunkRecord, FileRecord
 import os
 import hashlib
 
@@ -18,6 +17,16 @@ class JavaParser(BaseParser):
         'interface_declaration',
         'enum_declaration',
     }
+    TYPE_NODE_TYPES = {
+        'class_declaration',
+        'interface_declaration',
+        'enum_declaration',
+        'record_declaration',
+    }
+    MEMBER_NODE_TYPES = {
+        'method_declaration',
+        'constructor_declaration',
+    }
 
     def __init__(self):
         """Initializes the tree-sitter parser with the Java grammar."""
@@ -58,16 +67,8 @@ class JavaParser(BaseParser):
             signature_parts.append(params_node.text.decode('utf8'))
         return ":".join(signature_parts)
 
-    def _traverse_and_chunk(
-            self,
-            node: Node,
-            imports_block: str,
-            repo_id: str,
-            file_id: str,
-            author: Optional[str],
-            last_modified: Optional[datetime]
-    ) -> List[ChunkDocument]:
-        """Recursively traverses the AST, creating a flat list of context-rich chunks."""
+    def _traverse_and_chunk(self, node: Node, file: FileRecord) -> List[ChunkRecord]:
+        """Recursively traverses the AST, creating a flat list of chunks."""
         chunks = []
         if node.type in self.CHUNKABLE_NODE_TYPES:
             class_context = self._find_parent_class_context(node)
@@ -81,45 +82,66 @@ class JavaParser(BaseParser):
                 comment_node = node.prev_named_sibling
                 comment_text = comment_node.text.decode('utf8') + '\n'
                 start_line = comment_node.start_point[0] + 1
-            full_content = f"{imports_block}\n\n{comment_text}{content_text}"
             signature = self._get_node_signature(node, class_context)
-            id_string = f"{repo_id}:{file_id}:{signature}"
+            id_string = f"{file.repo_id}:{file.path}:{signature}"
             chunk_id = hashlib.sha256(id_string.encode('utf-8')).hexdigest()
 
-            chunk = ChunkDocument(
-                content=full_content.strip(),
-                metadata=ChunkMetadata(
-                    chunk_id=chunk_id,  # Use the new signature-based ID
-                    file_id=file_id,
-                    repo_id=repo_id,
-                    start_line=start_line,
-                    end_line=end_line,
-                    language="java",
-                    author=author,
-                    last_modified=datetime.now(timezone.utc).isoformat(),
-                    class_context=class_context
-                )
-            )
-            chunks.append(chunk)
+            # The file's imports are kept once on the FileRecord, not repeated in every chunk
+            chunks.append(ChunkRecord(
+                chunk_id=chunk_id,  # Use the new signature-based ID
+                file=file,
+                content=f"{comment_text}{content_text}".strip(),
+                start_line=start_line,
+                end_line=end_line,
+                class_context=class_context,
+            ))
 
         for child in node.children:
-            chunks.extend(self._traverse_and_chunk(child, imports_block, str(repo_id), file_id, author, last_modified))
+            chunks.extend(self._traverse_and_chunk(child, file))
 
         return chunks
 
-    def extract_chunks(
-            self,
-            root_node: Node,
-            content: str,
-            repo_id: str,
-            file_id: str,
-            author=None,
-            last_modified=None
-    ) -> List[ChunkDocument]:
-        """Extracts a flat list of context-rich chunks from a file's AST root node."""
+    def extract_chunks(self, root_node: Node, content: str, file: FileRecord) -> List[ChunkRecord]:
+        """Extracts a flat list of chunks from a file's AST root node, and the file's imports."""
         import_nodes = [node for node in root_node.children if node.type == 'import_declaration']
-        imports_block = "\n".join(node.text.decode('utf8') for node in import_nodes)
-        return self._traverse_and_chunk(root_node, imports_block, repo_id, file_id, author, last_modified)
+        file.set_imports("\n".join(node.text.decode('utf8') for node in import_nodes))
+        return self._traverse_and_chunk(root_node, file)
+
+    def _outline_entry(self, node: Node, class_context: Optional[str], depth: int) -> Dict:
+        """Signature is the declaration up to its body, on one line; start_line includes a leading doc comment."""
+        body = node.child_by_field_name('body')
+        header = node.text[:body.start_byte - node.start_byte] if body else node.text
+        start_line = node.start_point[0] + 1
+        if node.prev_named_sibling and node.prev_named_sibling.type == 'block_comment':
+            start_line = node.prev_named_sibling.start_point[0] + 1
+        name_node = node.child_by_field_name('name')
+        return {
+            "kind": node.type.replace('_declaration', ''),
+            "name": name_node.text.decode('utf8') if name_node else "",
+            "signature": " ".join(header.decode('utf8').split()),
+            "class_context": class_context,
+            "depth": depth,
+            "start_line": start_line,
+            "end_line": node.end_point[0] + 1,
+        }
+
+    def extract_outline(self, root_node: Node) -> List[Dict]:
+        """Types and their methods/constructors in source order, nested types indented by depth."""
+        outline = []
+
+        def visit(node: Node, class_context: Optional[str], depth: int):
+            for child in node.children:
+                if child.type in self.TYPE_NODE_TYPES:
+                    entry = self._outline_entry(child, class_context, depth)
+                    outline.append(entry)
+                    visit(child, entry["name"], depth + 1)
+                elif child.type in self.MEMBER_NODE_TYPES:
+                    outline.append(self._outline_entry(child, class_context, depth))
+                else:
+                    visit(child, class_context, depth)
+
+        visit(root_node, None, 0)
+        return outline
 
 
 if __name__ == "__main__":
@@ -154,13 +176,13 @@ public class OrderController {
 """
     parser = JavaParser()
     tree = parser.parse_file(sample_java)
-    chunks = parser.extract_chunks(tree, sample_java, repo_id="test_repo", file_id="OrderController.java")
+    file = FileRecord("test_repo", "OrderController.java", "java")
+    chunks = parser.extract_chunks(tree, sample_java, file)
 
-    print(f"Extracted {len(chunks)} chunks:")
+    print(f"Extracted {len(chunks)} chunks (imports {file.imports_id}):\n{file.imports}")
     for chunk in chunks:
         print("-" * 50)
-        print(f"Chunk ID: {chunk.metadata.chunk_id}")
-        # Assuming your ChunkMetadata schema is updated, this will work
-        print(f"Class Context: {chunk.metadata.class_context}")
-        print(f"Lines: {chunk.metadata.start_line}-{chunk.metadata.end_line}")
+        print(f"Chunk ID: {chunk.chunk_id}")
+        print(f"Class Context: {chunk.class_context}")
+        print(f"Lines: {chunk.start_line}-{chunk.end_line}")
         print(chunk.content)
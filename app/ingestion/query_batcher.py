@@ -0,0 +1,70 @@
+# app/ingestion/query_batcher.py
+"""
+Query Batcher
+
+Coalesces concurrent single-query embedding requests on the serving path.
+Queries that arrive within a short window (up to a max batch size) are
+encoded with one forward pass and each caller receives its own vector.
+A caller waits at most one window before its batch is dispatched.
+"""
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBatcher:
+    """Gathers queries from many threads and encodes them in micro-batches."""
+
+    def __init__(self, encode_fn: Callable[[List[str]], "object"], window_ms: float = 5.0, max_batch: int = 32):
+        """
+        Args:
+            encode_fn: Encodes a list of texts, returning one vector per text.
+            window_ms: How long the first query of a batch waits for company.
+            max_batch: Upper bound on the number of queries encoded together.
+        """
+        self.encode_fn = encode_fn
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self._queue: "queue.Queue[tuple[str, Future]]" = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name="query-batcher", daemon=True)
+        self._worker.start()
+        logger.info("Query batcher started (window=%.1fms, max_batch=%d)", window_ms, max_batch)
+
+    def submit(self, text: str):
+        """Queue a query and block until its vector is ready."""
+        future: Future = Future()
+        self._queue.put((text, future))
+        return future.result()
+
+    def _collect_batch(self) -> List[tuple]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            texts = [text for text, _ in batch]
+            logger.debug("Encoding query micro-batch of %d", len(texts))
+            try:
+                vectors = self.encode_fn(texts)
+            except Exception as e:
+                logger.exception("Query micro-batch encoding failed")
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), vector in zip(batch, vectors):
+                future.set_result(vector)
@@ -0,0 +1,90 @@
+# app/ingestion/records.py
+"""
+Chunk Records:
+- The indexer's in-memory representation of chunks, kept small because a batch holds
+  thousands of them: slotted classes instead of pydantic models
+- Everything a file's chunks have in common (repo, path, language, content hash, branches,
+  imports) lives once on its `FileRecord`; each `ChunkRecord` points at it
+- Paths and languages are interned; a file's import block is stored once, content-addressed,
+  and chunks reference it by `imports_id` instead of repeating it in their content
+- The chunk API returns the stored metadata as is; there is no separate API model to keep in sync
+"""
+import hashlib
+import sys
+from typing import Dict, Iterable, List, Optional
+
+
+def imports_id(imports: str) -> Optional[str]:
+    """Content address of an import block; None for files without imports."""
+    return hashlib.sha256(imports.encode("utf-8")).hexdigest() if imports else None
+
+
+class FileRecord:
+    """One version of one file, shared by all of its chunks."""
+    __slots__ = ("repo_id", "path", "language", "file_hash", "branches", "imports", "imports_id")
+
+    def __init__(self, repo_id: str, path: str, language: Optional[str] = None):
+        self.repo_id = sys.intern(str(repo_id))
+        self.path = sys.intern(path)
+        self.language = sys.intern(language) if language else None
+        self.file_hash: Optional[str] = None
+        self.branches: List[str] = []
+        self.imports = ""
+        self.imports_id: Optional[str] = None
+
+    def set_imports(self, imports: str):
+        self.imports = imports
+        self.imports_id = imports_id(imports)
+
+
+class ChunkRecord:
+    """A chunk of a file: its ID, location and own text (without the file's imports)."""
+    __slots__ = ("chunk_id", "file", "class_context", "start_line", "end_line", "content")
+
+    def __init__(
+            self,
+            chunk_id: str,
+            file: FileRecord,
+            content: str,
+            start_line: int,
+            end_line: int,
+            class_context: Optional[str] = None,
+    ):
+        self.chunk_id = chunk_id
+        self.file = file
+        self.content = content
+        self.start_line = start_line
+        self.end_line = end_line
+        self.class_context = sys.intern(class_context) if class_context else None
+
+    def metadata(self) -> Dict:
+        """Flat metadata as stored with the chunk. Unset values are left out rather than stored as nulls."""
+        file = self.file
+        metadata = {
+            "chunk_id": self.chunk_id,
+            "file_id": file.path,
+            "repo_id": file.repo_id,
+            "start_line": self.start_line,
+            "end_line": self.end_line,
+        }
+        for key, value in (
+                ("class_context", self.class_context),
+                ("language", file.language),
+                ("file_hash", file.file_hash),
+                ("imports_id", file.imports_id),
+        ):
+            if value is not None:
+                metadata[key] = value
+        return metadata
+
+    @classmethod
+    def from_metadata(cls, metadata: Dict, branches: Iterable[str], content: str = "") -> "ChunkRecord":
+        """Rebuild a record from stored metadata (each call makes its own FileRecord)."""
+        file = FileRecord(metadata["repo_id"], metadata["file_id"], metadata.get("language"))
+        file.file_hash = metadata.get("file_hash")
+        file.imports_id = metadata.get("imports_id")
+        file.branches = sorted(branches)
+        return cls(
+            metadata["chunk_id"], file, content, metadata["start_line"], metadata["end_line"],
+            metadata.get("class_context"),
+        )
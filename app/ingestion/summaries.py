@@ -0,0 +1,89 @@
+# app/ingestion/summaries.py
+"""
+Summary Index Aggregation:
+- A "unit" is one class of one file version (or the whole file for unparsed files); its
+  summary vector is the normalised centroid of its chunk embeddings, so building the
+  second-level index costs no extra model calls
+- A package is a directory; its vector is the chunk-weighted centroid of its units
+"""
+import hashlib
+import posixpath
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+from app.ingestion.records import ChunkRecord
+
+
+def package_of(file_path: str) -> str:
+    return posixpath.dirname(file_path.replace("\\", "/")) or "."
+
+
+def _normalise(vector: np.ndarray) -> List[float]:
+    norm = float(np.linalg.norm(vector))
+    return (vector / norm if norm else vector).tolist()
+
+
+def unit_summaries(chunks: Sequence[ChunkRecord], embeddings: Sequence[Sequence[float]]) -> List[Dict]:
+    """
+    Group chunks by (file, file version, class) and return one summary record per group:
+    id, embedding, document (a short human-readable label) and metadata.
+    """
+    groups: Dict[Tuple[str, str, str], List[int]] = {}
+    for i, chunk in enumerate(chunks):
+        groups.setdefault((chunk.file.path, chunk.file.file_hash or "", chunk.class_context or ""), []).append(i)
+
+    records = []
+    for (file_id, file_hash, class_context), positions in groups.items():
+        first = chunks[positions[0]].file
+        centroid = np.mean(np.asarray([embeddings[i] for i in positions], dtype=np.float32), axis=0)
+        metadata = {
+            "level": "class" if class_context else "file",
+            "repo_id": first.repo_id,
+            "file_id": file_id,
+            "file_hash": file_hash,
+            "class_context": class_context,
+            "package": package_of(file_id),
+            "chunk_count": len(positions),
+        }
+        records.append({
+            "id": hashlib.sha256(f"{file_id}:{file_hash}:{class_context}".encode()).hexdigest(),
+            "embedding": _normalise(centroid),
+            "document": f"{class_context or posixpath.basename(file_id)} ({file_id}, {len(positions)} chunks)",
+            "metadata": metadata,
+            "branches": list(first.branches),
+        })
+    return records
+
+
+class PackageAccumulator:
+    """Streams unit summaries in and produces package centroids, holding one running sum per package."""
+
+    def __init__(self):
+        self._sums: Dict[str, np.ndarray] = {}
+        self._counts: Dict[str, int] = {}
+
+    def add(self, package: str, embedding: Iterable[float], weight: int):
+        vector = np.asarray(embedding, dtype=np.float32) * weight
+        if package in self._sums:
+            self._sums[package] += vector
+        else:
+            self._sums[package] = vector
+        self._counts[package] = self._counts.get(package, 0) + weight
+
+    def records(self, repo_id: str, branch: str) -> List[Dict]:
+        records = []
+        for package, total in self._sums.items():
+            records.append({
+                "id": hashlib.sha256(f"package:{branch}:{package}".encode()).hexdigest(),
+                "embedding": _normalise(total),
+                "document": f"package {package} ({self._counts[package]} chunks)",
+                "metadata": {
+                    "level": "package",
+                    "repo_id": repo_id,
+                    "package": package,
+                    "branch": branch,
+                    "chunk_count": self._counts[package],
+                },
+            })
+        return records
@@ -0,0 +1,200 @@
+# app/ingestion/watcher.py
+"""
+Local Repo Watcher:
+- Watch mode for registered repos that live on the local filesystem (served by
+  LocalDataProvider): change events from inotify (FSEvents / ReadDirectoryChangesW elsewhere)
+  through `watchdog`, an optional dependency imported only when watching starts
+- The watchdog thread only records changed paths; one worker debounces them per repo (indexed
+  once quiet for WATCH_DEBOUNCE_SECONDS, at most WATCH_MAX_DELAY_SECONDS after the first change),
+  so a branch switch touching thousands of files becomes a single incremental run
+- Each batch goes to `Indexer.index_paths`, which fetches, parses and embeds only those paths
+  and drops the deleted ones; the repo is only rescanned to finish an interrupted index run
+- Registered repos are re-read every WATCH_REFRESH_SECONDS to follow repos added or deleted via the API
+"""
+import logging
+import os
+import threading
+import time
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Set, Tuple
+
+from app.config import settings
+from app.config.settings import IGNORED_FOLDERS
+from app.db import crud
+from app.db.session import SessionLocal
+from app.ingestion.file_filters import is_indexable_path
+from app.metrics import WATCH_BATCHES, WATCH_EVENTS, WATCH_LAG_SECONDS
+
+if TYPE_CHECKING:
+    from app.ingestion.indexer import Indexer
+
+logger = logging.getLogger(__name__)
+
+# Events that change what is on disk; opened/closed notifications are not
+_CHANGE_EVENTS = {"created", "deleted", "modified", "moved"}
+
+
+class _PendingChanges:
+    """Changed paths of one repo waiting for the debounce to expire."""
+    __slots__ = ("paths", "first", "last")
+
+    def __init__(self, now: float):
+        self.paths: Set[str] = set()
+        self.first = now
+        self.last = now
+
+
+class _EventCollector:
+    """Event handler for one repo (watchdog observers only call `dispatch`)."""
+
+    def __init__(self, watcher: "RepoWatcher", repo_path: str):
+        self.watcher = watcher
+        self.repo_path = repo_path
+
+    def dispatch(self, event):
+        if event.event_type not in _CHANGE_EVENTS:
+            return
+        # A directory's own "modified" only means its entries changed, which are reported separately
+        if event.is_directory and event.event_type == "modified":
+            return
+        paths = [event.src_path]
+        if event.event_type == "moved":
+            paths.append(event.dest_path)
+        for path in paths:
+            rel_path = self._relevant(os.fsdecode(path), event.is_directory)
+            if rel_path is None:
+                WATCH_EVENTS.labels("ignored").inc()
+            else:
+                WATCH_EVENTS.labels("queued").inc()
+                self.watcher.queue(self.repo_path, rel_path)
+
+    def _relevant(self, path: str, is_directory: bool) -> Optional[str]:
+        """Repo-relative path if the change can affect the index, else None."""
+        rel_path = os.path.relpath(path, self.repo_path)
+        if rel_path == "." or rel_path.startswith(".."):
+            return None
+        if is_directory:
+            return None if IGNORED_FOLDERS.intersection(rel_path.replace("\\", "/").split("/")) else rel_path
+        return rel_path if is_indexable_path(rel_path) else None
+
+
+class RepoWatcher:
+    """
+    Keeps the index of every registered local repo up to date while the process runs.
+    `get_indexer` is only called for the first batch, so starting the watcher stays cheap.
+    """
+
+    def __init__(self, get_indexer: Callable[[], "Indexer"]):
+        self._get_indexer = get_indexer
+        self._observer = None
+        self._thread: Optional[threading.Thread] = None
+        # repo url -> watchdog watch handle, and the branch its changes are indexed under
+        self._watches: Dict[str, object] = {}
+        self._branches: Dict[str, Optional[str]] = {}
+        self._pending: Dict[str, _PendingChanges] = {}
+        self._cond = threading.Condition()
+        self._stopping = False
+
+    def start(self):
+        try:
+            from watchdog.observers import Observer
+        except ImportError as e:
+            raise RuntimeError("Watch mode needs the `watchdog` package (pip install watchdog)") from e
+        self._observer = Observer()
+        self._observer.start()
+        self.refresh()
+        self._thread = threading.Thread(target=self._run, name="repo-watcher", daemon=True)
+        self._thread.start()
+        logger.info(f"Watching {len(self._watches)} local repo(s) for changes")
+
+    def stop(self):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+        if self._thread is not None:
+            self._thread.join()
+        logger.info("Repo watcher stopped")
+
+    def refresh(self):
+        """Start watching newly registered local repos and stop watching deleted ones."""
+        db = SessionLocal()
+        try:
+            repos = {repo.url: repo.branch for repo in crud.list_repos(db) if os.path.isdir(repo.url)}
+        finally:
+            db.close()
+        for url in set(self._watches) - set(repos):
+            logger.info(f"No longer watching {url}")
+            self._observer.unschedule(self._watches.pop(url))
+            with self._cond:
+                self._pending.pop(url, None)
+        for url in set(repos) - set(self._watches):
+            try:
+                self._watches[url] = self._observer.schedule(_EventCollector(self, url), url, recursive=True)
+                logger.info(f"Watching {url} for changes")
+            except OSError as e:
+                # Typically the inotify watch limit (fs.inotify.max_user_watches) on large trees
+                logger.error(f"Cannot watch {url}: {e}")
+        self._branches = repos
+
+    def queue(self, repo_path: str, rel_path: str):
+        """Record a changed path; called from the watchdog thread."""
+        now = time.monotonic()
+        with self._cond:
+            pending = self._pending.get(repo_path)
+            if pending is None:
+                pending = self._pending[repo_path] = _PendingChanges(now)
+            pending.paths.add(rel_path)
+            pending.last = now
+            self._cond.notify()
+
+    def _take_due(self, now: float) -> List[Tuple[str, _PendingChanges]]:
+        due = [
+            url for url, pending in self._pending.items()
+            if now - pending.last >= settings.WATCH_DEBOUNCE_SECONDS
+            or now - pending.first >= settings.WATCH_MAX_DELAY_SECONDS
+        ]
+        return [(url, self._pending.pop(url)) for url in due]
+
+    def _wait_seconds(self, now: float, next_refresh: float) -> float:
+        wake_at = next_refresh
+        for pending in self._pending.values():
+            wake_at = min(
+                wake_at,
+                pending.last + settings.WATCH_DEBOUNCE_SECONDS,
+                pending.first + settings.WATCH_MAX_DELAY_SECONDS,
+            )
+        return max(0.0, wake_at - now)
+
+    def _run(self):
+        next_refresh = time.monotonic() + settings.WATCH_REFRESH_SECONDS
+        while True:
+            with self._cond:
+                if self._stopping:
+                    return
+                now = time.monotonic()
+                batches = self._take_due(now)
+                if not batches and now < next_refresh:
+                    self._cond.wait(self._wait_seconds(now, next_refresh))
+                    continue
+            # Indexed outside the lock: changes arriving meanwhile start the repo's next batch
+            for url, pending in batches:
+                self._index(url, pending)
+            if time.monotonic() >= next_refresh:
+                try:
+                    self.refresh()
+                except Exception:
+                    logger.exception("Failed to refresh the watched repos")
+                next_refresh = time.monotonic() + settings.WATCH_REFRESH_SECONDS
+
+    def _index(self, url: str, pending: _PendingChanges):
+        logger.info(f"Indexing {len(pending.paths)} changed path(s) in {url}")
+        try:
+            self._get_indexer().index_paths(url, pending.paths, self._branches.get(url))
+            WATCH_BATCHES.labels("completed").inc()
+        except Exception:
+            # The failed run stays resumable, so the repo's next batch rescans it instead of losing these paths
+            logger.exception(f"Watch-mode indexing failed for {url}")
+            WATCH_BATCHES.labels("failed").inc()
+        WATCH_LAG_SECONDS.observe(time.monotonic() - pending.first)
@@ -0,0 +1,229 @@
+# app/metrics.py
+"""
+Metrics & Tracing:
+- Prometheus histograms/counters for every stage of the query and indexing pipelines,
+  exposed on the `/metrics` endpoint
+- Optional per-request traces: the spans of one request collected through a context
+  variable, so nested components record into the trace without it being passed around
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+# Sub-millisecond embedding calls up to minute-long LLM calls and index batches
+_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+STAGE_SECONDS = Histogram(
+    "coderag_stage_seconds",
+    "Wall time spent in a pipeline stage.",
+    ["pipeline", "stage"],
+    buckets=_BUCKETS,
+)
+STAGE_ERRORS = Counter(
+    "coderag_stage_errors_total",
+    "Stage executions that raised an exception.",
+    ["pipeline", "stage"],
+)
+INDEXED_FILES = Counter(
+    "coderag_indexed_files_total",
+    "Files seen by the indexer, by outcome (unchanged, changed = re-embedded, shared = reused from another branch, "
+    "too_large, generated, minified).",
+    ["outcome"],
+)
+INDEXED_CHUNKS = Counter(
+    "coderag_indexed_chunks_total",
+    "Chunks embedded and stored by the indexer.",
+)
+AGENT_QUERIES = Counter(
+    "coderag_agent_queries_total",
+    "Queries handled by the agent.",
+)
+# Malformed decisions per 1k queries:
+#   1000 * rate(coderag_agent_decisions_total{outcome!="valid"}[1h]) / rate(coderag_agent_queries_total[1h])
+AGENT_DECISIONS = Counter(
+    "coderag_agent_decisions_total",
+    "LLM decisions by parse outcome (valid, repaired, failed).",
+    ["outcome"],
+)
+DECISION_REPAIR_SAVED_SECONDS = Counter(
+    "coderag_decision_repair_saved_seconds_total",
+    "Estimated latency saved by repairing malformed decisions instead of repeating the decision call.",
+)
+LLM_CACHE = Counter(
+    "coderag_llm_cache_total",
+    "LLM response cache lookups by result (hit, miss, expired).",
+    ["result"],
+)
+INDEX_MEMORY_FLUSHES = Counter(
+    "coderag_index_memory_flushes_total",
+    "Chunk buffers flushed early because the indexer was over INDEX_MEMORY_LIMIT_MB.",
+)
+WATCH_EVENTS = Counter(
+    "coderag_watch_events_total",
+    "Filesystem events seen by the local repo watcher (queued for indexing or ignored).",
+    ["result"],
+)
+WATCH_BATCHES = Counter(
+    "coderag_watch_batches_total",
+    "Debounced batches of changed paths indexed by the watcher, by outcome.",
+    ["outcome"],
+)
+WATCH_LAG_SECONDS = Histogram(
+    "coderag_watch_lag_seconds",
+    "Time from the first change of a batch until it is indexed (index freshness in watch mode).",
+    buckets=_BUCKETS,
+)
+AGENT_EARLY_STOPS = Counter(
+    "coderag_agent_early_stops_total",
+    "Agent loops cut short by the query deadline (budget, expired) or a client disconnect (cancelled).",
+    ["reason"],
+)
+PREFETCH_FILES = Counter(
+    "coderag_prefetch_files_total",
+    "Speculative file loads by outcome (scheduled, skipped over budget, used, unused, cancelled).",
+    ["outcome"],
+)
+PREFETCH_LOOKUPS = Counter(
+    "coderag_prefetch_lookups_total",
+    "File reads by agent tools: served from the request's prefetch (hit), waited on it (wait), or not prefetched (miss).",
+    ["result"],
+)
+LLM_QUEUE_DEPTH = Gauge(
+    "coderag_llm_queue_depth",
+    "LLM calls waiting for a dispatcher slot.",
+)
+LLM_IN_FLIGHT = Gauge(
+    "coderag_llm_in_flight",
+    "LLM calls currently sent to the provider.",
+)
+LLM_QUEUE_WAIT_SECONDS = Histogram(
+    "coderag_llm_queue_wait_seconds",
+    "Time LLM calls waited for a dispatcher slot, by priority (0 = final answer, 1 = decision).",
+    ["priority"],
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+LLM_RETRIES = Counter(
+    "coderag_llm_retries_total",
+    "LLM calls retried after a transient provider error.",
+)
+LLM_REJECTED = Counter(
+    "coderag_llm_rejected_total",
+    "LLM calls given up because their deadline would pass (queue_deadline, rate_deadline, retry_deadline).",
+    ["reason"],
+)
+RERANK_RESULTS = Counter(
+    "coderag_rerank_total",
+    "Re-ranking calls by outcome (reranked, over_budget, cold, error).",
+    ["outcome"],
+)
+RERANK_CACHE = Counter(
+    "coderag_rerank_cache_total",
+    "Cross-encoder score lookups by result (hit, miss).",
+    ["result"],
+)
+
+# Spans beyond this are counted but not kept, so a trace stays small
+MAX_TRACE_SPANS = 500
+
+
+class Trace:
+    """Timing spans recorded during one request, in start order."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans: List[Dict[str, Any]] = []
+        self.dropped = 0
+        self._depth = 0
+
+    def open(self, stage: str, attrs: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        self._depth += 1
+        if len(self.spans) >= MAX_TRACE_SPANS:
+            self.dropped += 1
+            return None
+        record = {
+            "stage": stage,
+            "depth": self._depth - 1,
+            "start_ms": round((time.perf_counter() - self.started) * 1000, 2),
+            **attrs,
+        }
+        self.spans.append(record)
+        return record
+
+    def close(self, record: Optional[Dict[str, Any]], elapsed: float, error: bool):
+        self._depth -= 1
+        if record is not None:
+            record["duration_ms"] = round(elapsed * 1000, 2)
+            if error:
+                record["error"] = True
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "total_ms": round((time.perf_counter() - self.started) * 1000, 2),
+            "spans": self.spans,
+            "dropped_spans": self.dropped,
+        }
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("coderag_trace", default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def start_trace():
+    """Collect the spans of everything run inside this block into a new Trace."""
+    trace = Trace()
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+@contextmanager
+def span(pipeline: str, stage: str, **attrs):
+    """
+    Time a stage: always observed in the stage histogram, and recorded in the
+    current trace when one is active. Extra keyword args are kept on the trace span only.
+    """
+    trace = _current_trace.get()
+    record = trace.open(stage, attrs) if trace else None
+    start = time.perf_counter()
+    error = False
+    try:
+        yield
+    except BaseException:
+        error = True
+        STAGE_ERRORS.labels(pipeline, stage).inc()
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.labels(pipeline, stage).observe(elapsed)
+        if trace:
+            trace.close(record, elapsed, error)
+
+
+def timed_iter(iterable, pipeline: str, stage: str):
+    """Yield from an iterable, observing the time spent waiting for each item as one stage execution."""
+    iterator = iter(iterable)
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        except BaseException:
+            STAGE_ERRORS.labels(pipeline, stage).inc()
+            raise
+        STAGE_SECONDS.labels(pipeline, stage).observe(time.perf_counter() - start)
+        yield item
+
+
+def render_metrics() -> tuple:
+    """Return (body, content type) for the Prometheus scrape endpoint."""
+    return generate_latest(), CONTENT_TYPE_LATEST
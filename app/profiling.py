@@ -0,0 +1,181 @@
+# app/profiling.py
+"""
+Request Profiling:
+- Opt-in, per-request sampling profiler (`X-Coderag-Profile: 1` header or `?profile=true`)
+- Samples the stack of the request's thread, plus the helper threads that work on its
+  behalf (query batcher, GitLab fetchers, prefetch workers), every PROFILE_SAMPLE_INTERVAL_MS;
+  those pools are shared, so their samples may include other concurrent requests' work
+- Stacks are stored in the folded format (`frame;frame;frame count`) read by
+  flamegraph.pl, speedscope and inferno, and downloadable from the admin routes
+- Rate limited (PROFILE_MAX_PER_MINUTE, one profile at a time) to keep overhead bounded
+"""
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict, List
+
+from app.config.settings import (
+    PROFILE_DIR, PROFILE_SAMPLE_INTERVAL_MS, PROFILE_MAX_PER_MINUTE, PROFILE_MAX_SECONDS, PROFILE_HELPER_THREADS,
+)
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "X-Coderag-Profile"
+PROFILE_ID_HEADER = "X-Coderag-Profile-Id"
+
+
+class SamplingProfiler:
+    """Background thread that periodically captures the stacks of selected threads."""
+
+    def __init__(self, thread_id: int, interval_ms: float, max_seconds: float):
+        self.thread_id = thread_id
+        self.interval = interval_ms / 1000.0
+        self.max_seconds = max_seconds
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    @staticmethod
+    def _fold(frame) -> List[str]:
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            module = frame.f_globals.get("__name__", "?")
+            names.append(f"{module}:{code.co_name}")
+            frame = frame.f_back
+        names.reverse()
+        return names
+
+    def _run(self):
+        deadline = time.monotonic() + self.max_seconds
+        while not self._stop.wait(self.interval):
+            if time.monotonic() > deadline:
+                logger.warning("Profiler reached PROFILE_MAX_SECONDS; sampling stopped early")
+                return
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == self.thread_id:
+                    root = "request"
+                elif names.get(ident, "").startswith(PROFILE_HELPER_THREADS):
+                    root = names[ident]
+                else:
+                    continue
+                self.stacks[";".join([root] + self._fold(frame))] += 1
+            self.samples += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+
+class ProfileRateLimiter:
+    """At most `per_minute` profiles in any 60s window, and never two at once."""
+
+    def __init__(self, per_minute: int):
+        self.per_minute = per_minute
+        self._started: List[float] = []
+        self._active = False
+        self._lock = threading.Lock()
+
+    def acquire(self) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            self._started = [t for t in self._started if now - t < 60]
+            if self._active or len(self._started) >= self.per_minute:
+                return False
+            self._started.append(now)
+            self._active = True
+            return True
+
+    def release(self):
+        with self._lock:
+            self._active = False
+
+
+class ProfileStore:
+    """Folded-stack profiles on disk, one file per profiled request."""
+
+    def __init__(self, directory: str = PROFILE_DIR):
+        self.directory = directory
+
+    def save(self, profile_id: str, label: str, profiler: SamplingProfiler, elapsed: float):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(profile_id)
+        with open(path, "w") as f:
+            f.write(f"# label={label} samples={profiler.samples} interval_ms={profiler.interval * 1000:.0f} "
+                    f"elapsed_s={elapsed:.3f} created={datetime.now(timezone.utc).isoformat()}\n")
+            for stack, count in profiler.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        logger.info(f"Saved profile {profile_id} ({label}, {profiler.samples} samples) to {path}")
+
+    def path(self, profile_id: str) -> str:
+        return os.path.join(self.directory, f"{profile_id}.folded")
+
+    def exists(self, profile_id: str) -> bool:
+        # IDs are generated hex strings; anything else is never a valid file name here
+        return all(c in "0123456789abcdef" for c in profile_id) and os.path.exists(self.path(profile_id))
+
+    def list(self) -> List[Dict]:
+        if not os.path.isdir(self.directory):
+            return []
+        profiles = []
+        for name in sorted(os.listdir(self.directory), reverse=True):
+            if not name.endswith(".folded"):
+                continue
+            full_path = os.path.join(self.directory, name)
+            with open(full_path) as f:
+                header = f.readline().lstrip("# ").strip()
+            profiles.append({
+                "profile_id": name[:-len(".folded")],
+                "size_bytes": os.path.getsize(full_path),
+                **dict(part.split("=", 1) for part in header.split() if "=" in part),
+            })
+        return profiles
+
+
+rate_limiter = ProfileRateLimiter(PROFILE_MAX_PER_MINUTE)
+profile_store = ProfileStore()
+
+
+def wants_profile(headers, query_params) -> bool:
+    """True if the request opted into profiling via header or query flag."""
+    flag = headers.get(PROFILE_HEADER) or query_params.get("profile") or ""
+    return flag.lower() in ("1", "true", "yes")
+
+
+@contextmanager
+def profile_request(enabled: bool, label: str):
+    """
+    Profile the current thread for the duration of the block.
+    Yields the profile ID, or None when profiling was not requested or was rate limited.
+    """
+    if not enabled:
+        yield None
+        return
+    if not rate_limiter.acquire():
+        logger.info(f"Profiling of '{label}' skipped: rate limit reached")
+        yield None
+        return
+    # A timestamp prefix keeps the admin listing in chronological order
+    profile_id = f"{int(time.time()):x}{uuid.uuid4().hex[:12]}"
+    profiler = SamplingProfiler(threading.get_ident(), PROFILE_SAMPLE_INTERVAL_MS, PROFILE_MAX_SECONDS)
+    start = time.perf_counter()
+    profiler.start()
+    try:
+        yield profile_id
+    finally:
+        profiler.stop()
+        try:
+            profile_store.save(profile_id, label, profiler, time.perf_counter() - start)
+        finally:
+            rate_limiter.release()
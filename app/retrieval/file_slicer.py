@@ -0,0 +1,108 @@
+# app/retrieval/file_slicer.py
+"""
+File Slicer:
+- Per-file line-offset index for O(1) line-range slicing
+- Compact outlines (class/method signatures with line numbers) from the language parsers
+- A small LRU of prepared file views, keyed by content hash so edits never serve stale slices
+"""
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from app.ingestion.parser.base import BaseParser
+
+
+class LineIndex:
+    """Start offset of every line in a file, so any line range is a single string slice."""
+    __slots__ = ("content", "offsets")
+
+    def __init__(self, content: str):
+        self.content = content
+        offsets = [0]
+        position = content.find("\n")
+        while position != -1:
+            offsets.append(position + 1)
+            position = content.find("\n", position + 1)
+        if len(offsets) > 1 and offsets[-1] == len(content):
+            offsets.pop()  # a trailing newline does not start another line
+        self.offsets = offsets
+
+    @property
+    def line_count(self) -> int:
+        return len(self.offsets)
+
+    def clamp(self, start_line: int, end_line: int) -> Tuple[int, int]:
+        """Clamp a 1-based inclusive range to the file."""
+        start_line = min(max(1, start_line), self.line_count)
+        end_line = min(max(start_line, end_line), self.line_count)
+        return start_line, end_line
+
+    def slice(self, start_line: int, end_line: int) -> str:
+        """Return lines [start_line, end_line] (1-based, inclusive)."""
+        start_line, end_line = self.clamp(start_line, end_line)
+        start = self.offsets[start_line - 1]
+        end = self.offsets[end_line] if end_line < self.line_count else len(self.content)
+        return self.content[start:end].rstrip("\n")
+
+
+class FileView:
+    """A file's line index plus its parsed outline."""
+    __slots__ = ("lines", "outline")
+
+    def __init__(self, content: str, parser: Optional[BaseParser] = None):
+        self.lines = LineIndex(content)
+        self.outline: List[Dict] = parser.extract_outline(parser.parse_file(content)) if parser else []
+
+    def find_member(self, name: str) -> Optional[Dict]:
+        """
+        Find an outline entry by `name` or `Class.name`.
+        Returns the first match in file order.
+        """
+        owner, _, member = name.rpartition(".")
+        for entry in self.outline:
+            if entry["name"] == member and (not owner or entry.get("class_context") == owner):
+                return entry
+        return None
+
+    def render_outline(self) -> str:
+        """One line per symbol: `L<start>-<end> <signature>`, members indented under their type."""
+        rendered = []
+        for entry in self.outline:
+            indent = "  " * entry.get("depth", 0)
+            rendered.append(f"{indent}L{entry['start_line']}-{entry['end_line']} {entry['signature']}")
+        return "\n".join(rendered)
+
+    def render_lines(self, start_line: int, end_line: int) -> str:
+        """Line-numbered slice so the model can refer back to exact lines."""
+        start_line, end_line = self.lines.clamp(start_line, end_line)
+        text = self.lines.slice(start_line, end_line)
+        return "\n".join(f"{number}: {line}" for number, line in enumerate(text.split("\n"), start=start_line))
+
+
+class FileViewCache:
+    """LRU of FileViews keyed by (repo_id, path, content hash)."""
+
+    def __init__(self, max_items: int = 256):
+        self.max_items = max_items
+        self._items: "OrderedDict[tuple, FileView]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Parsers are shared and tree-sitter parsers are not thread-safe, so builds are serialized
+        self._build_lock = threading.Lock()
+
+    def get_or_build(self, key: tuple, content: str, parser: Optional[BaseParser]) -> FileView:
+        with self._lock:
+            view = self._items.get(key)
+            if view is not None:
+                self._items.move_to_end(key)
+                return view
+        with self._build_lock:
+            view = FileView(content, parser)
+        with self._lock:
+            self._items[key] = view
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+        return view
+
+
+# Shared across requests; entries are immutable once built
+file_views = FileViewCache()
@@ -0,0 +1,155 @@
+# app/retrieval/reranker.py
+"""
+Cross-Encoder Re-ranking:
+- Re-scores vector search candidates by reading (query, chunk) pairs together, which ranks
+  the few chunks that actually answer the question above ones that merely share vocabulary
+- Pairs are scored in batches; scores are cached per (query, chunk_id)
+- Scoring stops when the next batch would not fit in the millisecond budget, and the
+  candidates are then returned in their original vector order. Until the cost per pair is
+  known, a single pair is scored to measure it; a model that is not loaded yet is loaded in
+  the background and the query keeps vector order, so a cold reranker never overruns a budget
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from app.config import settings
+from app.metrics import RERANK_CACHE, RERANK_RESULTS, span
+
+logger = logging.getLogger(__name__)
+
+
+class CrossEncoderReranker:
+    """Batched, cached, time-budgeted re-scoring with a sentence-transformers CrossEncoder."""
+
+    def __init__(
+            self,
+            model_path: Optional[str] = None,
+            batch_size: Optional[int] = None,
+            cache_items: Optional[int] = None,
+    ):
+        self.model_path = model_path or settings.RERANK_MODEL_PATH
+        self.batch_size = batch_size or settings.RERANK_BATCH_SIZE
+        self.cache_items = cache_items or settings.RERANK_CACHE_ITEMS
+        self._model = None
+        self._model_lock = threading.Lock()
+        self._loading: Optional[threading.Thread] = None
+        self._scores: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        # Running estimate of scoring cost, used to decide whether the next batch fits the budget
+        self._seconds_per_pair: Optional[float] = None
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    from sentence_transformers import CrossEncoder
+                    logger.info(f"Loading cross-encoder from: {self.model_path}")
+                    self._model = CrossEncoder(self.model_path)
+        return self._model
+
+    def _load(self):
+        try:
+            self.model
+        except Exception as e:
+            logger.error(f"Loading the re-ranker failed: {e}")
+        finally:
+            self._loading = None
+
+    def _load_in_background(self):
+        with self._model_lock:
+            if self._loading is None:
+                self._loading = threading.Thread(target=self._load, name="rerank-load", daemon=True)
+                self._loading.start()
+
+    def warmup(self):
+        """Load the model and score one pair, so the first query's budget is not spent on loading."""
+        self._score_batch([("warmup", "warmup")])
+
+    def _score_batch(self, pairs: List[Tuple[str, str]]) -> List[float]:
+        model = self.model
+        # Timed after loading, so the estimate reflects scoring only
+        start = time.perf_counter()
+        scores = model.predict(pairs, batch_size=len(pairs), show_progress_bar=False)
+        per_pair = (time.perf_counter() - start) / len(pairs)
+        previous = self._seconds_per_pair
+        self._seconds_per_pair = per_pair if previous is None else 0.8 * previous + 0.2 * per_pair
+        return [float(score) for score in scores]
+
+    def _cached(self, key: Tuple[str, str]) -> Optional[float]:
+        with self._cache_lock:
+            score = self._scores.get(key)
+            if score is not None:
+                self._scores.move_to_end(key)
+            return score
+
+    def _remember(self, key: Tuple[str, str], score: float):
+        with self._cache_lock:
+            self._scores[key] = score
+            self._scores.move_to_end(key)
+            while len(self._scores) > self.cache_items:
+                self._scores.popitem(last=False)
+
+    def rerank(self, query: str, documents: List, top_k: int, budget_ms: Optional[float] = None) -> List:
+        """
+        Return the `top_k` best of `documents` (LangChain Documents, in vector order) by
+        cross-encoder score, or the first `top_k` unchanged if scoring would overrun the budget.
+        """
+        if len(documents) <= 1:
+            return documents[:top_k]
+        budget_ms = settings.RERANK_BUDGET_MS if budget_ms is None else budget_ms
+        deadline = time.perf_counter() + budget_ms / 1000.0
+
+        with span("query", "rerank", candidates=len(documents)):
+            scores: List[Optional[float]] = []
+            missing: List[int] = []
+            for i, doc in enumerate(documents):
+                score = self._cached((query, doc.metadata.get("chunk_id", "")))
+                scores.append(score)
+                if score is None:
+                    missing.append(i)
+            RERANK_CACHE.labels("hit").inc(len(documents) - len(missing))
+            RERANK_CACHE.labels("miss").inc(len(missing))
+
+            if missing and self._model is None:
+                self._load_in_background()
+                logger.info("Re-ranker model still loading; keeping vector order")
+                RERANK_RESULTS.labels("cold").inc()
+                return documents[:top_k]
+
+            try:
+                position = 0
+                while position < len(missing):
+                    # Until the cost per pair has been measured, score a single pair to measure it
+                    size = self.batch_size if self._seconds_per_pair is not None else 1
+                    batch = missing[position:position + size]
+                    position += len(batch)
+                    remaining = deadline - time.perf_counter()
+                    estimate = (self._seconds_per_pair or 0.0) * len(batch)
+                    if remaining <= 0 or estimate > remaining:
+                        # Batches already scored stay cached, so a repeat of this query gets further
+                        logger.info(f"Re-ranking over budget ({budget_ms}ms); keeping vector order")
+                        RERANK_RESULTS.labels("over_budget").inc()
+                        return documents[:top_k]
+                    batch_scores = self._score_batch(
+                        [(query, documents[i].page_content) for i in batch]
+                    )
+                    for i, score in zip(batch, batch_scores):
+                        scores[i] = score
+                        self._remember((query, documents[i].metadata.get("chunk_id", "")), score)
+            except Exception as e:
+                logger.error(f"Re-ranking failed, keeping vector order: {e}")
+                RERANK_RESULTS.labels("error").inc()
+                return documents[:top_k]
+
+            RERANK_RESULTS.labels("reranked").inc()
+            # Stable sort: ties keep their vector order
+            order = sorted(range(len(documents)), key=lambda i: scores[i], reverse=True)
+            return [documents[i] for i in order[:top_k]]
+
+
+# Shared instance; the model is loaded on first use
+reranker = CrossEncoderReranker()
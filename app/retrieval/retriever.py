@@ -1,10 +1,14 @@
 import logging
-from typing import List, Dict, Any, Optional
-
-from langchain_core.documents import Document
+import time
+from typing import TYPE_CHECKING, List, Dict, Any, Optional
 
+from app.config import settings
+from app.metrics import span
+from app.retrieval.reranker import CrossEncoderReranker, reranker as shared_reranker
 from app.vectorstore.base import BaseVectorStore
-from app.vectorstore.chroma import ChromaVectorStore
+
+if TYPE_CHECKING:
+    from langchain_core.documents import Document
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -16,38 +20,70 @@ class Retriever:
     It provides a high-level API for searching and fetching indexed data.
     """
 
-    def __init__(self, vectorstore: BaseVectorStore):
+    def __init__(self, vectorstore: BaseVectorStore, reranker: Optional[CrossEncoderReranker] = None):
         """
         Initializes the Retriever with a vector store instance.
 
         Args:
             vectorstore: An instance of a class that inherits from BaseVectorStore,
                          such as ChromaVectorStore.
+            reranker: Optional cross-encoder for a re-ranking stage. Defaults to the
+                      shared reranker when RERANK_ENABLED is set.
         """
         self.vectorstore = vectorstore
+        if reranker is None and settings.RERANK_ENABLED:
+            reranker = shared_reranker
+        self.reranker = reranker
         logger.info(f"Retriever initialized with {type(vectorstore).__name__}.")
 
     def retrieve_context(
-            self, query: str, top_k: int = 5, repo_id: Optional[int] = None
-    ) -> List[Document]:
+            self,
+            query: str,
+            top_k: int = 5,
+            repo_id: Optional[int] = None,
+            repo_ids: Optional[List[int]] = None,
+            branch: Optional[str] = None,
+            deadline: Optional[float] = None,
+    ) -> List["Document"]:
         """
         Performs a similarity search on the vector store to find relevant documents.
 
         Args:
             query: The text query to search for.
             top_k: The number of top results to return.
-            repo_id: The optional ID of the repository to filter the search by.
+            repo_id: The optional ID of the repository to search.
+            repo_ids: Optional IDs of several repositories to search; their results are merged.
+                      With neither, every indexed repository is searched.
+            branch: Optional branch; only chunks of that branch's files are returned.
+            deadline: Optional time.monotonic() instant; re-ranking never runs past it.
 
         Returns:
             A list of LangChain Document objects, which include content and metadata.
         """
-        filters = {}
         if repo_id:
-            filters["repo_id"] = str(repo_id)  # ChromaDB filter values must be strings
+            repo_ids = [repo_id]
+        # Each repo has its own collection, so the repo routes the search instead of filtering it
+        targets = [str(r) for r in repo_ids] if repo_ids else None
 
-        logger.info(f"Retrieving top {top_k} documents for query: '{query[:60]}...' with filters: {filters}")
+        logger.info(
+            f"Retrieving top {top_k} documents for query: '{query[:60]}...' "
+            f"in repos: {targets or 'all'}, branch: {branch or 'any'}"
+        )
+        # Re-ranking over-fetches candidates from the vector store, then keeps the best top_k
+        fetch_k = max(top_k, settings.RERANK_CANDIDATES) if self.reranker else top_k
         try:
-            results = self.vectorstore.search(query, top_k=top_k, filter=filters if filters else None)
+            with span("query", "vector_search", top_k=fetch_k):
+                if settings.HIERARCHICAL_RETRIEVAL and targets and len(targets) == 1:
+                    results = self.vectorstore.search_hierarchical(
+                        query, top_k=fetch_k, repo_id=targets[0], branch=branch
+                    )
+                else:
+                    results = self.vectorstore.search(query, top_k=fetch_k, repo_ids=targets, branch=branch)
+            if self.reranker:
+                budget_ms = None
+                if deadline is not None:
+                    budget_ms = max(0.0, min(settings.RERANK_BUDGET_MS, (deadline - time.monotonic()) * 1000))
+                results = self.reranker.rerank(query, results, top_k, budget_ms=budget_ms)
             logger.info(f"Found {len(results)} relevant documents.")
             return results
         except Exception as e:
@@ -55,7 +91,13 @@ class Retriever:
             return []
 
     def get_formatted_context(
-            self, query: str, top_k: int = 5, repo_id: Optional[int] = None
+            self,
+            query: str,
+            top_k: int = 5,
+            repo_id: Optional[int] = None,
+            repo_ids: Optional[List[int]] = None,
+            branch: Optional[str] = None,
+            deadline: Optional[float] = None,
     ) -> List[Dict[str, Any]]:
         """
         Retrieves context and formats it into a more universally usable
@@ -63,13 +105,16 @@ class Retriever:
         Args:
             query: The text query to search for.
             top_k: The number of top results to return.
-            repo_id: The optional ID of the repository to filter the search by.
+            repo_id: The optional ID of the repository to search.
+            repo_ids: Optional IDs of several repositories to search and merge.
+            branch: Optional branch to restrict the results to.
+            deadline: Optional time.monotonic() instant bounding the re-ranking stage.
 
         Returns:
             A list of dictionaries, where each dictionary contains the 'content'
             and 'metadata' of a retrieved chunk.
         """
-        documents = self.retrieve_context(query, top_k, repo_id)
+        documents = self.retrieve_context(query, top_k, repo_id, repo_ids, branch, deadline)
         formatted_results = [
             {"content": doc.page_content, "metadata": doc.metadata}
             for doc in documents
@@ -78,6 +123,8 @@ class Retriever:
 
 # Example of how to use the Retriever class
 if __name__ == '__main__':
+    from app.vectorstore.chroma import ChromaVectorStore
+
     logging.basicConfig(level=logging.INFO, format='%(asctime)s | %(levelname)s | %(name)s | %(message)s')
     # 1. Initialize the vector store and the retriever
     chroma_vs = ChromaVectorStore()
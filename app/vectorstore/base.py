@@ -1,14 +1,14 @@
 # app/vectorstore/base.py
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Iterable, Tuple
 from abc import ABC, abstractmethod
-from ..db.schemas import ChunkDocument
+from ..ingestion.records import ChunkRecord
 
 
 class BaseVectorStore(ABC):
     """Abstract base class for all vector stores."""
 
     @abstractmethod
-    def add_document(self, document: ChunkDocument) -> str:
+    def add_document(self, document: ChunkRecord) -> str:
         """
         Add a single document (chunk) to the vector store.
         Returns the inserted document's chunk_id.
@@ -16,7 +16,7 @@ class BaseVectorStore(ABC):
         pass
 
     @abstractmethod
-    def add_documents(self, documents: List[ChunkDocument]) -> List[str]:
+    def add_documents(self, documents: List[ChunkRecord]) -> List[str]:
         """
         Add multiple documents (chunks) to the vector store.
         Returns list of inserted chunk_ids.
@@ -25,15 +25,59 @@ class BaseVectorStore(ABC):
 
     @abstractmethod
     def search(
-        self, query: str, top_k: int = 5, filters: Optional[Dict[str, str]] = None
+        self,
+        query: str,
+        top_k: int = 5,
+        filter: Optional[Dict[str, str]] = None,
+        repo_ids: Optional[Iterable] = None,
+        branch: Optional[str] = None,
     ):
         """
         Search for the most relevant documents.
-        Returns list of (document, score).
+        `repo_ids` restricts (and merges) the search over those repositories' shards,
+        `branch` to the chunks referenced by that branch.
         """
         pass
 
+    def search_hierarchical(
+        self, query: str, top_k: int = 5, repo_id=None, branch: Optional[str] = None, **kwargs
+    ):
+        """
+        Coarse-to-fine search within one repository. Stores without a summary index
+        fall back to a flat search.
+        """
+        return self.search(query, top_k=top_k, repo_ids=[repo_id], branch=branch)
+
+    def rebuild_package_summaries(self, repo_id, branch: str, packages: Optional[Iterable[str]] = None) -> int:
+        """
+        Refresh the package-level summaries of a branch after indexing: all of them, or only
+        `packages` (those whose units changed). No-op without a summary index.
+        """
+        return 0
+
     @abstractmethod
-    def delete(self, ids: List[str]) -> None:
+    def delete(self, ids: List[str], repo_id: Optional[str] = None) -> None:
         """Delete documents from the vector store by chunk_ids."""
         pass
+
+    @abstractmethod
+    def create_collection(self, repo_id) -> None:
+        """Create the storage shard of a repository."""
+        pass
+
+    @abstractmethod
+    def drop_collection(self, repo_id) -> None:
+        """Drop the storage shard of a repository, and with it all of its chunks."""
+        pass
+
+    @abstractmethod
+    def delete_file_chunks(self, repo_id: str, file_id: str, file_hash: Optional[str] = None) -> None:
+        """Delete every chunk stored for one file of a repository, or for one version (hash) of it."""
+        pass
+
+    @abstractmethod
+    def set_branch_flag(
+        self, repo_id: str, file_refs: Iterable[Tuple[str, str]], branch: str, value: bool = True
+    ) -> int:
+        """Mark (or unmark) the stored chunks of the given (path, hash) file versions as part of `branch`."""
+        pass
@@ -1,47 +1,351 @@
 # app/vectorstore/chroma.py
-from langchain_community.vectorstores import Chroma
-from typing import List, Optional, Dict
+"""
+Chroma Vector Store:
+- One collection per repository (`repo_<id>`), so a search only scans the chunks of the
+  repos it targets and deleting a repo drops its collection instead of scanning metadata
+- Searches over several repos embed the query once and merge the per-collection hits by distance
+- Chunks are stored once per (path, content hash) and carry a `b_<branch>` flag for every
+  branch that contains that content; branch searches filter on the flag
+- A second-level summary collection per repo (`summaries_<id>`) holds class/file and
+  package centroids of the chunk vectors, for coarse-to-fine search
+"""
+import logging
+import threading
+from typing import List, Optional, Dict, Iterable, Tuple
 from .base import BaseVectorStore
+from ..config import settings
 from ..config.settings import CHROMA_PERSIST_DIR
-from ..db.schemas import ChunkMetadata, ChunkDocument
 from ..ingestion.embedder import Embedder
+from ..ingestion.records import ChunkRecord
+from ..ingestion.summaries import PackageAccumulator, unit_summaries
+from ..metrics import span
+
+COLLECTION_PREFIX = "repo_"
+SUMMARY_COLLECTION_PREFIX = "summaries_"
+UNIT_LEVELS = ["class", "file"]
+
+logger = logging.getLogger(__name__)
+# file_hash values per `$in` lookup when flagging chunks of many files
+FLAG_BATCH_SIZE = 500
+
+
+def branch_key(branch: str) -> str:
+    """Metadata key flagging the chunks that belong to `branch`."""
+    return f"b_{branch}"
+
+
+def _to_chroma_metadata(chunk: ChunkRecord) -> Dict:
+    """Chroma metadata values must be scalars, so branch membership becomes one boolean per branch."""
+    flat = chunk.metadata()
+    flat.update({branch_key(branch): True for branch in chunk.file.branches})
+    return flat
+
+
+def _where(conditions: Dict) -> Optional[Dict]:
+    """Chroma needs an explicit `$and` to combine more than one condition."""
+    if len(conditions) <= 1:
+        return conditions or None
+    return {"$and": [{key: value} for key, value in conditions.items()]}
 
 
 class ChromaVectorStore(BaseVectorStore):
     """ChromaDB implementation of vector store abstraction."""
     def __init__(self, persist_directory: str = CHROMA_PERSIST_DIR):
+        # langchain_community is slow to import; defer it until a store is actually built
+        from langchain_community.vectorstores import Chroma
+
+        self._chroma_cls = Chroma
         self.embedding_model = Embedder()
+        # Default (pre-sharding) collection; only read by scripts/migrate_chroma_collections.py
         self.vectorstore = Chroma(
             persist_directory=persist_directory,
             embedding_function=self.embedding_model
         )
+        self._client = self.vectorstore._client
+        self._collections: Dict[str, object] = {}
+        self._collections_lock = threading.Lock()
+
+    # ------------------- Collections -------------------
+    @staticmethod
+    def collection_name(repo_id) -> str:
+        return f"{COLLECTION_PREFIX}{repo_id}"
+
+    def collection(self, repo_id):
+        """LangChain wrapper around the collection of one repo, created on first use."""
+        name = self.collection_name(repo_id)
+        with self._collections_lock:
+            store = self._collections.get(name)
+            if store is None:
+                store = self._chroma_cls(
+                    client=self._client,
+                    collection_name=name,
+                    embedding_function=self.embedding_model,
+                )
+                self._collections[name] = store
+            return store
+
+    def summary_collection(self, repo_id):
+        """Raw Chroma collection of a repo's summaries; vectors are always supplied, never computed."""
+        name = f"{SUMMARY_COLLECTION_PREFIX}{repo_id}"
+        with self._collections_lock:
+            collection = self._collections.get(name)
+            if collection is None:
+                collection = self._client.get_or_create_collection(name, embedding_function=None)
+                self._collections[name] = collection
+            return collection
+
+    def create_collection(self, repo_id) -> None:
+        self.collection(repo_id)
+
+    def drop_collection(self, repo_id) -> None:
+        """Delete every chunk (and summary) of a repo by dropping its collections."""
+        for name in (self.collection_name(repo_id), f"{SUMMARY_COLLECTION_PREFIX}{repo_id}"):
+            with self._collections_lock:
+                self._collections.pop(name, None)
+                try:
+                    self._client.delete_collection(name)
+                except Exception:
+                    # Never created; chromadb raises ValueError or NotFoundError depending on version
+                    pass
+
+    def repo_ids(self) -> List[str]:
+        """IDs of every repo that has a collection."""
+        names = [getattr(c, "name", c) for c in self._client.list_collections()]
+        return [name[len(COLLECTION_PREFIX):] for name in names if name.startswith(COLLECTION_PREFIX)]
 
-    def add_document(self, document: ChunkDocument) -> str:
+    # ------------------- Writes -------------------
+    def add_document(self, document: ChunkRecord) -> str:
         """Add a single document with metadata."""
-        self.vectorstore.add_texts(
-            texts=[document.content],
-            metadatas=[document.metadata.model_dump()],
-            ids=[document.metadata.chunk_id],
-        )
-        return document.metadata.chunk_id
+        return self.add_documents([document])[0]
 
-    def add_documents(self, documents: List[ChunkDocument]) -> List[str]:
-        """Add a list of documents in a single batch."""
+    def add_documents(self, documents: List[ChunkRecord]) -> List[str]:
+        """Add a list of documents in a single batch, routed to their repos' collections."""
         if not documents:
             return []
-        ids = [doc.metadata.chunk_id for doc in documents]
         texts = [doc.content for doc in documents]
-        metadatas = [doc.metadata.model_dump() for doc in documents]
+        # Embed explicitly (rather than inside add_texts) so embedding and storage are timed separately
+        embeddings = self.embedding_model.embed_documents(texts)
+
+        by_repo: Dict[str, List[int]] = {}
+        for i, doc in enumerate(documents):
+            by_repo.setdefault(doc.file.repo_id, []).append(i)
+        with span("index", "store", chunks=len(documents)):
+            for repo_id, positions in by_repo.items():
+                self.collection(repo_id)._collection.upsert(
+                    ids=[documents[i].chunk_id for i in positions],
+                    embeddings=[embeddings[i] for i in positions],
+                    metadatas=[_to_chroma_metadata(documents[i]) for i in positions],
+                    documents=[texts[i] for i in positions],
+                )
+                if settings.SUMMARY_INDEX_ENABLED:
+                    # The indexer flushes whole files, so every unit's chunks are in this batch
+                    self.add_unit_summaries(
+                        repo_id, [documents[i] for i in positions], [embeddings[i] for i in positions]
+                    )
+        return [doc.chunk_id for doc in documents]
+
+    def add_unit_summaries(self, repo_id, documents: List[ChunkRecord], embeddings) -> int:
+        """Store class/file centroids of the given chunks (all chunks of each file version)."""
+        records = unit_summaries(documents, embeddings)
+        if records:
+            self.summary_collection(repo_id).upsert(
+                ids=[r["id"] for r in records],
+                embeddings=[r["embedding"] for r in records],
+                documents=[r["document"] for r in records],
+                metadatas=[
+                    {**r["metadata"], **{branch_key(branch): True for branch in r["branches"]}} for r in records
+                ],
+            )
+        return len(records)
+
+    def rebuild_package_summaries(
+            self, repo_id, branch: str, packages: Optional[Iterable[str]] = None, page_size: int = 1000
+    ) -> int:
+        """
+        Recompute the package centroids of one branch from its unit summaries: every package,
+        or only `packages` (an incremental run passes the packages of the files it touched).
+        Streams the units page by page, so memory is one running sum per package.
+        """
+        collection = self.summary_collection(repo_id)
+        scope = {}
+        if packages is not None:
+            packages = sorted(set(packages))
+            if not packages:
+                return 0
+            scope = {"package": {"$in": packages}}
+        accumulator = PackageAccumulator()
+        offset = 0
+        while True:
+            page = collection.get(
+                where=_where({"level": {"$in": UNIT_LEVELS}, branch_key(branch): True, **scope}),
+                limit=page_size, offset=offset, include=["embeddings", "metadatas"],
+            )
+            if not page["ids"]:
+                break
+            for embedding, metadata in zip(page["embeddings"], page["metadatas"]):
+                accumulator.add(metadata["package"], embedding, metadata.get("chunk_count", 1))
+            offset += len(page["ids"])
+        # Packages in scope that lost all their units are dropped here and not re-created
+        collection.delete(where=_where({"level": "package", "branch": branch, **scope}))
+        records = accumulator.records(str(repo_id), branch)
+        if records:
+            collection.upsert(
+                ids=[r["id"] for r in records],
+                embeddings=[r["embedding"] for r in records],
+                documents=[r["document"] for r in records],
+                metadatas=[r["metadata"] for r in records],
+            )
+        return len(records)
+
+    def delete(self, ids: List[str], repo_id: Optional[str] = None) -> None:
+        """Delete chunks by IDs, from one repo's collection or from every repo's."""
+        targets = [repo_id] if repo_id is not None else self.repo_ids()
+        for target in targets:
+            self.collection(target)._collection.delete(ids=ids)
+
+    def delete_file_chunks(self, repo_id: str, file_id: str, file_hash: Optional[str] = None) -> None:
+        """Delete all chunks of a file (or of one version of it), whatever IDs they were stored under."""
+        conditions = {"file_id": file_id}
+        if file_hash is not None:
+            conditions["file_hash"] = file_hash
+        where = _where(conditions)
+        self.collection(repo_id)._collection.delete(where=where)
+        self.summary_collection(repo_id).delete(where=where)
+
+    def set_branch_flag(
+            self, repo_id: str, file_refs: Iterable[Tuple[str, str]], branch: str, value: bool = True
+    ) -> int:
+        """
+        Add (or remove) `branch` on the stored chunks of the given (path, hash) file versions,
+        without re-embedding them. Returns the number of chunks updated.
+        """
+        refs = set(file_refs)
+        if not refs:
+            return 0
+        updated = self._set_flag(self.collection(repo_id)._collection, refs, branch_key(branch), value)
+        self._set_flag(self.summary_collection(repo_id), refs, branch_key(branch), value)
+        return updated
 
-        self.vectorstore.add_texts(texts=texts, metadatas=metadatas, ids=ids)
-        return ids
+    @staticmethod
+    def _set_flag(collection, refs, key: str, value: bool) -> int:
+        hashes = sorted({file_hash for _, file_hash in refs})
+        updated = 0
+        for start in range(0, len(hashes), FLAG_BATCH_SIZE):
+            found = collection.get(
+                where={"file_hash": {"$in": hashes[start:start + FLAG_BATCH_SIZE]}}, include=["metadatas"]
+            )
+            ids, metadatas = [], []
+            for chunk_id, metadata in zip(found["ids"], found["metadatas"]):
+                # Identical content can live at several paths; only flag the requested ones
+                if (metadata.get("file_id"), metadata.get("file_hash")) in refs:
+                    ids.append(chunk_id)
+                    # Removal sets False rather than dropping the key, since update merges metadata
+                    metadatas.append({**metadata, key: value})
+            if ids:
+                collection.update(ids=ids, metadatas=metadatas)
+                updated += len(ids)
+        return updated
 
+    # ------------------- Reads -------------------
     def search(
-            self, query: str, top_k: int = 5, filter: Optional[Dict[str, str]] = None
+            self,
+            query: str,
+            top_k: int = 5,
+            filter: Optional[Dict[str, str]] = None,
+            repo_ids: Optional[Iterable] = None,
+            branch: Optional[str] = None,
     ):
-        """Search for most relevant chunks based on query."""
-        return self.vectorstore.similarity_search(query, k=top_k, filter=filter)
+        """
+        Search for most relevant chunks based on query.
+        Searches the repos in `repo_ids` (or `filter["repo_id"]`), or every repo when neither is given,
+        restricted to the chunks of `branch` when one is given.
+        """
+        filter = dict(filter or {})
+        if repo_ids is None:
+            repo_ids = [filter["repo_id"]] if "repo_id" in filter else self.repo_ids()
+        filter.pop("repo_id", None)
+        if branch:
+            filter[branch_key(branch)] = True
+        where = _where(filter)
+        repo_ids = [str(repo_id) for repo_id in repo_ids]
+        if not repo_ids:
+            return []
+        if len(repo_ids) == 1:
+            return self.collection(repo_ids[0]).similarity_search(query, k=top_k, filter=where)
+
+        embedding = self.embedding_model.embed_query(query)
+        hits = []
+        for repo_id in repo_ids:
+            hits.extend(self.collection(repo_id).similarity_search_by_vector_with_relevance_scores(
+                embedding, k=top_k, filter=where
+            ))
+        # Scores are distances from the same query vector, so they are comparable across collections
+        hits.sort(key=lambda hit: hit[1])
+        return [doc for doc, _ in hits[:top_k]]
+
+    def search_hierarchical(
+            self,
+            query: str,
+            top_k: int = 5,
+            repo_id=None,
+            branch: Optional[str] = None,
+            packages_k: Optional[int] = None,
+            units_k: Optional[int] = None,
+    ):
+        """
+        Coarse-to-fine search of one repo: best packages, then the best classes/files in
+        them, then chunks only within those files. Each stage scans a small candidate set
+        instead of every chunk. Falls back to a flat search when summaries are missing.
+        """
+        packages_k = packages_k or settings.HIERARCHICAL_PACKAGES
+        units_k = units_k or settings.HIERARCHICAL_UNITS
+        summaries = self.summary_collection(repo_id)
+        embedding = self.embedding_model.embed_query(query)
+        branch_filter = {branch_key(branch): True} if branch else {}
 
-    def delete(self, ids: List[str]) -> None:
-        """Delete chunks from ChromaDB by IDs."""
-        self.vectorstore.delete(ids=ids)
\ No newline at end of file
+        def nearest(k: int, conditions: Dict) -> List[Dict]:
+            result = summaries.query(
+                query_embeddings=[embedding], n_results=k, where=_where(conditions), include=["metadatas"]
+            )
+            return result["metadatas"][0] if result["metadatas"] else []
+
+        with span("query", "coarse_search"):
+            package_conditions = {"level": "package", **({"branch": branch} if branch else {})}
+            packages = [m["package"] for m in nearest(packages_k, package_conditions)]
+            unit_conditions = {"level": {"$in": UNIT_LEVELS}, **branch_filter}
+            if packages:
+                unit_conditions["package"] = {"$in": packages}
+            files = list(dict.fromkeys(m["file_id"] for m in nearest(units_k, unit_conditions)))
+        conditions = dict(branch_filter)
+        if files:
+            logger.debug(f"Coarse stage selected packages {packages} and files {files}")
+            conditions["file_id"] = {"$in": files}
+        else:
+            logger.info("No summaries for this repo/branch; falling back to a flat search")
+        return self.collection(repo_id).similarity_search_by_vector(embedding, k=top_k, filter=_where(conditions))
+
+    def list_chunks(
+            self,
+            repo_id,
+            limit: int,
+            offset: int = 0,
+            filters: Optional[Dict] = None,
+            branch: Optional[str] = None,
+            include_content: bool = False,
+            include_metadata: bool = True,
+    ) -> Dict:
+        """
+        One page of a repo's chunks, filtered inside Chroma. Embeddings are never loaded, and
+        content only on request, so a page costs memory proportional to `limit` alone.
+        """
+        conditions = dict(filters or {})
+        if branch:
+            conditions[branch_key(branch)] = True
+        include = []
+        if include_metadata:
+            include.append("metadatas")
+        if include_content:
+            include.append("documents")
+        return self.collection(repo_id)._collection.get(
+            where=_where(conditions), limit=limit, offset=offset, include=include
+        )
@@ -0,0 +1,134 @@
+# benchmarks/bench_db_concurrency.py
+"""
+Metadata database concurrency benchmark.
+
+Runs indexing-style writers (batched manifest upserts + run checkpoints, one commit per
+batch) alongside query-style readers (single file-hash lookups and manifest loads) for a
+fixed time, and reports per-side throughput, p50/p99 latency and lock errors.
+
+Usage:
+    python -m benchmarks.bench_db_concurrency --writers 2 --readers 8 --seconds 10
+    python -m benchmarks.bench_db_concurrency --database-url postgresql+psycopg2://coderag@localhost/coderag_bench
+"""
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+
+from benchmarks.common import Timer, configure_sandbox, latency_summary, write_results
+
+
+def _worker(stop: threading.Event, op, latencies, errors, seed: int):
+    rng = random.Random(seed)
+    while not stop.is_set():
+        try:
+            with Timer() as t:
+                op(rng)
+            latencies.append(t.elapsed)
+        except Exception as e:
+            errors.append(type(e).__name__ + ": " + str(e).splitlines()[0][:120])
+
+
+def run(writers: int, readers: int, seconds: float, files: int, batch: int, work_dir: str, database_url: str = None):
+    settings = configure_sandbox(os.path.join(work_dir, "state"))
+    if database_url:
+        settings.DATABASE_URL = database_url
+    # Imported after the sandbox is configured so the engine is built for the benchmark database
+    from app.db import crud
+    from app.db.init_db import init_db
+    from app.db.session import SessionLocal, engine
+
+    init_db()
+    db = SessionLocal()
+    # A unique path keeps repeated runs against a shared (Postgres) database independent
+    repo = crud.create_repo(db, f"/bench/{uuid.uuid4().hex[:8]}/repo", "main")
+    repo_id = repo.id
+    paths = [f"src/main/java/com/bench/pkg{i % 50}/File{i}.java" for i in range(files)]
+    crud.upsert_file_hashes(db, repo_id, "main", {p: uuid.uuid4().hex for p in paths})
+    db.commit()
+    db.close()
+
+    def write(rng):
+        session = SessionLocal()
+        try:
+            run = crud.start_index_run(session, repo_id, "main", full_index=False)
+            changed = {p: uuid.uuid4().hex for p in rng.sample(paths, batch)}
+            crud.upsert_file_hashes(session, repo_id, "main", changed)
+            crud.checkpoint_index_run(session, run, len(changed), len(changed) * 4)
+            crud.finish_index_run(session, run, "completed")
+            session.commit()
+        finally:
+            session.close()
+
+    def read(rng):
+        session = SessionLocal()
+        try:
+            if rng.random() < 0.9:
+                # What the agent tools do per file read
+                repo_row = crud.get_repo_by_id(session, repo_id)
+                crud.get_file_hash(session, repo_row, rng.choice(paths), "main")
+            else:
+                # What an incremental reindex does once per run
+                crud.get_file_hashes(session, repo_id, "main")
+        finally:
+            session.close()
+
+    stop = threading.Event()
+    sides = {"write": (write, writers), "read": (read, readers)}
+    samples = {side: ([], []) for side in sides}
+    threads = []
+    for side, (op, count) in sides.items():
+        latencies, errors = samples[side]
+        for _ in range(count):
+            threads.append(threading.Thread(target=_worker, args=(stop, op, latencies, errors, len(threads))))
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    results = {"dialect": engine.dialect.name, "pool": type(engine.pool).__name__}
+    for side, (latencies, errors) in samples.items():
+        results[side] = {
+            "threads": sides[side][1],
+            "ops_per_sec": round(len(latencies) / seconds, 2),
+            "errors": len(errors),
+            "first_errors": sorted(set(errors))[:5],
+            **latency_summary(latencies),
+        }
+    engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark concurrent indexing writes and query reads on the metadata DB.")
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--files", type=int, default=5000, help="Manifest size of the benchmark repo")
+    parser.add_argument("--batch", type=int, default=200, help="Files upserted per write transaction")
+    parser.add_argument("--database-url", default=None, help="Benchmark this database instead of a scratch SQLite file")
+    parser.add_argument("--work-dir", default=None, help="Scratch directory (default: a temp dir, removed afterwards)")
+    parser.add_argument("--output", default="bench_results/db_concurrency.json")
+    args = parser.parse_args()
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="coderag-bench-")
+    try:
+        results = run(
+            args.writers, args.readers, args.seconds, args.files, args.batch, work_dir, args.database_url
+        )
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    params = {k: v for k, v in vars(args).items() if k != "database_url"}
+    params["database"] = "custom" if args.database_url else "sqlite-scratch"
+    write_results(args.output, "db_concurrency", params, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# benchmarks/bench_embedding.py
+"""
+Embedding throughput benchmark: texts/sec of `Embedder.embed_documents` as the
+embedding pool scales from in-process encoding to N worker processes.
+
+Usage:
+    python -m benchmarks.bench_embedding --texts 4096 --workers 1 2 4 8
+"""
+import argparse
+import os
+import shutil
+import tempfile
+
+from benchmarks.common import Timer, configure_sandbox, peak_rss_mb, write_results
+from benchmarks.synthetic_repo import generate_repo
+
+
+def _chunk_texts(work_dir: str, count: int):
+    """Method-sized texts cut from a synthetic repo, repeated until `count` are collected."""
+    repo_dir = os.path.join(work_dir, "synthetic-repo")
+    paths = generate_repo(repo_dir, files=50)
+    texts = []
+    for rel_path in paths:
+        with open(os.path.join(repo_dir, rel_path)) as f:
+            texts.extend(block for block in f.read().split("\n\n") if block.strip())
+    return [texts[i % len(texts)] for i in range(count)]
+
+
+def run(text_count: int, worker_levels, work_dir: str):
+    settings = configure_sandbox(os.path.join(work_dir, "state"))
+    from app.ingestion.embedder import Embedder
+
+    texts = _chunk_texts(work_dir, text_count)
+    # Make every request large enough to go through the pool
+    settings.EMBEDDING_POOL_MIN_TEXTS = 1
+    results = []
+    baseline = None
+    for workers in worker_levels:
+        embedder = Embedder(pool_workers=workers)
+        embedder.embed_documents(texts[:64])  # warm-up: model load, pool start-up
+        with Timer() as t:
+            embedder.embed_documents(texts)
+        embedder.close()
+        throughput = len(texts) / t.elapsed
+        baseline = baseline or throughput
+        results.append({
+            "workers": workers,
+            "seconds": round(t.elapsed, 3),
+            "texts_per_sec": round(throughput, 2),
+            "speedup": round(throughput / baseline, 2),
+            "peak_rss_mb": peak_rss_mb(),
+        })
+    return {"scaling": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark embedding throughput across pool sizes.")
+    parser.add_argument("--texts", type=int, default=4096)
+    parser.add_argument("--workers", type=int, nargs="*", default=[1, 2, 4, 8])
+    parser.add_argument("--output", default="bench_results/embedding.json")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="coderag-bench-")
+    try:
+        results = run(args.texts, args.workers, work_dir)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    write_results(args.output, "embedding", vars(args), results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# benchmarks/bench_gitlab_provider.py
+"""
+GitLab provider benchmark against the local mock GitLab server.
+
+Lists and fetches a synthetic repo through GitLabDataProvider while the mock injects
+transient failures, then checks every fetched file against disk and that changed paths
+(files and directories) resolve through `iter_paths`. It reports files/sec,
+requests per endpoint and injected failures, and a second pass that should be served
+from the blob cache. It exits non-zero when any content differs or a file is missing.
+
+Usage:
+    python -m benchmarks.bench_gitlab_provider --files 500 --fail-rate 0.05
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+
+from benchmarks.common import Timer, configure_sandbox, write_results
+from benchmarks.mock_gitlab import MockGitLab
+from benchmarks.synthetic_repo import generate_repo
+
+
+def run(files: int, fail_rate: float, work_dir: str):
+    settings = configure_sandbox(os.path.join(work_dir, "state"))
+    settings.GITLAB_RETRY_BACKOFF_SECONDS = 0.05
+    from app.ingestion.data_providers import GitLabDataProvider
+
+    repo_dir = os.path.join(work_dir, "synthetic-repo")
+    paths = sorted(path.replace(os.sep, "/") for path in generate_repo(repo_dir, files=files))
+    with MockGitLab(repo_dir, fail_rate=fail_rate) as mock:
+        provider = GitLabDataProvider(mock.repo_url, token="mock-token")
+        with Timer() as cold:
+            fetched = dict(provider.iter_file_contents(provider.iter_files(), settings.MAX_FILE_BYTES))
+        cold_requests = dict(mock.requests)
+        with Timer() as warm:
+            # Same blob SHAs: the second pass should only list, never download
+            refetched = dict(provider.iter_file_contents(provider.iter_files(), settings.MAX_FILE_BYTES))
+        warm_requests = {key: mock.requests[key] - cold_requests.get(key, 0) for key in mock.requests}
+        # Changed-path resolution: one file, one package directory, one path that does not exist
+        package = paths[0].rsplit("/", 1)[0]
+        requested = [paths[0], package, "src/main/java/Missing.java"]
+        resolved = sorted(provider.iter_paths(requested))
+        expected_resolved = sorted({paths[0]} | {path for path in paths if path.startswith(package + "/")})
+        injected = mock.injected_failures
+
+    mismatched = []
+    for path in paths:
+        with open(os.path.join(repo_dir, path), encoding="utf-8") as f:
+            expected = f.read()
+        if fetched.get(path) != expected or refetched.get(path) != expected:
+            mismatched.append(path)
+    return {
+        "files": len(paths),
+        "cold_seconds": round(cold.elapsed, 3),
+        "cold_files_per_sec": round(len(fetched) / cold.elapsed, 1) if cold.elapsed else 0.0,
+        "warm_seconds": round(warm.elapsed, 3),
+        "cold_requests": cold_requests,
+        "warm_requests": warm_requests,
+        "injected_failures": injected,
+        "iter_paths_ok": resolved == expected_resolved,
+        "missing": len(set(paths) - set(fetched)),
+        "mismatched": len(mismatched),
+        "first_mismatched": mismatched[:5],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark and check GitLabDataProvider against a mock GitLab.")
+    parser.add_argument("--files", type=int, default=500)
+    parser.add_argument("--fail-rate", type=float, default=0.05, help="Fraction of requests answered with 429/5xx")
+    parser.add_argument("--work-dir", default=None, help="Scratch directory (default: a temp dir, removed afterwards)")
+    parser.add_argument("--output", default="bench_results/gitlab_provider.json")
+    args = parser.parse_args()
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="coderag-bench-")
+    try:
+        results = run(args.files, args.fail_rate, work_dir)
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    write_results(args.output, "gitlab_provider", vars(args), results)
+    if results["missing"] or results["mismatched"] or not results["iter_paths_ok"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+# benchmarks/bench_import_time.py
+"""
+Start-up benchmark: wall time of `import app.api.server` in a fresh interpreter, plus the
+slowest modules reported by `python -X importtime`. Exits non-zero when the median exceeds
+`--budget-ms`, so it can guard against heavy imports creeping back in.
+
+Usage:
+    python -m benchmarks.bench_import_time --runs 5 --budget-ms 1500
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks.common import REPO_ROOT, write_results
+
+_TARGET = "import app.api.server"
+
+
+def _timed_import() -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", _TARGET], cwd=REPO_ROOT, check=True, capture_output=True)
+    return time.perf_counter() - start
+
+
+def _slowest_imports(top: int):
+    """Parse `-X importtime` output (`import time: self [us] | cumulative | name`) into the top-N by cumulative."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _TARGET], cwd=REPO_ROOT, check=True, capture_output=True, text=True
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = (part.strip() for part in line.split(":", 1)[1].split("|", 2))
+        rows.append({"module": name, "self_ms": int(self_us) / 1000, "cumulative_ms": int(cumulative_us) / 1000})
+    rows.sort(key=lambda r: r["cumulative_ms"], reverse=True)
+    return rows[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark API import (cold start) time.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="How many of the slowest imports to report")
+    parser.add_argument("--budget-ms", type=float, default=None, help="Fail if the median import time exceeds this")
+    parser.add_argument("--output", default="bench_results/import_time.json")
+    args = parser.parse_args()
+
+    samples = [_timed_import() for _ in range(args.runs)]
+    median_ms = round(statistics.median(samples) * 1000, 1)
+    results = {
+        "median_ms": median_ms,
+        "min_ms": round(min(samples) * 1000, 1),
+        "max_ms": round(max(samples) * 1000, 1),
+        "slowest_imports": _slowest_imports(args.top),
+    }
+    write_results(args.output, "import_time", vars(args), results)
+    if args.budget_ms is not None and median_ms > args.budget_ms:
+        print(f"Import time {median_ms}ms exceeds budget {args.budget_ms}ms", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
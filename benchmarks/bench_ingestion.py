@@ -0,0 +1,94 @@
+# benchmarks/bench_ingestion.py
+"""
+Ingestion benchmark.
+
+1. Generates a synthetic Java repo of configurable size.
+2. Runs `Indexer.index_project` against it: files/sec, chunks/sec, peak RSS.
+3. For each churn level, rewrites N% of the files and runs `Indexer.reindex_project`:
+   wall time, files re-embedded and chunks written, i.e. the incremental reindex cost.
+
+Usage:
+    python -m benchmarks.bench_ingestion --files 500 --churn 1 10 --output bench_results/ingestion.json
+"""
+import argparse
+import os
+import shutil
+import tempfile
+
+from benchmarks.common import Timer, configure_sandbox, peak_rss_mb, write_results
+from benchmarks.synthetic_repo import apply_churn, generate_repo
+
+
+def _counter_value(name: str, **labels) -> float:
+    from prometheus_client import REGISTRY
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def run(files: int, methods: int, churn_levels, work_dir: str):
+    configure_sandbox(os.path.join(work_dir, "state"))
+    # Imported after the sandbox is configured so every store lands in work_dir
+    from app.db.init_db import init_db
+    from app.ingestion.indexer import Indexer
+    from app.vectorstore.chroma import ChromaVectorStore
+
+    init_db()
+    repo_dir = os.path.join(work_dir, "synthetic-repo")
+    paths = generate_repo(repo_dir, files=files, methods_per_class=methods)
+
+    vectorstore = ChromaVectorStore()
+    indexer = Indexer(vectorstore)
+
+    chunks_before = _counter_value("coderag_indexed_chunks_total")
+    with Timer() as t:
+        indexer.index_project(repo_dir)
+    chunks = _counter_value("coderag_indexed_chunks_total") - chunks_before
+    results = {
+        "full_index": {
+            "files": len(paths),
+            "chunks": int(chunks),
+            "seconds": round(t.elapsed, 3),
+            "files_per_sec": round(len(paths) / t.elapsed, 2),
+            "chunks_per_sec": round(chunks / t.elapsed, 2),
+            "peak_rss_mb": peak_rss_mb(),
+        },
+        "reindex": [],
+    }
+
+    for percent in churn_levels:
+        changed = apply_churn(repo_dir, paths, percent, methods_per_class=methods, seed=int(percent * 100))
+        chunks_before = _counter_value("coderag_indexed_chunks_total")
+        reembedded_before = _counter_value("coderag_indexed_files_total", outcome="changed")
+        with Timer() as t:
+            indexer.reindex_project(repo_dir)
+        results["reindex"].append({
+            "churn_percent": percent,
+            "files_changed": len(changed),
+            "files_reembedded": int(_counter_value("coderag_indexed_files_total", outcome="changed") - reembedded_before),
+            "chunks_written": int(_counter_value("coderag_indexed_chunks_total") - chunks_before),
+            "seconds": round(t.elapsed, 3),
+            "relative_to_full_index": round(t.elapsed / results["full_index"]["seconds"], 4),
+            "peak_rss_mb": peak_rss_mb(),
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark full and incremental indexing of a synthetic repo.")
+    parser.add_argument("--files", type=int, default=500)
+    parser.add_argument("--methods", type=int, default=8, help="Methods per generated class")
+    parser.add_argument("--churn", type=float, nargs="*", default=[1.0, 10.0], help="Churn percentages to reindex")
+    parser.add_argument("--work-dir", default=None, help="Scratch directory (default: a temp dir, removed afterwards)")
+    parser.add_argument("--output", default="bench_results/ingestion.json")
+    args = parser.parse_args()
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="coderag-bench-")
+    try:
+        results = run(args.files, args.methods, args.churn, work_dir)
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    write_results(args.output, "ingestion", vars(args), results)
+
+
+if __name__ == "__main__":
+    main()
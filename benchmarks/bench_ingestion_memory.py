@@ -0,0 +1,134 @@
+# benchmarks/bench_ingestion_memory.py
+"""
+Ingestion memory benchmark.
+
+Indexes a synthetic Java repo, seeded with files the indexer must skip (oversized,
+minified, generated), under INDEX_MEMORY_LIMIT_MB, while a sampler thread records
+resident memory. It reports the peak RSS during indexing, the growth over the
+post-warmup baseline, and how many files were skipped per reason. It exits non-zero
+when the peak goes over the ceiling.
+
+Usage:
+    python -m benchmarks.bench_ingestion_memory --files 2000 --limit-mb 1500
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import threading
+
+from benchmarks.common import Timer, configure_sandbox, write_results
+from benchmarks.synthetic_repo import generate_repo
+
+_SAMPLE_INTERVAL_SECONDS = 0.05
+
+
+def _counter_value(name: str, **labels) -> float:
+    from prometheus_client import REGISTRY
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def _add_skippable_files(root: str, max_file_bytes: int, count: int):
+    """Files the indexer should never embed: over the size cap, minified, and generated."""
+    folder = os.path.join(root, "src", "main", "java", "com", "bench", "noise")
+    os.makedirs(folder, exist_ok=True)
+    for i in range(count):
+        with open(os.path.join(folder, f"Huge{i}.java"), "w") as f:
+            line = f"    // filler line {i} " + "x" * 80 + "\n"
+            f.write("public class Huge%d {\n" % i)
+            f.write(line * (max_file_bytes // len(line) + 1))
+            f.write("}\n")
+        with open(os.path.join(folder, f"Minified{i}.java"), "w") as f:
+            f.write(f"public class Minified{i} {{ " + " ".join(f"int f{j} = {j};" for j in range(2000)) + " }\n")
+        with open(os.path.join(folder, f"Generated{i}.java"), "w") as f:
+            f.write(f"// @generated by the benchmark\npublic class Generated{i} {{\n    void run() {{}}\n}}\n")
+
+
+class _RssSampler(threading.Thread):
+    def __init__(self, read_rss):
+        super().__init__(daemon=True)
+        self.read_rss = read_rss
+        self.peak = 0.0
+        self._done = threading.Event()
+
+    def run(self):
+        while not self._done.wait(_SAMPLE_INTERVAL_SECONDS):
+            self.peak = max(self.peak, self.read_rss() or 0.0)
+
+    def stop(self) -> float:
+        self._done.set()
+        self.join()
+        return self.peak
+
+
+def run(files: int, limit_mb: int, skippable: int, work_dir: str):
+    settings = configure_sandbox(os.path.join(work_dir, "state"))
+    settings.INDEX_MEMORY_LIMIT_MB = limit_mb
+    # Imported after the sandbox is configured so every store lands in work_dir
+    from app.db.init_db import init_db
+    from app.ingestion.indexer import Indexer, _rss_mb
+    from app.vectorstore.chroma import ChromaVectorStore
+
+    if _rss_mb() is None:
+        raise SystemExit("This benchmark reads /proc/self/statm and needs Linux")
+    init_db()
+    repo_dir = os.path.join(work_dir, "synthetic-repo")
+    paths = generate_repo(repo_dir, files=files)
+    _add_skippable_files(repo_dir, settings.MAX_FILE_BYTES, skippable)
+
+    vectorstore = ChromaVectorStore()
+    # The model's footprint is fixed; what the ceiling guards is the pipeline's growth on top of it
+    vectorstore.embedding_model.warmup()
+    indexer = Indexer(vectorstore)
+    baseline = _rss_mb()
+
+    skipped_before = {
+        reason: _counter_value("coderag_indexed_files_total", outcome=reason)
+        for reason in ("too_large", "minified", "generated")
+    }
+    flushes_before = _counter_value("coderag_index_memory_flushes_total")
+    sampler = _RssSampler(_rss_mb)
+    sampler.start()
+    with Timer() as t:
+        indexer.index_project(repo_dir)
+    peak = sampler.stop()
+
+    return {
+        "files": len(paths),
+        "seconds": round(t.elapsed, 3),
+        "limit_mb": limit_mb,
+        "baseline_rss_mb": round(baseline, 1),
+        "peak_rss_mb": round(peak, 1),
+        "growth_mb": round(peak - baseline, 1),
+        "within_limit": peak <= limit_mb,
+        "early_flushes": int(_counter_value("coderag_index_memory_flushes_total") - flushes_before),
+        "skipped": {
+            reason: int(_counter_value("coderag_indexed_files_total", outcome=reason) - before)
+            for reason, before in skipped_before.items()
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verify indexing stays under INDEX_MEMORY_LIMIT_MB.")
+    parser.add_argument("--files", type=int, default=2000)
+    parser.add_argument("--limit-mb", type=int, default=1500, help="INDEX_MEMORY_LIMIT_MB for the run")
+    parser.add_argument("--skippable", type=int, default=5, help="Oversized, minified and generated files of each kind")
+    parser.add_argument("--work-dir", default=None, help="Scratch directory (default: a temp dir, removed afterwards)")
+    parser.add_argument("--output", default="bench_results/ingestion_memory.json")
+    args = parser.parse_args()
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="coderag-bench-")
+    try:
+        results = run(args.files, args.limit_mb, args.skippable, work_dir)
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    write_results(args.output, "ingestion_memory", vars(args), results)
+    if not results["within_limit"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
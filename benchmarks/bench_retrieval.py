@@ -0,0 +1,150 @@
+# benchmarks/bench_retrieval.py
+"""
+Retrieval benchmark.
+
+Indexes a synthetic Java repo, then measures:
+- `Retriever.get_formatted_context` QPS and p50/p99 latency at several concurrency levels
+- recall@k of hierarchical (summary-guided) search against flat search over the same
+  chunks, and the latency of each, to decide whether HIERARCHICAL_RETRIEVAL can be enabled
+- `CoderagAgent.handle_query` latency with the offline replay LLM backend (no network;
+  recorded fixtures via --fixtures, else a fixed tool-then-answer script), which isolates
+  retrieval/tool overhead from provider latency
+
+Usage:
+    python -m benchmarks.bench_retrieval --files 300 --queries 200 --concurrency 1 4 16
+"""
+import argparse
+import os
+import random
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import Timer, configure_sandbox, latency_summary, peak_rss_mb, write_results
+from benchmarks.synthetic_repo import generate_repo
+
+_QUERIES = [
+    "How is an order looked up by id?",
+    "Where are payment totals calculated?",
+    "Which service validates user tokens?",
+    "How does the catalog load its items?",
+    "What happens when an invoice is deleted?",
+    "How is the shipping status synchronised?",
+    "Where is the audit history resolved?",
+    "How are report limits published?",
+]
+
+
+def _timed_calls(fn, queries, concurrency: int):
+    def one(query):
+        with Timer() as t:
+            fn(query)
+        return t.elapsed
+
+    with Timer() as wall:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            latencies = list(pool.map(one, queries))
+    return latencies, wall.elapsed
+
+
+def _hierarchical_recall(vectorstore, repo_id, queries, top_k: int):
+    """Mean/min share of flat search's top-k chunks that hierarchical search also returns."""
+    recalls, flat_latencies, hierarchical_latencies = [], [], []
+    for query in queries:
+        with Timer() as flat_t:
+            flat = vectorstore.search(query, top_k=top_k, repo_ids=[repo_id])
+        with Timer() as hierarchical_t:
+            hierarchical = vectorstore.search_hierarchical(query, top_k=top_k, repo_id=repo_id)
+        flat_latencies.append(flat_t.elapsed)
+        hierarchical_latencies.append(hierarchical_t.elapsed)
+        expected = {doc.metadata["chunk_id"] for doc in flat}
+        found = {doc.metadata["chunk_id"] for doc in hierarchical}
+        recalls.append(len(expected & found) / len(expected) if expected else 1.0)
+    return {
+        "top_k": top_k,
+        "mean_recall": round(sum(recalls) / len(recalls), 3),
+        "min_recall": round(min(recalls), 3),
+        "flat": latency_summary(flat_latencies),
+        "hierarchical": latency_summary(hierarchical_latencies),
+    }
+
+
+def run(files: int, queries: int, concurrency_levels, agent_queries: int, work_dir: str, fixtures: str = None):
+    settings = configure_sandbox(os.path.join(work_dir, "state"))
+    # Summaries are built so hierarchical search can be compared; retrieval itself follows the settings
+    settings.SUMMARY_INDEX_ENABLED = True
+    # Imported after the sandbox is configured so every store lands in work_dir
+    from app.db.init_db import init_db
+    from app.agents.coderag_agent import CoderagAgent
+    from app.agents.LLM_Manager import ReplayLLM
+    from app.agents.tools import AgentTools
+    from app.db import crud
+    from app.db.session import SessionLocal
+    from app.ingestion.indexer import Indexer
+    from app.retrieval.retriever import Retriever
+    from app.vectorstore.chroma import ChromaVectorStore
+
+    init_db()
+    repo_dir = os.path.join(work_dir, "synthetic-repo")
+    generate_repo(repo_dir, files=files)
+    vectorstore = ChromaVectorStore()
+    Indexer(vectorstore).index_project(repo_dir)
+
+    db = SessionLocal()
+    repo_id = crud.get_repo(db, repo_dir).id
+    retriever = Retriever(vectorstore=vectorstore)
+    rng = random.Random(0)
+    workload = [rng.choice(_QUERIES) for _ in range(queries)]
+
+    results = {"retriever": [], "hierarchical_recall": None, "agent": None}
+    for concurrency in concurrency_levels:
+        latencies, wall = _timed_calls(
+            lambda q: retriever.get_formatted_context(query=q, top_k=5, repo_id=repo_id), workload, concurrency
+        )
+        results["retriever"].append({
+            "concurrency": concurrency,
+            "qps": round(len(workload) / wall, 2),
+            **latency_summary(latencies),
+        })
+
+    results["hierarchical_recall"] = _hierarchical_recall(vectorstore, repo_id, _QUERIES, top_k=10)
+
+    llm = ReplayLLM(fixtures_path=fixtures or "")
+    agent = CoderagAgent(tools=AgentTools(db=db, vectorstore=vectorstore), llm=llm)
+    latencies, wall = _timed_calls(
+        lambda q: agent.handle_query(query=q, repo_id=repo_id), workload[:agent_queries], 1
+    )
+    results["agent"] = {
+        "llm": "replay",
+        "llm_calls": llm.calls,
+        "llm_replayed": llm.replayed,
+        "qps": round(len(latencies) / wall, 2),
+        **latency_summary(latencies),
+    }
+    results["peak_rss_mb"] = peak_rss_mb()
+    db.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark retrieval and offline-LLM agent latency.")
+    parser.add_argument("--files", type=int, default=300)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, nargs="*", default=[1, 4, 16])
+    parser.add_argument("--agent-queries", type=int, default=50)
+    parser.add_argument("--fixtures", default=None, help="LLM fixture file recorded with LLM_RECORD_FIXTURES")
+    parser.add_argument("--work-dir", default=None, help="Scratch directory (default: a temp dir, removed afterwards)")
+    parser.add_argument("--output", default="bench_results/retrieval.json")
+    args = parser.parse_args()
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="coderag-bench-")
+    try:
+        results = run(args.files, args.queries, args.concurrency, args.agent_queries, work_dir, args.fixtures)
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    write_results(args.output, "retrieval", vars(args), results)
+
+
+if __name__ == "__main__":
+    main()
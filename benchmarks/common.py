@@ -0,0 +1,104 @@
+# benchmarks/common.py
+"""
+Shared helpers for the benchmark suite:
+- Sandbox settings (DB, Chroma, file cache) into a scratch directory before `app` modules are imported
+- Timing, percentile and peak-RSS helpers
+- JSON result files with enough context to compare runs over time
+"""
+import json
+import math
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def configure_sandbox(work_dir: str):
+    """
+    Point every on-disk store at `work_dir`. Must run before importing any other `app`
+    module, because the DB engine and vector store read their paths at import time.
+    """
+    if REPO_ROOT not in sys.path:
+        sys.path.insert(0, REPO_ROOT)
+    from app.config import settings
+
+    os.makedirs(work_dir, exist_ok=True)
+    settings.BASE_DIR = work_dir
+    settings.CHROMA_PERSIST_DIR = os.path.join(work_dir, "chroma_db")
+    settings.FILE_CACHE_DIR = os.path.join(work_dir, "file_cache")
+    settings.DATABASE_URL = f"sqlite:///{os.path.join(work_dir, 'coderag.db')}"
+    settings.LLM_CACHE_PATH = os.path.join(work_dir, "llm_cache.db")
+    return settings
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process so far (ru_maxrss is KiB on Linux, bytes on macOS)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024, 1)
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of samples."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100.0 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def latency_summary(samples_s: List[float]) -> Dict[str, float]:
+    """p50/p90/p99/max of latencies given in seconds, reported in milliseconds."""
+    return {
+        "count": len(samples_s),
+        "p50_ms": round(percentile(samples_s, 50) * 1000, 2),
+        "p90_ms": round(percentile(samples_s, 90) * 1000, 2),
+        "p99_ms": round(percentile(samples_s, 99) * 1000, 2),
+        "max_ms": round(max(samples_s) * 1000, 2) if samples_s else 0.0,
+    }
+
+
+class Timer:
+    """`with Timer() as t: ...` then read `t.elapsed` (seconds)."""
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
+        return False
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return "unknown"
+
+
+def write_results(path: str, benchmark: str, params: Dict[str, Any], results: Dict[str, Any]):
+    """Write one benchmark run as JSON and echo it to stdout."""
+    payload = {
+        "benchmark": benchmark,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "params": params,
+        "results": results,
+    }
+    if path:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(payload, f, indent=2)
+    print(json.dumps(payload, indent=2))
+    return payload
@@ -0,0 +1,264 @@
+# benchmarks/mock_gitlab.py
+"""
+Local mock GitLab server.
+
+Serves a directory as a GitLab project over the subset of the v4 API the data provider
+uses (project lookup, paginated recursive tree, raw blobs, the files API), so the
+GitLab client and provider can be exercised without network access or credentials.
+
+- Blob SHAs are git's (sha1 of "blob <size>\\0<content>"), so cache behaviour matches GitLab's
+- `RateLimit-*` headers count down a per-window budget; `fail_rate` injects transient
+  500/429 responses (any request, including tree pages) to exercise retries and throttling
+- `requests` counts the requests served per endpoint
+
+Usage (standalone, then point the provider at the printed URL):
+    python -m benchmarks.mock_gitlab --root path/to/repo --port 8929
+"""
+import argparse
+import base64
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, quote, unquote, urlsplit
+
+PROJECT_ID = 1
+
+_PROJECT = re.compile(r"^/api/v4/projects/([^/]+)$")
+_TREE = re.compile(r"^/api/v4/projects/([^/]+)/repository/tree$")
+_BLOB = re.compile(r"^/api/v4/projects/([^/]+)/repository/blobs/([0-9a-f]+)/raw$")
+_FILE = re.compile(r"^/api/v4/projects/([^/]+)/repository/files/([^/]+)$")
+
+
+def _git_blob_sha(content: bytes) -> str:
+    return hashlib.sha1(b"blob %d\0" % len(content) + content).hexdigest()
+
+
+class MockGitLab:
+    """A served snapshot of `root` as project `project_path` on branch `branch`."""
+
+    def __init__(
+            self,
+            root: str,
+            project_path: str = "bench/synthetic-repo",
+            branch: str = "main",
+            fail_rate: float = 0.0,
+            rate_limit: int = 2000,
+            rate_window_seconds: float = 60.0,
+            seed: int = 0,
+    ):
+        self.root = root
+        self.project_path = project_path
+        self.branch = branch
+        self.fail_rate = fail_rate
+        self.rate_limit = rate_limit
+        self.rate_window_seconds = rate_window_seconds
+        self.requests: Counter = Counter()
+        self.injected_failures = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._window_start = time.time()
+        self._window_used = 0
+        self._entries: List[Dict] = []
+        self._blobs: Dict[str, str] = {}
+        self._server: Optional[ThreadingHTTPServer] = None
+        self.snapshot()
+
+    def snapshot(self):
+        """(Re)read the tree from disk, e.g. after files were changed."""
+        entries, blobs, dirs = [], {}, set()
+        for current, subdirs, files in os.walk(self.root):
+            subdirs[:] = [d for d in subdirs if d != ".git"]
+            for name in files:
+                full_path = os.path.join(current, name)
+                rel_path = os.path.relpath(full_path, self.root).replace(os.sep, "/")
+                with open(full_path, "rb") as f:
+                    sha = _git_blob_sha(f.read())
+                blobs[sha] = full_path
+                entries.append({"id": sha, "name": name, "type": "blob", "path": rel_path, "mode": "100644"})
+                parent = os.path.dirname(rel_path)
+                while parent and parent not in dirs:
+                    dirs.add(parent)
+                    parent = os.path.dirname(parent)
+        entries.extend(
+            {"id": "0" * 40, "name": os.path.basename(d), "type": "tree", "path": d, "mode": "040000"} for d in dirs
+        )
+        entries.sort(key=lambda entry: entry["path"])
+        with self._lock:
+            self._entries, self._blobs = entries, blobs
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def repo_url(self) -> str:
+        return f"{self.url}/{self.project_path}"
+
+    def start(self, port: int = 0) -> "MockGitLab":
+        mock = self
+
+        class Handler(_Handler):
+            server_mock = mock
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="mock-gitlab", daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+    def _rate_limit_headers(self) -> Dict[str, str]:
+        with self._lock:
+            now = time.time()
+            if now - self._window_start >= self.rate_window_seconds:
+                self._window_start, self._window_used = now, 0
+            self._window_used += 1
+            remaining = max(0, self.rate_limit - self._window_used)
+            reset = int(self._window_start + self.rate_window_seconds)
+        return {"RateLimit-Limit": str(self.rate_limit), "RateLimit-Remaining": str(remaining), "RateLimit-Reset": str(reset)}
+
+    def _inject_failure(self) -> Optional[int]:
+        with self._lock:
+            if self.fail_rate and self._rng.random() < self.fail_rate:
+                self.injected_failures += 1
+                return self._rng.choice((429, 500, 502, 503))
+        return None
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_mock: MockGitLab = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        mock = self.server_mock
+        # Match on the raw path: project IDs and file paths arrive URL-encoded ("group%2Frepo")
+        parts = urlsplit(self.path)
+        query = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+        for pattern, endpoint in ((_PROJECT, "project"), (_TREE, "tree"), (_BLOB, "blob"), (_FILE, "file")):
+            match = pattern.match(parts.path)
+            if match:
+                break
+        else:
+            return self._send(404, {"message": "404 Not Found"})
+        mock.requests[endpoint] += 1
+        if unquote(match.group(1)) not in (str(PROJECT_ID), mock.project_path):
+            return self._send(404, {"message": "404 Project Not Found"})
+        failure = mock._inject_failure()
+        if failure == 429:
+            return self._send(429, {"message": "429 Too Many Requests"}, {"Retry-After": "1"})
+        if failure:
+            return self._send(failure, {"message": f"{failure} injected"})
+        getattr(self, f"_{endpoint}")(match, query)
+
+    def _project(self, match, query):
+        mock = self.server_mock
+        self._send(200, {
+            "id": PROJECT_ID,
+            "path_with_namespace": mock.project_path,
+            "name": mock.project_path.rsplit("/", 1)[-1],
+            "default_branch": mock.branch,
+        })
+
+    def _tree(self, match, query):
+        mock = self.server_mock
+        entries = mock._entries
+        prefix = query.get("path", "").strip("/")
+        if query.get("recursive", "false").lower() == "true":
+            entries = [entry for entry in entries if not prefix or entry["path"].startswith(prefix + "/")]
+        else:
+            entries = [entry for entry in entries if os.path.dirname(entry["path"]) == prefix]
+        if prefix and not entries:
+            return self._send(404, {"message": "404 Tree Not Found"})
+        per_page = min(int(query.get("per_page", 20)), 100)
+        page = max(int(query.get("page", 1)), 1)
+        total_pages = max(1, -(-len(entries) // per_page))
+        headers = {
+            "X-Page": str(page), "X-Per-Page": str(per_page), "X-Total": str(len(entries)),
+            "X-Total-Pages": str(total_pages),
+        }
+        if page < total_pages:
+            next_query = dict(query, page=str(page + 1), per_page=str(per_page))
+            next_url = f"{self.server_mock.url}{urlsplit(self.path).path}?" + "&".join(
+                f"{key}={quote(str(value), safe='')}" for key, value in next_query.items()
+            )
+            headers["X-Next-Page"] = str(page + 1)
+            headers["Link"] = f'<{next_url}>; rel="next"'
+        self._send(200, entries[(page - 1) * per_page:page * per_page], headers)
+
+    def _blob(self, match, query):
+        full_path = self.server_mock._blobs.get(match.group(2))
+        if full_path is None:
+            return self._send(404, {"message": "404 Blob Not Found"})
+        with open(full_path, "rb") as f:
+            self._send_raw(200, f.read(), "application/octet-stream")
+
+    def _file(self, match, query):
+        mock = self.server_mock
+        rel_path = unquote(match.group(2))
+        full_path = os.path.join(mock.root, *rel_path.split("/"))
+        if not os.path.isfile(full_path):
+            return self._send(404, {"message": "404 File Not Found"})
+        with open(full_path, "rb") as f:
+            content = f.read()
+        self._send(200, {
+            "file_name": os.path.basename(rel_path),
+            "file_path": rel_path,
+            "size": len(content),
+            "encoding": "base64",
+            "content": base64.b64encode(content).decode("ascii"),
+            "ref": query.get("ref", mock.branch),
+            "blob_id": _git_blob_sha(content),
+        })
+
+    def _send(self, status: int, payload, headers: Optional[Dict[str, str]] = None):
+        self._send_raw(status, json.dumps(payload).encode("utf-8"), "application/json", headers)
+
+    def _send_raw(self, status: int, body: bytes, content_type: str, headers: Optional[Dict[str, str]] = None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in {**self.server_mock._rate_limit_headers(), **(headers or {})}.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a directory as a mock GitLab project.")
+    parser.add_argument("--root", required=True, help="Directory to serve as the project's default branch")
+    parser.add_argument("--project", default="bench/synthetic-repo")
+    parser.add_argument("--port", type=int, default=8929)
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Fraction of requests answered with 429/5xx")
+    args = parser.parse_args()
+
+    mock = MockGitLab(args.root, project_path=args.project, fail_rate=args.fail_rate).start(args.port)
+    print(f"Serving {args.root} as {mock.repo_url} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        mock.stop()
+
+
+if __name__ == "__main__":
+    main()
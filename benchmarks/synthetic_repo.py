@@ -0,0 +1,98 @@
+# benchmarks/synthetic_repo.py
+"""
+Synthetic Java repository generator.
+
+Produces a deterministic (seeded) Maven-style tree of packages, classes and methods
+so ingestion and retrieval benchmarks run against the same input every time, and
+can apply a given percentage of churn to measure incremental reindex cost.
+"""
+import argparse
+import os
+import random
+from typing import List
+
+_DOMAINS = ["order", "user", "payment", "invoice", "catalog", "shipping", "auth", "report", "audit", "search"]
+_VERBS = ["find", "create", "update", "delete", "validate", "calculate", "load", "sync", "publish", "resolve"]
+_NOUNS = ["ById", "ByName", "Total", "Status", "Summary", "Items", "Owner", "History", "Limits", "Token"]
+
+
+def _class_source(package: str, class_name: str, methods: int, rng: random.Random, revision: int = 0) -> str:
+    lines = [
+        f"package {package};",
+        "",
+        "import java.util.List;",
+        "import java.util.Optional;",
+        "import org.springframework.stereotype.Service;",
+        "",
+        "/**",
+        f" * {class_name} handles {package.split('.')[-2]} operations (revision {revision}).",
+        " */",
+        "@Service",
+        f"public class {class_name} {{",
+        "",
+        f"    private final {class_name}Repository repository;",
+        "",
+        f"    public {class_name}({class_name}Repository repository) {{",
+        "        this.repository = repository;",
+        "    }",
+    ]
+    for index in range(methods):
+        name = f"{rng.choice(_VERBS)}{rng.choice(_NOUNS)}{index}"
+        body_lines = rng.randint(3, 12)
+        lines += [
+            "",
+            "    /**",
+            f"     * {name.capitalize()} for the {class_name} aggregate.",
+            "     */",
+            f"    public Optional<String> {name}(String id, int limit) {{",
+        ]
+        for step in range(body_lines):
+            lines.append(f"        String step{step} = repository.lookup(id, limit + {step + revision});")
+        lines += [
+            "        return Optional.ofNullable(step0);",
+            "    }",
+        ]
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+
+def generate_repo(root: str, files: int = 200, methods_per_class: int = 8, seed: int = 42) -> List[str]:
+    """Write `files` Java classes under `root`; returns their relative paths."""
+    rng = random.Random(seed)
+    paths = []
+    for index in range(files):
+        domain = _DOMAINS[index % len(_DOMAINS)]
+        package = f"com.example.{domain}.module{index // 50}"
+        class_name = f"{domain.capitalize()}Service{index}"
+        rel_path = os.path.join("src", "main", "java", *package.split("."), f"{class_name}.java")
+        full_path = os.path.join(root, rel_path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, "w") as f:
+            f.write(_class_source(package, class_name, methods_per_class, rng))
+        paths.append(rel_path)
+    return paths
+
+
+def apply_churn(root: str, paths: List[str], percent: float, methods_per_class: int = 8, seed: int = 7) -> List[str]:
+    """Rewrite `percent`% of the files with a new revision; returns the changed paths."""
+    rng = random.Random(seed)
+    count = max(1, int(len(paths) * percent / 100.0)) if percent > 0 else 0
+    changed = rng.sample(paths, min(count, len(paths)))
+    for rel_path in changed:
+        full_path = os.path.join(root, rel_path)
+        class_name = os.path.splitext(os.path.basename(rel_path))[0]
+        package = ".".join(os.path.dirname(rel_path).split(os.sep)[3:])
+        with open(full_path, "w") as f:
+            f.write(_class_source(package, class_name, methods_per_class, random.Random(rel_path), revision=1))
+    return changed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic Java repository.")
+    parser.add_argument("root")
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--methods", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    written = generate_repo(args.root, args.files, args.methods, args.seed)
+    print(f"Wrote {len(written)} files under {args.root}")
@@ -1 +1,7 @@
 # init_db.py - Initialize database
+from app.config.logging_config import setup_logging
+from app.db.init_db import init_db
+
+if __name__ == "__main__":
+    setup_logging()
+    init_db()
@@ -0,0 +1,110 @@
+# migrate_chroma_collections.py - Bring a Chroma store created by an older version up to date,
+# without re-embedding anything. Safe to re-run.
+# 1. Move chunks from the single default collection into one collection per repository.
+# 2. Tag chunks stored before multi-branch indexing with their file hash and default-branch flag.
+# 3. Build the class/file and package summaries (from the stored chunk vectors) where missing.
+import argparse
+import logging
+
+from app.config.logging_config import setup_logging
+from app.db import crud
+from app.ingestion.records import ChunkRecord
+from app.db.session import SessionLocal
+from app.vectorstore.chroma import ChromaVectorStore, branch_key
+
+logger = logging.getLogger(__name__)
+
+
+def migrate(batch_size: int = 1000, keep_legacy: bool = False):
+    store = ChromaVectorStore()
+    legacy = store.vectorstore._collection
+    total = legacy.count()
+    logger.info(f"Migrating {total} chunks out of collection '{legacy.name}'")
+    moved = 0
+    while True:
+        # Without --keep-legacy the batch is deleted after copying, so offset 0 always holds the next one
+        batch = legacy.get(
+            limit=batch_size,
+            offset=moved if keep_legacy else 0,
+            include=["embeddings", "metadatas", "documents"],
+        )
+        if not batch["ids"]:
+            break
+        by_repo = {}
+        for i, metadata in enumerate(batch["metadatas"]):
+            by_repo.setdefault(metadata.get("repo_id"), []).append(i)
+        for repo_id, positions in by_repo.items():
+            store.collection(repo_id)._collection.upsert(
+                ids=[batch["ids"][i] for i in positions],
+                embeddings=[batch["embeddings"][i] for i in positions],
+                metadatas=[batch["metadatas"][i] for i in positions],
+                documents=[batch["documents"][i] for i in positions],
+            )
+        if not keep_legacy:
+            legacy.delete(ids=batch["ids"])
+        moved += len(batch["ids"])
+        logger.info(f"Migrated {moved}/{total} chunks")
+    logger.info(f"Done: {moved} chunks moved into {len(store.repo_ids())} repo collections")
+    return store
+
+
+def tag_branches(store: ChromaVectorStore, batch_size: int = 1000):
+    db = SessionLocal()
+    try:
+        for repo in crud.list_repos(db):
+            hashes = crud.get_file_hashes(db, repo.id, repo.branch)
+            collection = store.collection(repo.id)._collection
+            tagged, offset = 0, 0
+            while True:
+                batch = collection.get(limit=batch_size, offset=offset, include=["metadatas"])
+                if not batch["ids"]:
+                    break
+                offset += len(batch["ids"])
+                ids, metadatas = [], []
+                for chunk_id, metadata in zip(batch["ids"], batch["metadatas"]):
+                    file_hash = hashes.get(metadata.get("file_id"))
+                    if metadata.get("file_hash") or not file_hash:
+                        continue
+                    ids.append(chunk_id)
+                    metadatas.append({**metadata, "file_hash": file_hash, branch_key(repo.branch): True})
+                if ids:
+                    collection.update(ids=ids, metadatas=metadatas)
+                    tagged += len(ids)
+            logger.info(f"Tagged {tagged} chunks of repo {repo.url} with branch '{repo.branch}'")
+    finally:
+        db.close()
+
+
+def build_summaries(store: ChromaVectorStore):
+    """Summarise every indexed file version that has no summary yet, one file at a time."""
+    db = SessionLocal()
+    try:
+        for repo in crud.list_repos(db):
+            summaries = store.summary_collection(repo.id)
+            chunks = store.collection(repo.id)._collection
+            built = 0
+            for (path, file_hash), branches in crud.get_file_refs(db, repo.id).items():
+                where = {"$and": [{"file_id": path}, {"file_hash": file_hash}]}
+                if summaries.get(where=where, limit=1, include=[])["ids"]:
+                    continue
+                found = chunks.get(where=where, include=["embeddings", "metadatas"])
+                if not found["ids"]:
+                    continue
+                documents = [ChunkRecord.from_metadata(metadata, branches) for metadata in found["metadatas"]]
+                built += store.add_unit_summaries(repo.id, documents, found["embeddings"])
+            for branch in crud.list_branches(db, repo.id):
+                store.rebuild_package_summaries(repo.id, branch)
+            logger.info(f"Built {built} class/file summaries for repo {repo.url}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate a Chroma store to per-repo, branch-tagged collections.")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--keep-legacy", action="store_true", help="Copy instead of move")
+    args = parser.parse_args()
+    setup_logging()
+    store = migrate(args.batch_size, args.keep_legacy)
+    tag_branches(store, args.batch_size)
+    build_summaries(store)
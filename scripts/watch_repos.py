@@ -0,0 +1,19 @@
+# watch_repos.py - Keep registered local repos indexed as their files change
+# Run instead of (not alongside) an API server that has WATCH_LOCAL_REPOS enabled
+import time
+
+from app.api.dependencies import get_indexer
+from app.config.logging_config import setup_logging
+from app.db.init_db import init_db
+from app.ingestion.watcher import RepoWatcher
+
+if __name__ == "__main__":
+    setup_logging()
+    init_db()
+    watcher = RepoWatcher(get_indexer)
+    watcher.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        watcher.stop()